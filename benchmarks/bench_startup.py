@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Time CLI startup for the light entry paths and fail if they pull in heavy modules."""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENTRY = ROOT / "resolve_lutris_installer.py"
+
+# Modules only the install/generate paths need; --help and --print-lutris-paths must not load them.
+HEAVY_MODULES = (
+    "yaml",
+    "subprocess",
+    "concurrent.futures",
+    "resolve_installer.actions",
+    "resolve_installer.envcfg",
+    "resolve_installer.install",
+    "resolve_installer.yamlgen",
+    "resolve_installer.vkprobe",
+)
+
+# Runs the CLI in-process and reports which modules it left loaded.
+PROBE = """
+import json, runpy, sys
+sys.argv = [sys.argv[1], *sys.argv[2:]]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+sys.stderr.write("\\nMODULES " + json.dumps(sorted(sys.modules)) + "\\n")
+"""
+
+
+def loaded_modules(args: list[str]) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, str(ENTRY), *args],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    for line in result.stderr.splitlines():
+        if line.startswith("MODULES "):
+            return set(json.loads(line[len("MODULES ") :]))
+    raise RuntimeError(f"probe failed for {args}: {result.stderr.strip()}")
+
+
+def time_run(command: list[str], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, capture_output=True, check=False)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if a light path's median exceeds this")
+    args = parser.parse_args()
+
+    log_file = os.path.join(tempfile.gettempdir(), "resolve-installer-bench.log")
+    cases = {
+        "--help": ["--help"],
+        "--print-lutris-paths": ["--print-lutris-paths", "--log-file", log_file],
+    }
+    failed = False
+    interpreter_ms = time_run([sys.executable, "-c", "pass"], args.runs) * 1000
+    print(f"{'python -c pass':24s} {interpreter_ms:7.1f} ms")
+    for name, cli_args in cases.items():
+        median_ms = time_run([sys.executable, str(ENTRY), *cli_args], args.runs) * 1000
+        heavy = sorted(set(HEAVY_MODULES) & loaded_modules(cli_args))
+        print(f"{name:24s} {median_ms:7.1f} ms" + (f"  heavy imports: {', '.join(heavy)}" if heavy else ""))
+        if heavy or (args.max_ms is not None and median_ms > args.max_ms):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Benchmark orchestration overhead against stub wine/winetricks and flag regressions.
+
+Measures CLI startup, ``run_cmd`` overhead per process, a full ``--action install`` (with and
+without ``--persistent-wineserver``) minus the time the stubs spend "being wine", YAML generation throughput and DLL placement. Results go to
+JSON (``--out``); ``--baseline`` compares against an earlier run and exits 1 on regressions.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import bench_startup  # noqa: E402
+from stubs import stub_env, write_stubs  # noqa: E402
+
+from resolve_installer.actions import copy_dlls, run_cmd  # noqa: E402
+from resolve_installer.dllstore import DllStore  # noqa: E402
+from resolve_installer.logging_utils import setup_logging  # noqa: E402
+from resolve_installer.models import TARGETS, RunnerConfig  # noqa: E402
+from resolve_installer.yamlgen import generate_combined_yaml  # noqa: E402
+
+RESULT_FORMAT = 1
+
+
+def metric(value: float, unit: str, better: str | None = "lower") -> dict:
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+def median_of(runs: int, fn: Callable[[], float]) -> float:
+    return statistics.median(fn() for _ in range(runs))
+
+
+def bench_startup_paths(runs: int, work: Path) -> dict[str, dict]:
+    log_file = str(work / "startup.log")
+    cases = {"startup_help": ["--help"], "startup_lutris_paths": ["--print-lutris-paths", "--log-file", log_file]}
+    return {
+        name: metric(bench_startup.time_run([sys.executable, str(bench_startup.ENTRY), *args], runs) * 1000, "ms")
+        for name, args in cases.items()
+    }
+
+
+def bench_run_cmd(runs: int, bin_dir: Path, lines: int, calls: int = 20) -> dict:
+    """Per-process cost of ``run_cmd`` (streaming + logging) above a bare ``subprocess.run``."""
+    env = stub_env(bin_dir, lines=lines)
+    cmd = [str(bin_dir / "wine"), "cmd"]
+
+    def direct() -> float:
+        started = time.perf_counter()
+        for _ in range(calls):
+            subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        return time.perf_counter() - started
+
+    def orchestrated() -> float:
+        started = time.perf_counter()
+        for _ in range(calls):
+            run_cmd(cmd, env, "bench")
+        return time.perf_counter() - started
+
+    overhead = median_of(runs, orchestrated) - median_of(runs, direct)
+    return metric(max(overhead, 0.0) / calls * 1000, "ms")
+
+
+INSTALL_TIMEOUT = 300
+
+
+def bench_install(
+    runs: int, bin_dir: Path, work: Path, latency: float, name: str = "install", extra: tuple[str, ...] = ()
+) -> dict[str, dict]:
+    """Wall time of a fresh CLI install, minus the time the stubs sleep."""
+    installer = work / "Setup.exe"
+    installer.write_bytes(b"MZ" + b"\0" * 1024)
+    directml = work / "directml.dll"
+    directml.write_bytes(b"MZ" + b"\0" * 4096)
+    totals, overheads, counts = [], [], []
+    for run in range(runs):
+        calls = work / f"{name}-{run}.calls"
+        env = stub_env(bin_dir, latency=latency, calls=calls)
+        env["XDG_CACHE_HOME"] = str(work / f"{name}-cache-{run}")
+        command = [
+            sys.executable,
+            str(bench_startup.ENTRY),
+            *("--action", "install", "--target", "davinci-resolve-x86_64"),
+            *("--installer", str(installer), "--directml-dll", str(directml)),
+            *("--prefix-root", str(work / f"{name}-prefixes-{run}"), "--log-file", str(work / f"{name}-{run}.log")),
+            *("--wine-bin", str(bin_dir / "wine"), "--winetricks-bin", str(bin_dir / "winetricks")),
+            *extra,
+        ]
+        started = time.perf_counter()
+        # The stub wineserver daemonizes like the real one, so a stderr pipe held open shows up here.
+        try:
+            result = subprocess.run(
+                command, env=env, stdin=subprocess.DEVNULL, capture_output=True, check=False, timeout=INSTALL_TIMEOUT
+            )
+        except subprocess.TimeoutExpired as exc:
+            raise RuntimeError(f"stub {name} did not finish within {INSTALL_TIMEOUT}s") from exc
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(f"stub {name} failed: {result.stdout.decode(errors='replace')[-2000:]}")
+        count = len(calls.read_text(encoding="utf-8").splitlines()) if calls.exists() else 0
+        totals.append(elapsed)
+        counts.append(count)
+        overheads.append(elapsed - count * latency)
+    return {
+        f"{name}_total": metric(statistics.median(totals) * 1000, "ms"),
+        f"{name}_overhead": metric(statistics.median(overheads) * 1000, "ms"),
+        f"{name}_stub_calls": metric(statistics.median(counts), "calls", None),
+    }
+
+
+def bench_yaml(variants: int) -> dict:
+    targets = list(TARGETS.values())
+    runners = [RunnerConfig("wine", "wine", None), RunnerConfig("proton", "wine", "proton")]
+    started = time.perf_counter()
+    for index in range(variants):
+        version = f"lutris-GE-Proton9-{index}"
+        generate_combined_yaml(targets, Path("/unused"), runners[index % 2], version, version, index % 3 != 0)
+    return metric(variants / (time.perf_counter() - started), "variants/s", "higher")
+
+
+def bench_dlls(runs: int, work: Path, dll_mb: int) -> dict[str, dict]:
+    """One ``copy_dlls`` call (directml, opencl, nvcuda) into a fresh prefix, plain vs DLL store."""
+    cfg = TARGETS["davinci-resolve-x86_64"]
+    runner = RunnerConfig("wine", "wine", None)
+    sources = {}
+    for name in ("directml", "opencl", "nvcuda"):
+        sources[name] = work / f"{name}.src.dll"
+        sources[name].write_bytes(os.urandom(dll_mb * 1024 * 1024))
+    results = {}
+    for label, store in (("dll_copy", None), ("dll_store", DllStore(work / "dll-store"))):
+
+        def once(store=store) -> float:
+            prefix_root = work / "dll-prefixes"
+            shutil.rmtree(prefix_root, ignore_errors=True)
+            (prefix_root / cfg.target / "drive_c" / "windows" / "system32").mkdir(parents=True)
+            started = time.perf_counter()
+            copy_dlls(
+                prefix_root,
+                cfg,
+                runner,
+                sources["directml"],
+                sources["opencl"],
+                sources["nvcuda"],
+                "nvidia",
+                interactive=False,
+                store=store,
+            )
+            return time.perf_counter() - started
+
+        once()  # warm the page cache and, for the store, ingest once like a real second install
+        results[label] = metric(median_of(runs, once) * 1000, "ms")
+    return results
+
+
+def compare(current: dict, baseline: dict, max_regression: float, noise_ms: float) -> list[str]:
+    """Print old vs new per metric; return the names that got worse than ``max_regression`` (a fraction)."""
+    regressions = []
+    for name, now in current["metrics"].items():
+        before = baseline.get("metrics", {}).get(name)
+        if before is None or now["better"] is None or not before["value"]:
+            continue
+        change = (now["value"] - before["value"]) / before["value"]
+        worse = change if now["better"] == "lower" else -change
+        if now["unit"] == "ms" and abs(now["value"] - before["value"]) < noise_ms:
+            continue
+        status = "REGRESSED" if worse > max_regression else "ok"
+        print(f"{name:24s} {before['value']:>10.1f} -> {now['value']:>10.1f} {now['unit']:10s} {change:+7.1%} {status}")
+        if worse > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def git_revision() -> str:
+    result = subprocess.run(["git", "-C", str(ROOT), "rev-parse", "HEAD"], capture_output=True, text=True, check=False)
+    return result.stdout.strip() if result.returncode == 0 else "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds each stub wine/winetricks call takes")
+    parser.add_argument("--output-lines", type=int, default=10000, help="Lines a chatty stub prints")
+    parser.add_argument("--yaml-variants", type=int, default=2000)
+    parser.add_argument("--dll-mb", type=int, default=32, help="Size of each stub DLL")
+    parser.add_argument("--out", type=Path, default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, default=None, help="Compare with an earlier --out file")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed slowdown as a fraction")
+    parser.add_argument("--noise-ms", type=float, default=2.0, help="Ignore millisecond deltas below this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="resolve-installer-bench-") as tmp:
+        work = Path(tmp)
+        bin_dir = write_stubs(work / "bin")
+        # run_cmd logs every line it streams; measure it with the CLI's real handlers.
+        setup_logging(work / "bench.log")
+        logging.getLogger().handlers[0].setLevel(logging.WARNING)
+
+        metrics: dict[str, dict] = {}
+        metrics.update(bench_startup_paths(args.runs, work))
+        metrics["run_cmd_overhead"] = bench_run_cmd(args.runs, bin_dir, lines=0)
+        metrics["run_cmd_overhead_chatty"] = bench_run_cmd(args.runs, bin_dir, lines=args.output_lines)
+        metrics.update(bench_install(args.runs, bin_dir, work, args.latency))
+        metrics.update(
+            bench_install(
+                args.runs, bin_dir, work, args.latency, name="install_persistent", extra=("--persistent-wineserver",)
+            )
+        )
+        metrics["yaml_generate"] = bench_yaml(args.yaml_variants)
+        metrics.update(bench_dlls(args.runs, work, args.dll_mb))
+
+    results = {
+        "format": RESULT_FORMAT,
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "params": {
+                "runs": args.runs,
+                "latency": args.latency,
+                "output_lines": args.output_lines,
+                "yaml_variants": args.yaml_variants,
+                "dll_mb": args.dll_mb,
+            },
+        },
+        "metrics": metrics,
+    }
+    for name, entry in metrics.items():
+        print(f"{name:24s} {entry['value']:>10.1f} {entry['unit']}")
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("params") != results["meta"]["params"]:
+            print("warning: baseline was recorded with different parameters", file=sys.stderr)
+        print(f"\ncompared with {args.baseline} ({baseline.get('meta', {}).get('revision', 'unknown')[:12]})")
+        regressions = compare(results, baseline, args.max_regression, args.noise_ms)
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Compare two built Wine runtimes on local, GPU-free workloads and write a report.
+
+Used by ``buildsystems/wine/build_wine_pgo.sh`` to check an optimized (ThinLTO/PGO) build against
+the baseline profile, but works for any two install trees with ``bin/wine`` and
+``bin/wineserver``. Every run uses a fresh prefix, no display and no Mono/Gecko.
+
+Workloads: prefix creation (``wineboot --init`` until the server exits), process startup
+(``cmd /c exit`` against a persistent wineserver) and registry churn (``reg add`` in a loop
+inside one ``cmd``), which together exercise the loader, ntdll and wineserver paths Resolve
+hits while starting.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+RESULT_FORMAT = 1
+
+
+def metric(value: float, unit: str, better: str | None = "lower") -> dict:
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+class Runtime:
+    def __init__(self, root: Path, work: Path) -> None:
+        self.root = root
+        self.wine = root / "bin" / "wine"
+        self.server = root / "bin" / "wineserver"
+        if not self.wine.is_file() or not self.server.is_file():
+            raise RuntimeError(f"{root} is not a Wine install tree (missing bin/wine or bin/wineserver)")
+        self.work = work
+        self.work.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+
+    def env(self, prefix: Path) -> dict[str, str]:
+        env = {k: v for k, v in os.environ.items() if k not in ("DISPLAY", "WAYLAND_DISPLAY", "WINELOADER")}
+        env.update(
+            {
+                "WINEPREFIX": str(prefix),
+                "WINEDEBUG": "-all",
+                "WINEDLLOVERRIDES": "mscoree,mshtml=;winemenubuilder.exe=d",
+                "WINESERVER": str(self.server),
+            }
+        )
+        return env
+
+    def run(self, prefix: Path, *args: str) -> None:
+        result = subprocess.run(
+            [str(self.wine), *args], env=self.env(prefix), stdin=subprocess.DEVNULL, capture_output=True, check=False
+        )
+        if result.returncode != 0:
+            tail = result.stderr.decode(errors="replace")[-2000:]
+            raise RuntimeError(f"{self.wine} {' '.join(args)} failed ({result.returncode}): {tail}")
+
+    def server_cmd(self, prefix: Path, *args: str) -> None:
+        subprocess.run([str(self.server), *args], env=self.env(prefix), check=False)
+
+    def fresh_prefix(self) -> Path:
+        self.count += 1
+        return self.work / f"prefix-{self.count}"
+
+    def initialized_prefix(self) -> Path:
+        prefix = self.fresh_prefix()
+        self.run(prefix, "wineboot", "--init")
+        self.server_cmd(prefix, "-w")
+        return prefix
+
+
+def timed(fn: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def bench_prefix_init(rt: Runtime, runs: int) -> dict:
+    def once() -> float:
+        prefix = rt.fresh_prefix()
+        started = time.perf_counter()
+        rt.run(prefix, "wineboot", "--init")
+        rt.server_cmd(prefix, "-w")
+        elapsed = time.perf_counter() - started
+        shutil.rmtree(prefix, ignore_errors=True)
+        return elapsed
+
+    return metric(statistics.median(once() for _ in range(runs)) * 1000, "ms")
+
+
+def bench_process_startup(rt: Runtime, runs: int, calls: int) -> dict:
+    prefix = rt.initialized_prefix()
+    rt.server_cmd(prefix, "-p")
+    try:
+        rt.run(prefix, "cmd", "/c", "exit")  # warm the page cache
+
+        def once() -> float:
+            return timed(lambda: [rt.run(prefix, "cmd", "/c", "exit") for _ in range(calls)]) / calls
+
+        return metric(statistics.median(once() for _ in range(runs)) * 1000, "ms")
+    finally:
+        rt.server_cmd(prefix, "-k")
+        rt.server_cmd(prefix, "-w")
+        shutil.rmtree(prefix, ignore_errors=True)
+
+
+def bench_registry(rt: Runtime, runs: int, keys: int) -> dict:
+    prefix = rt.initialized_prefix()
+    script = f"for /l %i in (1,1,{keys}) do @reg add HKCU\\Software\\ResolveBench\\k%i /v v /d x /f >nul"
+    try:
+
+        def once() -> float:
+            elapsed = timed(lambda: rt.run(prefix, "cmd", "/c", script))
+            rt.server_cmd(prefix, "-w")
+            return elapsed
+
+        return metric(statistics.median(once() for _ in range(runs)) * 1000, "ms")
+    finally:
+        shutil.rmtree(prefix, ignore_errors=True)
+
+
+def bench_runtime(root: Path, work: Path, args: argparse.Namespace) -> dict[str, dict]:
+    rt = Runtime(root, work)
+    return {
+        "prefix_init": bench_prefix_init(rt, args.runs),
+        "process_startup": bench_process_startup(rt, args.runs, args.calls),
+        "registry_churn": bench_registry(rt, args.runs, args.registry_keys),
+    }
+
+
+def build_info(root: Path) -> dict[str, str]:
+    info = {}
+    for path in root.glob("resolve-*-build-info.txt"):
+        for line in path.read_text(encoding="utf-8").splitlines():
+            key, _, value = line.partition("=")
+            info[key] = value
+    return info
+
+
+def render_report(results: dict) -> str:
+    base, cand = results["runtimes"]["baseline"], results["runtimes"]["candidate"]
+    lines = [
+        "# Wine runtime benchmark",
+        "",
+        f"- baseline: `{base['path']}` ({base['build_info'].get('profile', 'unknown')} profile)",
+        f"- candidate: `{cand['path']}` ({cand['build_info'].get('profile', 'unknown')} profile)",
+        f"- host: {results['meta']['platform']}, {results['meta']['timestamp']}",
+        f"- runs: {results['meta']['params']['runs']} (median)",
+        "",
+        "| workload | baseline | candidate | change |",
+        "| --- | ---: | ---: | ---: |",
+    ]
+    for name, before in base["metrics"].items():
+        now = cand["metrics"][name]
+        change = (now["value"] - before["value"]) / before["value"] if before["value"] else 0.0
+        lines.append(
+            f"| {name} | {before['value']:.1f} {before['unit']} | {now['value']:.1f} {now['unit']} | {change:+.1%} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, required=True, help="Install tree of the reference runtime")
+    parser.add_argument("--candidate", type=Path, required=True, help="Install tree of the runtime under test")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--calls", type=int, default=20, help="Processes started per process_startup run")
+    parser.add_argument("--registry-keys", type=int, default=200, help="Keys written per registry_churn run")
+    parser.add_argument("--out", type=Path, default=None, help="Write results JSON here")
+    parser.add_argument("--report", type=Path, default=None, help="Write a Markdown report here")
+    args = parser.parse_args()
+
+    runtimes = {}
+    with tempfile.TemporaryDirectory(prefix="resolve-wine-bench-") as tmp:
+        for label, root in (("baseline", args.baseline), ("candidate", args.candidate)):
+            root = root.resolve()
+            print(f"benchmarking {label}: {root}")
+            runtimes[label] = {
+                "path": str(root),
+                "build_info": build_info(root),
+                "metrics": bench_runtime(root, Path(tmp) / label, args),
+            }
+
+    results = {
+        "format": RESULT_FORMAT,
+        "meta": {
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "params": {"runs": args.runs, "calls": args.calls, "registry_keys": args.registry_keys},
+        },
+        "runtimes": runtimes,
+    }
+    report = render_report(results)
+    print(report, end="")
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    if args.report is not None:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(report, encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
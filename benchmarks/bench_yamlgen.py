@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Time Lutris YAML generation across a large runner/version/Vulkan variant matrix."""
+from __future__ import annotations
+
+import argparse
+import itertools
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from resolve_installer import yamlgen  # noqa: E402
+from resolve_installer.models import TARGETS, RunnerConfig  # noqa: E402
+
+
+def variants(count: int):
+    runners = [RunnerConfig("wine", "wine", None), RunnerConfig("proton", "wine", "proton")]
+    versions = [f"lutris-GE-Proton{major}-{minor}" for major in range(7, 10) for minor in range(1, 40)]
+    combos = itertools.cycle(itertools.product(runners, versions, (True, False)))
+    return list(itertools.islice(combos, count))
+
+
+def run(count: int, dumper) -> float:
+    yamlgen.YamlDumper = dumper
+    targets = list(TARGETS.values())
+    started = time.perf_counter()
+    for runner, version, vulkan in variants(count):
+        yamlgen.generate_combined_yaml(targets, Path("/unused"), runner, version, version, vulkan)
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=5000)
+    args = parser.parse_args()
+
+    dumpers = [("SafeDumper", yaml.SafeDumper)]
+    if hasattr(yaml, "CSafeDumper"):
+        dumpers.append(("CSafeDumper", yaml.CSafeDumper))
+    sample_runner, sample_version, _ = variants(1)[0]
+    outputs = set()
+    for name, dumper in dumpers:
+        elapsed = run(args.variants, dumper)
+        outputs.add(
+            yamlgen.generate_combined_yaml(TARGETS.values(), Path("/unused"), sample_runner, sample_version, "", True)
+        )
+        print(f"{name:12s} {args.variants} variants: {elapsed:.2f}s ({args.variants / elapsed:.0f}/s)")
+    if len(outputs) != 1:
+        print("dumpers produced different output", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
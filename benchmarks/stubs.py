@@ -0,0 +1,78 @@
+"""Stub wine, wineserver, winetricks, proton and vulkaninfo executables for benchmarks.
+
+Each stub appends its argv to ``$STUB_CALLS`` (when set), prints ``$STUB_LINES`` lines of
+output and then sleeps ``$STUB_LATENCY`` seconds, so a benchmark can dial in how expensive
+"wine itself" is and subtract it from the measured wall time.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+_PRELUDE = """#!/bin/sh
+[ -n "$STUB_CALLS" ] && echo "{name} $*" >> "$STUB_CALLS"
+[ "${{STUB_LINES:-0}}" -gt 0 ] && yes "{name} stub output line" | head -n "$STUB_LINES"
+"""
+_EPILOGUE = """sleep "${STUB_LATENCY:-0}"
+exit 0
+"""
+
+_BODIES = {
+    # wineboot has to leave a prefix behind for the later steps.
+    "wine": """if [ "$1" = wineboot ]; then
+  mkdir -p "$WINEPREFIX/drive_c/windows/system32"
+  echo reg > "$WINEPREFIX/system.reg"; echo reg > "$WINEPREFIX/user.reg"
+fi
+""",
+    # Like the real server, -p forks a daemon that keeps stderr open; -k stops it.
+    "wineserver": """pidfile="${WINEPREFIX:-/tmp}/.stub-wineserver.pid"
+case "$1" in
+  -p) sleep 600 </dev/null >/dev/null & echo $! > "$pidfile" ;;
+  -k) [ -f "$pidfile" ] && kill "$(cat "$pidfile")" 2>/dev/null; rm -f "$pidfile" ;;
+esac
+""",
+    "winetricks": """mkdir -p "$WINEPREFIX/drive_c/windows/system32"
+echo vc > "$WINEPREFIX/drive_c/windows/system32/msvcp140.dll"
+""",
+    # "proton run <args>" behaves like wine with <args>.
+    "proton": """[ "$1" = run ] && shift
+if [ "$1" = wineboot ]; then
+  mkdir -p "$WINEPREFIX/drive_c/windows/system32"
+fi
+""",
+    "vulkaninfo": """cat <<'EOF'
+Devices:
+========
+GPU0:
+	apiVersion         = 1.3.274
+	driverVersion      = 24.0.5
+	vendorID           = 0x1002
+	deviceType         = PHYSICAL_DEVICE_TYPE_DISCRETE_GPU
+	deviceName         = Stub GPU
+	driverName         = radv
+	driverInfo         = Mesa 24.0.5
+EOF
+""",
+}
+
+
+def write_stubs(bin_dir: Path) -> Path:
+    """Create the stub executables in ``bin_dir`` and return it (prepend it to ``PATH``)."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for name, body in _BODIES.items():
+        path = bin_dir / name
+        path.write_text(_PRELUDE.format(name=name) + body + _EPILOGUE, encoding="utf-8")
+        path.chmod(0o755)
+    return bin_dir
+
+
+def stub_env(bin_dir: Path, latency: float = 0.0, lines: int = 0, calls: Path | None = None) -> dict[str, str]:
+    env = dict(os.environ)
+    env["PATH"] = f"{bin_dir}{os.pathsep}{env.get('PATH', '')}"
+    env["STUB_LATENCY"] = f"{latency:g}"
+    env["STUB_LINES"] = str(lines)
+    if calls is not None:
+        env["STUB_CALLS"] = str(calls)
+    else:
+        env.pop("STUB_CALLS", None)
+    return env
@@ -0,0 +1,126 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+# shellcheck source=common.sh
+source "${SCRIPT_DIR}/common.sh"
+
+usage() {
+  cat <<EOF
+Usage: $0 [--runtimes wine,proton] [--arches x86_64,arm64] [--jobs N] [--clean] [--compress xz|zstd|none] [--offline]
+
+Builds every selected runtime/arch pair at the same time under one GNU make jobserver, so all
+builds together run at most N compile jobs (default: nproc). Each build logs to
+logs/build-all-<time>/<runtime>-<arch>.log; a summary of timings and failures is printed at the
+end. Exits 1 if any build failed.
+EOF
+}
+
+RUNTIMES="wine,proton"
+ARCHES="x86_64,arm64"
+JOBS="$(nproc)"
+EXTRA_ARGS=()
+
+while [[ $# -gt 0 ]]; do
+  case "$1" in
+    --runtimes)
+      RUNTIMES="$2"
+      shift 2
+      ;;
+    --arches)
+      ARCHES="$2"
+      shift 2
+      ;;
+    --jobs)
+      JOBS="$2"
+      shift 2
+      ;;
+    --clean)
+      EXTRA_ARGS+=(--clean)
+      shift
+      ;;
+    --compress)
+      EXTRA_ARGS+=(--compress "$2")
+      shift 2
+      ;;
+    --offline)
+      EXTRA_ARGS+=(--offline)
+      shift
+      ;;
+    -h|--help)
+      usage
+      exit 0
+      ;;
+    *)
+      die "Unknown argument: $1"
+      ;;
+  esac
+done
+
+[[ "${JOBS}" =~ ^[1-9][0-9]*$ ]] || die "--jobs must be a positive integer"
+require_cmd make
+
+PAIRS=()
+IFS=',' read -r -a runtime_list <<< "${RUNTIMES}"
+IFS=',' read -r -a arch_list <<< "${ARCHES}"
+for runtime in "${runtime_list[@]}"; do
+  [[ "${runtime}" == "wine" || "${runtime}" == "proton" ]] || die "Unknown runtime: ${runtime}"
+  for arch in "${arch_list[@]}"; do
+    [[ "${arch}" == "x86_64" || "${arch}" == "arm64" ]] || die "Unknown arch: ${arch}"
+    PAIRS+=("${runtime}-${arch}")
+  done
+done
+[[ ${#PAIRS[@]} -gt 0 ]] || die "Nothing to build"
+
+RUN_DIR="${LOG_DIR}/build-all-$(date -u +%Y%m%dT%H%M%SZ)"
+mkdir -p "${RUN_DIR}"
+
+# One target per pair. The "+" hands the jobserver to build_runtime.sh, whose make calls then
+# draw from the shared budget (run_make drops their own -j). Every recipe succeeds and records
+# its exit code, so one failure neither stops the others nor needs -k (which sub-makes inherit).
+MAKEFILE="${RUN_DIR}/Makefile"
+{
+  echo ".PHONY: all ${PAIRS[*]}"
+  echo "all: ${PAIRS[*]}"
+  for pair in "${PAIRS[@]}"; do
+    log_file="${RUN_DIR}/${pair}.log"
+    printf '%s:\n' "${pair}"
+    printf '\t+@start=$$(date +%%s); echo "%s started"; rc=0; \\\n' "${pair}"
+    printf '\t%q --runtime %s --arch %s --jobs %s' "${SCRIPT_DIR}/build_runtime.sh" "${pair%%-*}" "${pair#*-}" "${JOBS}"
+    if [[ ${#EXTRA_ARGS[@]} -gt 0 ]]; then
+      printf ' %q' "${EXTRA_ARGS[@]}"
+    fi
+    printf ' > %q 2>&1 || rc=$$?; \\\n' "${log_file}"
+    printf '\tend=$$(date +%%s); echo "$$rc $$start $$end" > %q; \\\n' "${RUN_DIR}/${pair}.status"
+    printf '\techo "%s finished (exit $$rc, $$((end - start))s)"\n' "${pair}"
+  done
+} > "${MAKEFILE}"
+
+log "INFO" "Building ${PAIRS[*]} with a shared budget of ${JOBS} jobs; logs in ${RUN_DIR}"
+STARTED="$(date +%s)"
+# Drop any outer make's flags so this make starts its own jobserver.
+env -u MAKEFLAGS -u MFLAGS -u MAKELEVEL make --no-print-directory -j"${JOBS}" -f "${MAKEFILE}" all
+FINISHED="$(date +%s)"
+
+FAILED=0
+{
+  printf '%-14s %-8s %8s  %s\n' "BUILD" "STATUS" "TIME" "LOG"
+  for pair in "${PAIRS[@]}"; do
+    status="failed"
+    elapsed="-"
+    if [[ -f "${RUN_DIR}/${pair}.status" ]]; then
+      read -r rc start end < "${RUN_DIR}/${pair}.status"
+      elapsed="$((end - start))s"
+      if [[ "${rc}" == "0" ]]; then
+        status="ok"
+        grep -q "Build finished (cached)" "${RUN_DIR}/${pair}.log" && status="cached"
+      fi
+    fi
+    [[ "${status}" != "failed" ]] || FAILED=$((FAILED + 1))
+    printf '%-14s %-8s %8s  %s\n' "${pair}" "${status}" "${elapsed}" "${RUN_DIR}/${pair}.log"
+  done
+  printf 'Wall time: %ss for %d build(s), %d failed\n' "$((FINISHED - STARTED))" "${#PAIRS[@]}" "${FAILED}"
+} > "${RUN_DIR}/summary.txt"
+cat "${RUN_DIR}/summary.txt"
+
+[[ "${FAILED}" -eq 0 ]]
@@ -5,13 +5,15 @@ SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
 usage() {
   cat <<EOF
-Usage: $0 --runtime <wine|proton> --arch <x86_64|arm64> [--jobs N]
+Usage: $0 --runtime <wine|proton> --arch <x86_64|arm64> [--jobs N] [--clean] [--compress xz|zstd|none] [--offline]
+          [--profile base|perf (wine only)]
 EOF
 }
 
 RUNTIME=""
 ARCH=""
 JOBS="$(nproc)"
+EXTRA_ARGS=()
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -27,6 +29,22 @@ while [[ $# -gt 0 ]]; do
       JOBS="$2"
       shift 2
       ;;
+    --clean)
+      EXTRA_ARGS+=(--clean)
+      shift
+      ;;
+    --compress)
+      EXTRA_ARGS+=(--compress "$2")
+      shift 2
+      ;;
+    --offline)
+      EXTRA_ARGS+=(--offline)
+      shift
+      ;;
+    --profile)
+      [[ "$2" == "base" ]] || EXTRA_ARGS+=(--profile "$2")
+      shift 2
+      ;;
     -h|--help)
       usage
       exit 0
@@ -42,10 +60,10 @@ done
 
 case "${RUNTIME}" in
   wine)
-    exec "${SCRIPT_DIR}/wine/build_wine.sh" --arch "${ARCH}" --jobs "${JOBS}"
+    exec "${SCRIPT_DIR}/wine/build_wine.sh" --arch "${ARCH}" --jobs "${JOBS}" "${EXTRA_ARGS[@]}"
     ;;
   proton)
-    exec "${SCRIPT_DIR}/proton/build_proton.sh" --arch "${ARCH}" --jobs "${JOBS}"
+    exec "${SCRIPT_DIR}/proton/build_proton.sh" --arch "${ARCH}" --jobs "${JOBS}" "${EXTRA_ARGS[@]}"
     ;;
   *)
     echo "Invalid runtime: ${RUNTIME}" >&2
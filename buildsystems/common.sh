@@ -7,6 +7,14 @@ LOG_DIR="${BUILD_ROOT}/logs"
 SRC_DIR="${BUILD_ROOT}/sources"
 BUILD_DIR="${BUILD_ROOT}/build"
 ARTIFACT_DIR="${BUILD_ROOT}/artifacts"
+ARTIFACT_CACHE_DIR="${ARTIFACT_DIR}/cache"
+# Bare mirrors shared by every checkout of the same upstream (both arches, wine and proton
+# submodules); checkouts borrow their objects through alternates instead of cloning again.
+MIRROR_DIR="${SOURCE_MIRROR_DIR:-${SRC_DIR}/mirrors}"
+# History depth fetched for pinned refs; 0 fetches full history.
+SOURCE_DEPTH="${SOURCE_DEPTH:-1}"
+# 1: build from the mirrors alone, never touching the network (see --offline).
+SOURCE_OFFLINE="${SOURCE_OFFLINE:-0}"
 
 mkdir -p "${LOG_DIR}" "${SRC_DIR}" "${BUILD_DIR}" "${ARTIFACT_DIR}"
 
@@ -21,7 +29,8 @@ log() {
 }
 
 die() {
-  log "ERROR" "$*"
+  # stderr, so the message is not swallowed when a helper runs inside $(...)
+  log "ERROR" "$*" >&2
   exit 1
 }
 
@@ -30,20 +39,156 @@ require_cmd() {
   command -v "${cmd}" >/dev/null 2>&1 || die "Required command missing: ${cmd}"
 }
 
+mirror_path() {
+  local url="$1"
+  local name="${url%/}"
+  name="${name##*/}"
+  echo "${MIRROR_DIR}/${name%.git}-$(printf '%s' "${url}" | sha256sum | cut -c1-12).git"
+}
+
+# Make sure the mirror of ${url} holds ${ref} (tag, branch or commit) under refs/pins/ and print
+# the pinned commit. Only that ref is fetched, at SOURCE_DEPTH; a pinned commit is never fetched
+# again. Mirrors are locked so parallel builds can share them.
+fetch_pinned_ref() {
+  local url="$1"
+  local ref="$2"
+  local mirror pin lock_fd
+  mirror="$(mirror_path "${url}")"
+  pin="refs/pins/${ref}"
+
+  mkdir -p "${MIRROR_DIR}"
+  exec {lock_fd}>"${mirror}.lock"
+  flock "${lock_fd}"
+  if [[ ! -d "${mirror}" ]]; then
+    [[ "${SOURCE_OFFLINE}" != "1" ]] || die "Offline build, but no mirror of ${url} in ${MIRROR_DIR}"
+    git init -q --bare "${mirror}"
+    git -C "${mirror}" remote add origin "${url}"
+  fi
+
+  # A commit id pins itself; tags and branches are refreshed unless offline.
+  if [[ ! "${ref}" =~ ^[0-9a-f]{40}$ ]] || ! git -C "${mirror}" cat-file -e "${ref}^{commit}" 2>/dev/null; then
+    if [[ "${SOURCE_OFFLINE}" == "1" ]]; then
+      git -C "${mirror}" rev-parse -q --verify "${pin}^{commit}" >/dev/null \
+        || die "Offline build, but ${ref} of ${url} is not in the mirror ${mirror}"
+      log "INFO" "Offline: using ${ref} from ${mirror}" >&2
+    else
+      local depth_args=()
+      if [[ "${SOURCE_DEPTH}" -gt 0 ]]; then
+        depth_args=(--depth "${SOURCE_DEPTH}")
+      elif [[ -f "${mirror}/shallow" ]]; then
+        depth_args=(--unshallow)
+      fi
+      log "INFO" "Fetching ${ref} from ${url} into ${mirror}" >&2
+      if ! git -C "${mirror}" fetch -q --no-tags "${depth_args[@]}" origin "+${ref}:${pin}"; then
+        # Servers that refuse fetching a bare commit id: fall back to all branches and tags.
+        [[ "${ref}" =~ ^[0-9a-f]{40}$ ]] || die "Cannot fetch ${ref} from ${url}"
+        git -C "${mirror}" fetch -q origin "+refs/heads/*:refs/upstream/heads/*" "+refs/tags/*:refs/upstream/tags/*"
+        git -C "${mirror}" update-ref "${pin}" "${ref}"
+      fi
+    fi
+  fi
+  local commit
+  commit="$(git -C "${mirror}" rev-parse -q --verify "${pin}^{commit}" || git -C "${mirror}" rev-parse -q --verify "${ref}^{commit}")" \
+    || die "${ref} of ${url} not found in ${mirror}"
+  exec {lock_fd}>&-
+  echo "${commit}"
+}
+
+# Check out ${commit} from the mirror of ${url} in ${repo_dir}. The checkout owns no objects: they come from
+# the mirror via objects/info/alternates (and its shallow list), so a checkout costs only its
+# work tree. A standalone clone left by older scripts is replaced.
+checkout_from_mirror() {
+  local url="$1"
+  local repo_dir="$2"
+  local commit="$3"
+  local git_dir="${repo_dir}/.git"
+  local mirror
+  mirror="$(mirror_path "${url}")"
+
+  if [[ -e "${git_dir}" && "$(cat "${git_dir}/objects/info/alternates" 2>/dev/null || true)" != "${mirror}/objects" ]]; then
+    log "INFO" "Replacing standalone clone ${repo_dir} with a mirror-backed checkout"
+    rm -rf "${repo_dir:?}"
+  fi
+  if [[ ! -d "${git_dir}" ]]; then
+    git init -q "${repo_dir}"
+    git -C "${repo_dir}" remote add origin "${url}"
+    echo "${mirror}/objects" > "${git_dir}/objects/info/alternates"
+  fi
+  if [[ -f "${mirror}/shallow" ]]; then
+    cp -f "${mirror}/shallow" "${git_dir}/shallow"
+  else
+    rm -f "${git_dir}/shallow"
+  fi
+
+  if [[ "$(git -C "${repo_dir}" rev-parse -q --verify HEAD || true)" != "${commit}" ]]; then
+    if git -C "${repo_dir}" rev-parse -q --verify HEAD >/dev/null; then
+      # Drop previously applied patches so switching refs cannot conflict with them.
+      git -C "${repo_dir}" reset --hard -q
+    fi
+    git -C "${repo_dir}" checkout -q --detach "${commit}"
+    # -ff also drops checkouts of submodules the new commit no longer has.
+    git -C "${repo_dir}" clean -ffdq
+  fi
+}
+
+# Resolve a relative submodule URL (../foo.git) against the superproject's upstream URL.
+resolve_submodule_url() {
+  local base="${1%/}"
+  local url="$2"
+  case "${url}" in
+    ./*|../*) ;;
+    *)
+      echo "${url}"
+      return
+      ;;
+  esac
+  while [[ "${url}" == ../* || "${url}" == ./* ]]; do
+    if [[ "${url}" == ../* ]]; then
+      base="${base%/*}"
+      url="${url#../}"
+    else
+      url="${url#./}"
+    fi
+  done
+  echo "${base}/${url}"
+}
+
+# Check out every submodule of ${repo_dir} (recursively) at its recorded commit, each through
+# its own mirror, fetching just that commit. Replaces `git submodule update --recursive`.
+update_submodules() {
+  local repo_dir="$1"
+  local upstream_url="$2"
+  [[ -f "${repo_dir}/.gitmodules" ]] || return 0
+
+  git -C "${repo_dir}" submodule init -q
+  local key url name path commit sub_url
+  while read -r key url; do
+    name="${key#submodule.}"
+    name="${name%.url}"
+    path="$(git -C "${repo_dir}" config -f .gitmodules "submodule.${name}.path")"
+    commit="$(git -C "${repo_dir}" ls-tree HEAD -- "${path}" | awk '$2 == "commit" { print $3 }')"
+    [[ -n "${commit}" ]] || continue
+    sub_url="$(resolve_submodule_url "${upstream_url}" "${url}")"
+    fetch_pinned_ref "${sub_url}" "${commit}" >/dev/null
+    checkout_from_mirror "${sub_url}" "${repo_dir}/${path}" "${commit}"
+    update_submodules "${repo_dir}/${path}" "${sub_url}"
+  done < <(git -C "${repo_dir}" config -f .gitmodules --get-regexp '^submodule\..*\.url$')
+}
+
 clone_or_update_repo() {
   local repo_url="$1"
   local repo_dir="$2"
   local git_ref="$3"
-
-  if [[ ! -d "${repo_dir}/.git" ]]; then
-    log "INFO" "Cloning ${repo_url} into ${repo_dir}"
-    git clone --recursive "${repo_url}" "${repo_dir}"
-  fi
+  local commit
 
   log "INFO" "Updating ${repo_dir} to ${git_ref}"
-  git -C "${repo_dir}" fetch --tags --prune origin
-  git -C "${repo_dir}" checkout "${git_ref}"
-  git -C "${repo_dir}" submodule update --init --recursive
+  commit="$(fetch_pinned_ref "${repo_url}" "${git_ref}")"
+  checkout_from_mirror "${repo_url}" "${repo_dir}" "${commit}"
+  update_submodules "${repo_dir}" "${repo_url}"
+}
+
+patch_stamp() {
+  echo "$(git -C "$1" rev-parse --absolute-git-dir)/resolve-patches"
 }
 
 apply_patches() {
@@ -54,18 +199,266 @@ apply_patches() {
   local patches=("${patch_dir}"/*.patch)
   shopt -u nullglob
 
-  if [[ ${#patches[@]} -eq 0 ]]; then
-    log "INFO" "No patches found in ${patch_dir}; skipping"
+  # Source commit plus patch set; if it is already applied the tree is left untouched, so
+  # file mtimes stay put and incremental builds only recompile what really changed.
+  local stamp wanted
+  stamp="$(patch_stamp "${src_dir}")"
+  wanted="$(git -C "${src_dir}" rev-parse HEAD) $(cat /dev/null "${patches[@]}" | sha256sum | cut -d' ' -f1)"
+  if [[ -f "${stamp}" && "$(cat "${stamp}")" == "${wanted}" ]]; then
+    log "INFO" "Patch set already applied to ${src_dir}; leaving sources untouched"
     return
   fi
+  if [[ -f "${stamp}" ]]; then
+    log "INFO" "Patch set changed; resetting ${src_dir} before applying"
+    git -C "${src_dir}" reset --hard -q
+    git -C "${src_dir}" clean -fdq
+  fi
 
+  if [[ ${#patches[@]} -eq 0 ]]; then
+    log "INFO" "No patches found in ${patch_dir}; skipping"
+  fi
   for patch in "${patches[@]}"; do
     log "INFO" "Applying patch ${patch}"
     git -C "${src_dir}" apply --check "${patch}"
     git -C "${src_dir}" apply "${patch}"
   done
+  echo "${wanted}" > "${stamp}"
+}
+
+# Hash of everything that decides what the compiler produces, but not which source it compiles:
+# profile compilers and flags, their versions, plus any extra values (e.g. configure flags).
+toolchain_fingerprint() {
+  {
+    printf '%s\n' "CC=${CC:-}" "CXX=${CXX:-}" "LD=${LD:-}" "CFLAGS=${CFLAGS:-}" "CXXFLAGS=${CXXFLAGS:-}" \
+      "LDFLAGS=${LDFLAGS:-}" "$@"
+    local tool
+    for tool in "${CC:-}" "${CXX:-}"; do
+      if [[ -n "${tool}" ]]; then
+        ${tool} --version 2>/dev/null | sed -n 1p || true
+      fi
+    done
+  } | sha256sum | cut -d' ' -f1
+}
+
+# Toolchain fingerprint plus the patched source state and any extra values (e.g. the effective,
+# cache-wrapped CC/CXX a tree was configured with); a build tree is only reused if it matches.
+build_fingerprint() {
+  local src_dir="$1"
+  local toolchain_fp="$2"
+  shift 2
+  local stamp
+  stamp="$(patch_stamp "${src_dir}")"
+  {
+    echo "${toolchain_fp}"
+    git -C "${src_dir}" rev-parse HEAD
+    cat "${stamp}" 2>/dev/null || true
+    printf '%s\n' "$@"
+  } | sha256sum | cut -d' ' -f1
+}
+
+# Keep ${work_dir} for an incremental build unless --clean was given or its fingerprint differs.
+prepare_build_dir() {
+  local work_dir="$1"
+  local fingerprint="$2"
+  local clean="$3"
+  local stamp="${work_dir}/.resolve-build-fingerprint"
+
+  if [[ "${clean}" == "1" && -d "${work_dir}" ]]; then
+    log "INFO" "--clean given; removing ${work_dir}"
+    rm -rf "${work_dir}"
+  elif [[ -d "${work_dir}" && "$(cat "${stamp}" 2>/dev/null || true)" != "${fingerprint}" ]]; then
+    log "INFO" "Ref, patches, flags or toolchain changed; removing ${work_dir}"
+    rm -rf "${work_dir}"
+  elif [[ -d "${work_dir}" ]]; then
+    log "INFO" "Reusing build tree ${work_dir} (incremental build)"
+  fi
+  mkdir -p "${work_dir}"
+}
+
+build_dir_configured() {
+  [[ -f "$1/.resolve-build-fingerprint" ]]
+}
+
+# Record that ${work_dir} was configured for ${fingerprint}; written after configure succeeds so an
+# interrupted make resumes incrementally while a failed configure starts over.
+mark_build_dir_configured() {
+  echo "$2" > "$1/.resolve-build-fingerprint"
+}
+
+# Wrap CC/CXX with ccache or sccache according to COMPILER_CACHE (auto|ccache|sccache|none) from
+# the profile. Call after the artifact key (the wrapper does not change what gets built) but
+# before the build fingerprint: configure records the wrapped CC, so a tree configured with a
+# different wrapper must not be reused.
+setup_compiler_cache() {
+  local stats_log="$1"
+  local mode="${COMPILER_CACHE:-auto}"
+  COMPILER_CACHE_BIN=""
+
+  case "${mode}" in
+    auto)
+      if command -v ccache >/dev/null 2>&1; then
+        COMPILER_CACHE_BIN="ccache"
+      elif command -v sccache >/dev/null 2>&1; then
+        COMPILER_CACHE_BIN="sccache"
+      fi
+      ;;
+    ccache|sccache)
+      require_cmd "${mode}"
+      COMPILER_CACHE_BIN="${mode}"
+      ;;
+    none)
+      ;;
+    *)
+      die "COMPILER_CACHE must be auto, ccache, sccache or none (got: ${mode})"
+      ;;
+  esac
+
+  if [[ -z "${COMPILER_CACHE_BIN}" ]]; then
+    log "INFO" "Compiler cache: none"
+    return
+  fi
+  CC="${COMPILER_CACHE_BIN} ${CC}"
+  CXX="${COMPILER_CACHE_BIN} ${CXX}"
+  if [[ "${COMPILER_CACHE_BIN}" == "ccache" ]]; then
+    # Paths relative to the repo in cache keys, so hits survive moving the checkout; the stats
+    # log limits the reported numbers to this build.
+    export CCACHE_BASEDIR="${CCACHE_BASEDIR:-${ROOT_DIR}}"
+    export CCACHE_STATSLOG="${stats_log}"
+    : > "${CCACHE_STATSLOG}"
+  else
+    sccache --zero-stats >/dev/null
+  fi
+  log "INFO" "Compiler cache: ${COMPILER_CACHE_BIN} (CC=${CC})"
+}
+
+log_compiler_cache_stats() {
+  case "${COMPILER_CACHE_BIN:-}" in
+    ccache)
+      log "INFO" "ccache statistics for this build:"
+      ccache --show-log-stats -v 2>/dev/null || ccache --show-stats || true
+      ;;
+    sccache)
+      log "INFO" "sccache statistics for this build:"
+      sccache --show-stats || true
+      ;;
+  esac
+}
+
+# Run make with -j${JOBS}, or with no -j at all under a parent jobserver (build_all.sh): an explicit
+# -j would make this build ignore the shared job budget.
+run_make() {
+  if [[ "${MAKEFLAGS:-}" == *"--jobserver-"* ]]; then
+    make "$@"
+  else
+    make -j"${JOBS}" "$@"
+  fi
 }
 
 host_arch() {
   uname -m
 }
+
+compression_ext() {
+  case "$1" in
+    xz) echo "tar.xz" ;;
+    zstd) echo "tar.zst" ;;
+    none) echo "tar" ;;
+    *) die "--compress must be xz, zstd or none (got: $1)" ;;
+  esac
+}
+
+# Content key of a finished runtime: source commit, patch set, profile env and toolchain. Needs
+# the checkout at the wanted ref, but not the patches applied or anything built.
+artifact_key() {
+  local src_dir="$1"
+  local patch_dir="$2"
+  local profile="$3"
+  local toolchain_fp="$4"
+
+  shopt -s nullglob
+  local patches=("${patch_dir}"/*.patch)
+  shopt -u nullglob
+  {
+    git -C "${src_dir}" rev-parse HEAD
+    cat /dev/null "${patches[@]}" | sha256sum
+    sha256sum < "${profile}"
+    echo "${toolchain_fp}"
+  } | sha256sum | cut -d' ' -f1
+}
+
+# Tar ${parent}/${name} into ${parent}/${name}.<ext> with multithreaded compression; print the path.
+pack_artifact() {
+  local parent="$1"
+  local name="$2"
+  local format="$3"
+  local out
+  out="${parent}/${name}.$(compression_ext "${format}")"
+
+  case "${format}" in
+    xz)
+      tar -C "${parent}" -I "xz -T0" -cf "${out}.partial" "${name}"
+      ;;
+    zstd)
+      require_cmd zstd
+      tar -C "${parent}" -I "zstd -T0 -12" -cf "${out}.partial" "${name}"
+      ;;
+    none)
+      tar -C "${parent}" -cf "${out}.partial" "${name}"
+      ;;
+  esac
+  mv -f "${out}.partial" "${out}"
+  echo "${out}"
+}
+
+_link_or_copy() {
+  ln -f "$1" "$2" 2>/dev/null || cp -f "$1" "$2"
+}
+
+# Keep a finished tarball (and its build-info) under the artifact key.
+store_artifact() {
+  local key="$1"
+  local tarball="$2"
+  local build_info="$3"
+  local entry="${ARTIFACT_CACHE_DIR}/${key}"
+
+  mkdir -p "${entry}"
+  _link_or_copy "${tarball}" "${entry}/$(basename "${tarball}")"
+  cp -f "${build_info}" "${entry}/"
+  log "INFO" "Stored artifact ${key:0:16} in ${entry}"
+}
+
+install_tree_matches() {
+  local key="$1"
+  local install_dir="$2"
+  grep -qx "artifact_key=${key}" "${install_dir}"/resolve-*-build-info.txt 2>/dev/null
+}
+
+# Serve ${name} for ${key} without building: from the cache, or by packing an install tree that
+# was built for the same key in another format. Returns 1 when a build is needed.
+reuse_artifact() {
+  local key="$1"
+  local name="$2"
+  local format="$3"
+  local ext cached
+  ext="$(compression_ext "${format}")"
+  cached="${ARTIFACT_CACHE_DIR}/${key}/${name}.${ext}"
+
+  if [[ -f "${cached}" ]]; then
+    log "INFO" "Artifact cache hit for ${name} (key ${key:0:16})"
+    _link_or_copy "${cached}" "${ARTIFACT_DIR}/${name}.${ext}"
+    # Keep the unpacked install tree in step with the tarball.
+    if ! install_tree_matches "${key}" "${ARTIFACT_DIR}/${name}"; then
+      rm -rf "${ARTIFACT_DIR:?}/${name:?}"
+      tar -C "${ARTIFACT_DIR}" -xf "${cached}"
+    fi
+    return 0
+  fi
+  if install_tree_matches "${key}" "${ARTIFACT_DIR}/${name}"; then
+    log "INFO" "Install tree already built for key ${key:0:16}; packing ${ext} only"
+    local tarball
+    tarball="$(pack_artifact "${ARTIFACT_DIR}" "${name}" "${format}")"
+    store_artifact "${key}" "${tarball}" "$(ls "${ARTIFACT_DIR}/${name}"/resolve-*-build-info.txt)"
+    return 0
+  fi
+  return 1
+}
@@ -7,14 +7,25 @@ source "${SCRIPT_DIR}/../common.sh"
 
 usage() {
   cat <<EOF
-Usage: $0 --arch <x86_64|arm64> [--jobs N]
+Usage: $0 --arch <x86_64|arm64> [--jobs N] [--clean] [--compress xz|zstd|none] [--offline]
 
 Builds custom resolve-proton for the selected architecture using Proton sources.
+
+Builds are incremental: the build tree is kept and only rebuilt from scratch when the source
+ref, patches, flags or toolchain change, or with --clean.
+
+Finished tarballs are cached by artifact key (ref, patches, profile, toolchain); a matching
+key returns the cached tarball without building. --clean bypasses the cache.
+
+Sources come from shared bare mirrors (pinned ref only, shallow); --offline builds from the
+mirrors without network access.
 EOF
 }
 
 ARCH=""
 JOBS="$(nproc)"
+CLEAN=0
+COMPRESS="xz"
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -26,6 +37,18 @@ while [[ $# -gt 0 ]]; do
       JOBS="$2"
       shift 2
       ;;
+    --clean)
+      CLEAN=1
+      shift
+      ;;
+    --compress)
+      COMPRESS="$2"
+      shift 2
+      ;;
+    --offline)
+      SOURCE_OFFLINE=1
+      shift
+      ;;
     -h|--help)
       usage
       exit 0
@@ -38,8 +61,10 @@ done
 
 [[ -n "${ARCH}" ]] || die "--arch is required"
 [[ "${ARCH}" == "x86_64" || "${ARCH}" == "arm64" ]] || die "--arch must be x86_64 or arm64"
+compression_ext "${COMPRESS}" >/dev/null
 
 require_cmd git
+require_cmd flock
 require_cmd make
 require_cmd tar
 require_cmd clang
@@ -59,25 +84,48 @@ log "INFO" "Starting ${OUTPUT_NAME} build"
 log "INFO" "Host arch: $(host_arch)"
 
 clone_or_update_repo "${PROTON_REPO}" "${REPO_DIR}" "${PROTON_REF}"
-apply_patches "${REPO_DIR}" "${SCRIPT_DIR}/patches"
 
-rm -rf "${WORK_DIR}" "${INSTALL_DIR}"
-mkdir -p "${WORK_DIR}" "${INSTALL_DIR}"
+TOOLCHAIN_FP="$(toolchain_fingerprint)"
+ARTIFACT_KEY="$(artifact_key "${REPO_DIR}" "${SCRIPT_DIR}/patches" "${PROFILE}" "${TOOLCHAIN_FP}")"
+log "INFO" "Artifact key: ${ARTIFACT_KEY}"
+if [[ "${CLEAN}" != "1" ]] && reuse_artifact "${ARTIFACT_KEY}" "${OUTPUT_NAME}" "${COMPRESS}"; then
+  log "INFO" "Build finished (cached): ${ARTIFACT_DIR}/${OUTPUT_NAME}.$(compression_ext "${COMPRESS}")"
+  exit 0
+fi
 
-pushd "${REPO_DIR}" >/dev/null
+apply_patches "${REPO_DIR}" "${SCRIPT_DIR}/patches"
 
-export CC CXX CFLAGS CXXFLAGS
+setup_compiler_cache "${BUILD_DIR}/${OUTPUT_NAME}.ccache-stats.log"
+BUILD_FP="$(build_fingerprint "${REPO_DIR}" "${TOOLCHAIN_FP}" \
+  "CC=${CC}" "CXX=${CXX}" "COMPILER_CACHE=${COMPILER_CACHE_BIN:-none}")"
+prepare_build_dir "${WORK_DIR}" "${BUILD_FP}" "${CLEAN}"
+rm -rf "${INSTALL_DIR}"
+mkdir -p "${INSTALL_DIR}"
 
 # Proton ships its own build helpers; we use a non-containerized local build path.
 # The exact targets can change across Proton revisions; adjust if your selected ref differs.
-if [[ -x ./configure.sh ]]; then
-  ./configure.sh --no-steam-runtime
+# Refs with configure.sh build out of tree in WORK_DIR (kept between runs); older ones in tree.
+if [[ -x "${REPO_DIR}/configure.sh" ]]; then
+  pushd "${WORK_DIR}" >/dev/null
+else
+  pushd "${REPO_DIR}" >/dev/null
+fi
+
+export CC CXX CFLAGS CXXFLAGS
+
+if [[ -x "${REPO_DIR}/configure.sh" ]]; then
+  if build_dir_configured "${WORK_DIR}"; then
+    log "INFO" "Build tree already configured; skipping configure.sh"
+  else
+    "${REPO_DIR}/configure.sh" --no-steam-runtime
+    mark_build_dir_configured "${WORK_DIR}" "${BUILD_FP}"
+  fi
 fi
 
 if make help >/dev/null 2>&1; then
-  make -j"${JOBS}" redist || make -j"${JOBS}"
+  run_make redist || run_make
 else
-  make -j"${JOBS}"
+  run_make
 fi
 
 # Try common output locations.
@@ -90,16 +138,20 @@ else
 fi
 
 popd >/dev/null
+log_compiler_cache_stats
 
 cat > "${INSTALL_DIR}/resolve-proton-build-info.txt" <<EOF
 output=${OUTPUT_NAME}
 arch=${TARGET_ARCH}
 proton_ref=${PROTON_REF}
+artifact_key=${ARTIFACT_KEY}
+build_fingerprint=${BUILD_FP}
+compiler_cache=${COMPILER_CACHE_BIN:-none}
 built_at=$(now_utc)
 host_arch=$(host_arch)
 EOF
 
-TARBALL="${ARTIFACT_DIR}/${OUTPUT_NAME}.tar.xz"
-tar -C "${ARTIFACT_DIR}" -cJf "${TARBALL}" "${OUTPUT_NAME}"
+TARBALL="$(pack_artifact "${ARTIFACT_DIR}" "${OUTPUT_NAME}" "${COMPRESS}")"
+store_artifact "${ARTIFACT_KEY}" "${TARBALL}" "${INSTALL_DIR}/resolve-proton-build-info.txt"
 
 log "INFO" "Build finished: ${TARBALL}"
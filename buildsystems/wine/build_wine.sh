@@ -7,14 +7,35 @@ source "${SCRIPT_DIR}/../common.sh"
 
 usage() {
   cat <<EOF
-Usage: $0 --arch <x86_64|arm64> [--jobs N]
+Usage: $0 --arch <x86_64|arm64> [--profile base|perf] [--pgo-generate | --pgo-use FILE] [--jobs N]
+          [--clean] [--no-artifact-cache] [--compress xz|zstd|none] [--offline]
 
 Builds custom resolve-wine for the selected architecture.
+
+Builds are incremental: the build tree is kept and only rebuilt from scratch when the source
+ref, patches, flags or toolchain change, or with --clean.
+
+Finished tarballs are cached by artifact key (ref, patches, profile, toolchain); a matching
+key returns the cached tarball without building. --clean bypasses the cache;
+--no-artifact-cache bypasses it but keeps an up-to-date build tree (incremental build).
+
+Sources come from shared bare mirrors (pinned ref only, shallow); --offline builds from the
+mirrors without network access.
+
+--profile perf selects config/resolve-wine-<arch>-perf.env (ThinLTO). --pgo-generate builds an
+instrumented variant (<output>-pgo-gen) and --pgo-use applies merged profile data; see
+build_wine_pgo.sh for the full PGO workflow.
 EOF
 }
 
 ARCH=""
 JOBS="$(nproc)"
+CLEAN=0
+REUSE_ARTIFACT=1
+COMPRESS="xz"
+PROFILE_NAME="base"
+PGO_MODE=""
+PGO_PROFDATA=""
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -26,6 +47,35 @@ while [[ $# -gt 0 ]]; do
       JOBS="$2"
       shift 2
       ;;
+    --clean)
+      CLEAN=1
+      shift
+      ;;
+    --no-artifact-cache)
+      REUSE_ARTIFACT=0
+      shift
+      ;;
+    --compress)
+      COMPRESS="$2"
+      shift 2
+      ;;
+    --offline)
+      SOURCE_OFFLINE=1
+      shift
+      ;;
+    --profile)
+      PROFILE_NAME="$2"
+      shift 2
+      ;;
+    --pgo-generate)
+      PGO_MODE="generate"
+      shift
+      ;;
+    --pgo-use)
+      PGO_MODE="use"
+      PGO_PROFDATA="$2"
+      shift 2
+      ;;
     -h|--help)
       usage
       exit 0
@@ -38,17 +88,48 @@ done
 
 [[ -n "${ARCH}" ]] || die "--arch is required"
 [[ "${ARCH}" == "x86_64" || "${ARCH}" == "arm64" ]] || die "--arch must be x86_64 or arm64"
+compression_ext "${COMPRESS}" >/dev/null
+[[ "${PROFILE_NAME}" == "base" || "${PROFILE_NAME}" == "perf" ]] || die "--profile must be base or perf"
 
 require_cmd git
+require_cmd flock
 require_cmd make
 require_cmd tar
 require_cmd clang
 require_cmd lld
 
 PROFILE="${SCRIPT_DIR}/config/resolve-wine-${ARCH}.env"
+[[ "${PROFILE_NAME}" == "base" ]] || PROFILE="${SCRIPT_DIR}/config/resolve-wine-${ARCH}-${PROFILE_NAME}.env"
 [[ -f "${PROFILE}" ]] || die "Missing profile: ${PROFILE}"
 # shellcheck disable=SC1090
 source "${PROFILE}"
+[[ -z "${AR:-}" ]] || require_cmd "${AR}"
+
+PGO_FLAGS=""
+PGO_INFO="none"
+case "${PGO_MODE}" in
+  generate)
+    # Raw profiles land wherever LLVM_PROFILE_FILE points at run time.
+    OUTPUT_NAME="${OUTPUT_NAME}-pgo-gen"
+    PGO_FLAGS="-fprofile-generate"
+    PGO_INFO="generate"
+    ;;
+  use)
+    [[ -f "${PGO_PROFDATA}" ]] || die "Missing PGO profile data: ${PGO_PROFDATA}"
+    PGO_PROFDATA="$(cd "$(dirname "${PGO_PROFDATA}")" && pwd)/$(basename "${PGO_PROFDATA}")"
+    PGO_FLAGS="-fprofile-use=${PGO_PROFDATA} -Wno-profile-instr-unprofiled -Wno-profile-instr-out-of-date"
+    PGO_INFO="use:$(sha256sum < "${PGO_PROFDATA}" | cut -d' ' -f1)"
+    ;;
+esac
+if [[ -n "${PGO_FLAGS}" ]]; then
+  CFLAGS="${CFLAGS} ${PGO_FLAGS}"
+  CXXFLAGS="${CXXFLAGS} ${PGO_FLAGS}"
+  LDFLAGS="${LDFLAGS} ${PGO_FLAGS}"
+fi
+if [[ "${LDFLAGS}" == *"-flto=thin"* ]]; then
+  # Content-addressed by lld, so it stays valid across rebuilds of the tree.
+  LDFLAGS="${LDFLAGS} -Wl,--thinlto-cache-dir=${BUILD_DIR}/${OUTPUT_NAME}.thinlto-cache"
+fi
 
 REPO_DIR="${SRC_DIR}/${OUTPUT_NAME}-src"
 WORK_DIR="${BUILD_DIR}/${OUTPUT_NAME}"
@@ -60,30 +141,58 @@ log "INFO" "Starting ${OUTPUT_NAME} build"
 log "INFO" "Host arch: $(host_arch)"
 
 clone_or_update_repo "${WINE_REPO}" "${REPO_DIR}" "${WINE_REF}"
+
+TOOLCHAIN_FP="$(toolchain_fingerprint "CONFIGURE_FLAGS=${CONFIGURE_FLAGS}" "PREFIX=${INSTALL_DIR}" \
+  "AR=${AR:-}" "RANLIB=${RANLIB:-}" "PGO=${PGO_INFO}")"
+ARTIFACT_KEY="$(artifact_key "${REPO_DIR}" "${SCRIPT_DIR}/patches" "${PROFILE}" "${TOOLCHAIN_FP}")"
+log "INFO" "Artifact key: ${ARTIFACT_KEY}"
+if [[ "${CLEAN}" != "1" && "${REUSE_ARTIFACT}" == "1" ]] && reuse_artifact "${ARTIFACT_KEY}" "${OUTPUT_NAME}" "${COMPRESS}"; then
+  log "INFO" "Build finished (cached): ${ARTIFACT_DIR}/${OUTPUT_NAME}.$(compression_ext "${COMPRESS}")"
+  exit 0
+fi
+
 apply_patches "${REPO_DIR}" "${SCRIPT_DIR}/patches"
 
-rm -rf "${WORK_DIR}" "${INSTALL_DIR}"
-mkdir -p "${WORK_DIR}" "${INSTALL_DIR}"
+setup_compiler_cache "${BUILD_DIR}/${OUTPUT_NAME}.ccache-stats.log"
+BUILD_FP="$(build_fingerprint "${REPO_DIR}" "${TOOLCHAIN_FP}" \
+  "CC=${CC}" "CXX=${CXX}" "COMPILER_CACHE=${COMPILER_CACHE_BIN:-none}")"
+prepare_build_dir "${WORK_DIR}" "${BUILD_FP}" "${CLEAN}"
+# Per build tree: configure refuses a cache recorded with a different CC, and the tree is only
+# kept while the ref, toolchain and compiler wrapper are unchanged.
+CONFIG_CACHE="${WORK_DIR}/config.cache"
+rm -rf "${INSTALL_DIR}"
+mkdir -p "${INSTALL_DIR}"
 
 pushd "${WORK_DIR}" >/dev/null
 
-export CC CXX LD CFLAGS CXXFLAGS LDFLAGS
+export CC CXX LD AR RANLIB CFLAGS CXXFLAGS LDFLAGS
 
-"${REPO_DIR}/configure" --prefix="${INSTALL_DIR}" ${CONFIGURE_FLAGS}
-make -j"${JOBS}"
+if build_dir_configured "${WORK_DIR}"; then
+  log "INFO" "Build tree already configured; skipping configure"
+else
+  "${REPO_DIR}/configure" --prefix="${INSTALL_DIR}" --cache-file="${CONFIG_CACHE}" ${CONFIGURE_FLAGS}
+  mark_build_dir_configured "${WORK_DIR}" "${BUILD_FP}"
+fi
+run_make
 make install
 
 popd >/dev/null
+log_compiler_cache_stats
 
 cat > "${INSTALL_DIR}/resolve-wine-build-info.txt" <<EOF
 output=${OUTPUT_NAME}
 arch=${TARGET_ARCH}
+profile=${PROFILE_NAME}
+pgo=${PGO_INFO}
 wine_ref=${WINE_REF}
+artifact_key=${ARTIFACT_KEY}
+build_fingerprint=${BUILD_FP}
+compiler_cache=${COMPILER_CACHE_BIN:-none}
 built_at=$(now_utc)
 host_arch=$(host_arch)
 EOF
 
-TARBALL="${ARTIFACT_DIR}/${OUTPUT_NAME}.tar.xz"
-tar -C "${ARTIFACT_DIR}" -cJf "${TARBALL}" "${OUTPUT_NAME}"
+TARBALL="$(pack_artifact "${ARTIFACT_DIR}" "${OUTPUT_NAME}" "${COMPRESS}")"
+store_artifact "${ARTIFACT_KEY}" "${TARBALL}" "${INSTALL_DIR}/resolve-wine-build-info.txt"
 
 log "INFO" "Build finished: ${TARBALL}"
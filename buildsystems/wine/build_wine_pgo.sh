@@ -0,0 +1,158 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+# shellcheck source=../common.sh
+source "${SCRIPT_DIR}/../common.sh"
+
+usage() {
+  cat <<EOF
+Usage: $0 --arch <x86_64|arm64> [--jobs N] [--profdata FILE] [--no-bench] [--clean]
+          [--compress xz|zstd|none] [--offline]
+
+Builds the optimized resolve-wine (perf profile: ThinLTO + PGO) in three stages:
+  1. instrumented build (<output>-pgo-gen)
+  2. training: the profile's PGO_TRAINING_TESTS conformance tests, run headless from the
+     instrumented build tree; raw profiles are merged with llvm-profdata
+  3. final build with the merged profile (<output>)
+Then the baseline profile is built (usually an artifact cache hit) and both runtimes are compared
+with benchmarks/bench_wine_runtime.py; the report is written next to the artifacts.
+
+--profdata FILE skips stages 1 and 2 and reuses existing profile data. Training runs the
+target's binaries, so it needs a host of the same architecture.
+EOF
+}
+
+ARCH=""
+JOBS="$(nproc)"
+PROFDATA=""
+BENCH=1
+PASS_ARGS=()
+
+while [[ $# -gt 0 ]]; do
+  case "$1" in
+    --arch)
+      ARCH="$2"
+      shift 2
+      ;;
+    --jobs)
+      JOBS="$2"
+      shift 2
+      ;;
+    --profdata)
+      PROFDATA="$2"
+      shift 2
+      ;;
+    --no-bench)
+      BENCH=0
+      shift
+      ;;
+    --clean)
+      PASS_ARGS+=(--clean)
+      shift
+      ;;
+    --compress)
+      PASS_ARGS+=(--compress "$2")
+      shift 2
+      ;;
+    --offline)
+      PASS_ARGS+=(--offline)
+      shift
+      ;;
+    -h|--help)
+      usage
+      exit 0
+      ;;
+    *)
+      die "Unknown argument: $1"
+      ;;
+  esac
+done
+
+[[ -n "${ARCH}" ]] || die "--arch is required"
+[[ "${ARCH}" == "x86_64" || "${ARCH}" == "arm64" ]] || die "--arch must be x86_64 or arm64"
+
+PERF_PROFILE="${SCRIPT_DIR}/config/resolve-wine-${ARCH}-perf.env"
+[[ -f "${PERF_PROFILE}" ]] || die "Missing profile: ${PERF_PROFILE}"
+# shellcheck disable=SC1090
+source "${PERF_PROFILE}"
+PERF_NAME="${OUTPUT_NAME}"
+GEN_WORK_DIR="${BUILD_DIR}/${PERF_NAME}-pgo-gen"
+PGO_DIR="${BUILD_DIR}/${PERF_NAME}.pgo"
+
+LOG_FILE="${LOG_DIR}/${PERF_NAME}-pgo.log"
+exec > >(tee -a "${LOG_FILE}") 2>&1
+log "INFO" "Starting PGO build of ${PERF_NAME}"
+
+build() {
+  "${SCRIPT_DIR}/build_wine.sh" --arch "${ARCH}" --jobs "${JOBS}" "${PASS_ARGS[@]}" "$@"
+}
+
+train() {
+  local host
+  host="$(host_arch)"
+  [[ "${host}" == "${ARCH}" || ( "${host}" == "aarch64" && "${ARCH}" == "arm64" ) ]] \
+    || die "PGO training for ${ARCH} needs a ${ARCH} host (this is ${host}); pass --profdata instead"
+  require_cmd llvm-profdata
+
+  rm -rf "${PGO_DIR:?}"
+  mkdir -p "${PGO_DIR}/raw"
+  local targets=()
+  local dir
+  for dir in ${PGO_TRAINING_TESTS}; do
+    targets+=("${dir}/test")
+  done
+  log "INFO" "Training on: ${PGO_TRAINING_TESTS}"
+
+  # Test failures do not matter here, only the code paths they run. %m keeps one raw file per
+  # binary and merges concurrent writers into it.
+  (
+    cd "${GEN_WORK_DIR}"
+    unset DISPLAY WAYLAND_DISPLAY
+    export WINEPREFIX="${PGO_DIR}/prefix" WINEDEBUG=-all WINEDLLOVERRIDES="mscoree,mshtml="
+    export LLVM_PROFILE_FILE="${PGO_DIR}/raw/%m.profraw"
+    run_make -k "${targets[@]}" || log "WARN" "Some training tests failed; their profile data is still used"
+    # The wineserver writes its profile when it exits.
+    ./server/wineserver -w || true
+  )
+
+  shopt -s nullglob
+  local raw=("${PGO_DIR}/raw"/*.profraw)
+  shopt -u nullglob
+  [[ ${#raw[@]} -gt 0 ]] || die "Training produced no profile data in ${PGO_DIR}/raw"
+  PROFDATA="${PGO_DIR}/${PERF_NAME}.profdata"
+  llvm-profdata merge -o "${PROFDATA}" "${raw[@]}"
+  log "INFO" "Merged ${#raw[@]} raw profile(s) into ${PROFDATA}"
+}
+
+if [[ -z "${PROFDATA}" ]]; then
+  log "INFO" "Stage 1/3: instrumented build"
+  # Training runs from the build tree, so never take an artifact cache hit here: that would
+  # leave a tree from an older ref in place. build_wine.sh drops a tree whose fingerprint does
+  # not match the current ref and toolchain, and otherwise just brings it up to date.
+  build --profile perf --pgo-generate --no-artifact-cache
+  build_dir_configured "${GEN_WORK_DIR}" || die "Instrumented build tree missing: ${GEN_WORK_DIR}"
+  log "INFO" "Stage 2/3: training run"
+  train
+else
+  [[ -f "${PROFDATA}" ]] || die "Missing profile data: ${PROFDATA}"
+  log "INFO" "Using existing profile data ${PROFDATA}; skipping instrumented build and training"
+fi
+
+log "INFO" "Stage 3/3: optimized build"
+build --profile perf --pgo-use "${PROFDATA}"
+
+if [[ "${BENCH}" == "1" ]]; then
+  log "INFO" "Building baseline profile for comparison"
+  build --profile base
+  # shellcheck disable=SC1090
+  source "${SCRIPT_DIR}/config/resolve-wine-${ARCH}.env"
+  "${PYTHON:-python3}" "${ROOT_DIR}/benchmarks/bench_wine_runtime.py" \
+    --baseline "${ARTIFACT_DIR}/${OUTPUT_NAME}" \
+    --candidate "${ARTIFACT_DIR}/${PERF_NAME}" \
+    --out "${ARTIFACT_DIR}/${PERF_NAME}-bench.json" \
+    --report "${ARTIFACT_DIR}/${PERF_NAME}-bench.md"
+  log "INFO" "Benchmark report: ${ARTIFACT_DIR}/${PERF_NAME}-bench.md"
+fi
+
+log "INFO" "PGO build finished: ${ARTIFACT_DIR}/${PERF_NAME}"
@@ -2,42 +2,99 @@ from __future__ import annotations
 
 import logging
 import shutil
-import subprocess
 import sys
 from pathlib import Path
 from typing import Dict
 
+from .dlcache import OFFLINE_ENV, DownloadCache
+from .dllstore import DllStore, load_manifest, save_manifest
 from .envcfg import prefix_dir
-from .models import RunnerConfig, TargetConfig
-from .runner import runner_exec
-
+from .executor import stream_process
+from .fsutil import file_identity
+from .models import RunnerConfig, StepLimits, TargetConfig
+from .registry import (
+    RegKey,
+    apply_offline,
+    can_edit_offline,
+    missing_tweaks,
+    resolve_tweaks,
+    to_regedit,
+    wineserver_running,
+)
+from .runner import runner_exec, wineserver_bin
+from .tracing import current as current_tracer
+
+# Proton winetricks does not support "dx10"/"dx11" verbs; keep to stable verbs.
+WINETRICKS_VERBS = ("win10", "vcrun2019")
+
+
+def run_cmd(
+    cmd: list[str],
+    env: Dict[str, str],
+    step: str,
+    limits: StepLimits | None = None,
+    runner: RunnerConfig | None = None,
+) -> None:
+    """Run one external step, streaming its output to the log.
 
-def run_cmd(cmd: list[str], env: Dict[str, str], step: str) -> None:
+    With ``runner`` set, a step that hits its limits also gets ``wineserver -k`` for the prefix.
+    """
     logging.info("[%s] Running: %s", step, " ".join(cmd))
-    result = subprocess.run(cmd, env=env, capture_output=True, text=True)
-
-    if result.stdout:
-        logging.info("[%s] stdout:\n%s", step, result.stdout.strip())
-    if result.stderr:
-        logging.info("[%s] stderr:\n%s", step, result.stderr.strip())
-
+    kill_cmd = [wineserver_bin(runner), "-k"] if runner is not None else None
+    tracer = current_tracer()
+    started = tracer.now() if tracer else 0.0
+    result = stream_process(cmd, env, step, limits, kill_cmd)
+    if tracer is not None:
+        tracer.record_process(step, cmd, started, tracer.now(), result.returncode, result.max_rss_kb)
+
+    if result.timed_out:
+        raise RuntimeError(f"Step '{step}' timed out: {result.timed_out}")
     if result.returncode != 0:
+        for line in list(result.tail)[-20:]:
+            logging.error("[%s] %s", step, line)
         raise RuntimeError(f"Step '{step}' failed with exit code {result.returncode}")
 
 
-def create_prefix(target: TargetConfig, prefix_root: Path, runner: RunnerConfig, env: Dict[str, str]) -> None:
+def create_prefix(
+    target: TargetConfig,
+    prefix_root: Path,
+    runner: RunnerConfig,
+    env: Dict[str, str],
+    limits: StepLimits | None = None,
+) -> None:
     (prefix_root / target.target).mkdir(parents=True, exist_ok=True)
-    run_cmd(runner_exec(runner, ["wineboot", "-u"]), env, "create-prefix")
+    run_cmd(runner_exec(runner, ["wineboot", "-u"]), env, "create-prefix", limits, runner)
 
 
-def install_dependencies(winetricks_bin: str, runner: RunnerConfig, env: Dict[str, str]) -> None:
+def install_dependencies(
+    winetricks_bin: str,
+    runner: RunnerConfig,
+    env: Dict[str, str],
+    limits: StepLimits | None = None,
+    cache: DownloadCache | None = None,
+    offline: bool = False,
+) -> None:
     dep_env = env.copy()
     if runner.runner == "proton":
         proton_cmd = f"{runner.proton_bin} run"
         dep_env["WINE"] = proton_cmd
         dep_env["WINE64"] = proton_cmd
-    # Proton winetricks does not support "dx10"/"dx11" verbs; keep to stable verbs.
-    run_cmd([winetricks_bin, "-q", "win10", "vcrun2019"], dep_env, "install-dependencies")
+    if offline:
+        dep_env.update(OFFLINE_ENV)
+    cmd = [winetricks_bin, "-q", *WINETRICKS_VERBS]
+    if cache is None:
+        if offline:
+            raise RuntimeError("--offline requires the winetricks download cache")
+        run_cmd(cmd, dep_env, "install-dependencies", limits, runner)
+        return
+    with cache.view(WINETRICKS_VERBS, offline) as w_cache:
+        dep_env["W_CACHE"] = str(w_cache)
+        run_cmd(cmd, dep_env, "install-dependencies", limits, runner)
+
+
+def wait_wineserver(runner: RunnerConfig, env: Dict[str, str], limits: StepLimits | None = None) -> None:
+    """Block until the prefix's wineserver has exited and flushed the registry."""
+    run_cmd([wineserver_bin(runner), "-w"], env, "wineserver-wait", limits)
 
 
 def copy_dlls(
@@ -48,6 +105,9 @@ def copy_dlls(
     opencl: Path | None,
     nvcuda: Path | None,
     gpu_type: str,
+    interactive: bool = True,
+    store: DllStore | None = None,
+    placement: str = "auto",
 ) -> None:
     system32 = prefix_dir(prefix_root, target, runner) / "drive_c" / "windows" / "system32"
     if not system32.exists():
@@ -55,91 +115,110 @@ def copy_dlls(
     if not directml.exists():
         raise RuntimeError(f"directml.dll not found: {directml}")
 
-    shutil.copy2(directml, system32 / "directml.dll")
-    logging.info("Copied directml.dll to %s", system32)
-
-    dst_opencl = system32 / "opencl.dll"
-    if dst_opencl.exists():
-        logging.info("opencl.dll already exists at %s, skipping copy", dst_opencl)
-    else:
-        source_opencl = opencl
-        if source_opencl is None and sys.stdin.isatty():
-            user_input = input(
-                "opencl.dll not found in prefix. Enter path to opencl.dll (or press Enter to skip): "
-            ).strip()
-            if user_input:
-                source_opencl = Path(user_input).expanduser()
-
-        if source_opencl is None:
-            logging.warning("opencl.dll not provided; OpenCL features may not work.")
-        elif not source_opencl.exists():
-            logging.warning("Provided opencl.dll path does not exist: %s", source_opencl)
-        else:
-            shutil.copy2(source_opencl, dst_opencl)
-            logging.info("Copied opencl.dll to %s", system32)
+    target_dir = prefix_root / target.target
+    manifest = load_manifest(target_dir) if store is not None else {}
 
-    if target.arch == "x86_64":
-        dst_nvcuda = system32 / "nvcuda.dll"
-        if dst_nvcuda.exists():
-            logging.info("nvcuda.dll already exists at %s, skipping copy", dst_nvcuda)
-            return
-        if nvcuda is None:
-            logging.warning(
-                "nvcuda.dll not found/provided; continuing without CUDA. "
-                "Resolve may fall back to non-CUDA GPU paths."
-            )
-            return
-        if not nvcuda.exists():
-            logging.warning(
-                "nvcuda.dll path was provided but file does not exist: %s. "
-                "Continuing without CUDA.",
-                nvcuda,
-            )
+    def put(src: Path, dst: Path) -> None:
+        if store is None:
+            shutil.copy2(src, dst)
+            logging.info("Copied %s to %s", dst.name, system32)
             return
-        if gpu_type != "nvidia":
-            logging.info("Copying optional nvcuda.dll while gpu-type=%s (experimental)", gpu_type)
-        shutil.copy2(nvcuda, dst_nvcuda)
-        logging.info("Copied nvcuda.dll to %s", system32)
+        digest = store.ingest(src)
+        method = store.place(digest, dst, placement)
+        manifest[str(dst.relative_to(target_dir))] = {"sha256": digest, "mode": method}
+        logging.info("Placed %s in %s (%s, sha256 %s)", dst.name, system32, method, digest[:12])
 
+    try:
+        put(directml, system32 / "directml.dll")
 
-def apply_registry(prefix_root: Path, target: TargetConfig, runner: RunnerConfig, env: Dict[str, str]) -> None:
+        dst_opencl = system32 / "opencl.dll"
+        if dst_opencl.exists():
+            logging.info("opencl.dll already exists at %s, skipping copy", dst_opencl)
+        else:
+            source_opencl = opencl
+            if source_opencl is None and interactive and sys.stdin.isatty():
+                user_input = input(
+                    "opencl.dll not found in prefix. Enter path to opencl.dll (or press Enter to skip): "
+                ).strip()
+                if user_input:
+                    source_opencl = Path(user_input).expanduser()
+
+            if source_opencl is None:
+                logging.warning("opencl.dll not provided; OpenCL features may not work.")
+            elif not source_opencl.exists():
+                logging.warning("Provided opencl.dll path does not exist: %s", source_opencl)
+            else:
+                put(source_opencl, dst_opencl)
+
+        if target.arch == "x86_64":
+            dst_nvcuda = system32 / "nvcuda.dll"
+            if dst_nvcuda.exists():
+                logging.info("nvcuda.dll already exists at %s, skipping copy", dst_nvcuda)
+                return
+            if nvcuda is None:
+                logging.warning(
+                    "nvcuda.dll not found/provided; continuing without CUDA. "
+                    "Resolve may fall back to non-CUDA GPU paths."
+                )
+                return
+            if not nvcuda.exists():
+                logging.warning(
+                    "nvcuda.dll path was provided but file does not exist: %s. "
+                    "Continuing without CUDA.",
+                    nvcuda,
+                )
+                return
+            if gpu_type != "nvidia":
+                logging.info("Copying optional nvcuda.dll while gpu-type=%s (experimental)", gpu_type)
+            put(nvcuda, dst_nvcuda)
+    finally:
+        if manifest:
+            save_manifest(target_dir, manifest)
+
+
+def registry_tweaks(target: TargetConfig) -> tuple[RegKey, ...]:
+    """Return the Resolve registry tweaks for ``target``."""
+    return resolve_tweaks(include_cuda=target.arch == "x86_64")
+
+
+def apply_registry(
+    prefix_root: Path,
+    target: TargetConfig,
+    runner: RunnerConfig,
+    env: Dict[str, str],
+    limits: StepLimits | None = None,
+    keys: tuple[RegKey, ...] | None = None,
+) -> None:
+    """Apply the Resolve tweaks, editing the hives directly when no wineserver holds them.
+
+    The offline path avoids starting wine just for ``regedit``; a prefix whose server will not
+    exit (or that has no hives yet) still goes through ``regedit /S``.
+    """
+    keys = keys if keys is not None else registry_tweaks(target)
     target_prefix = prefix_dir(prefix_root, target, runner)
+    if can_edit_offline(target_prefix):
+        if wineserver_running(target_prefix):
+            try:
+                wait_wineserver(runner, env, limits)
+            except RuntimeError as exc:
+                logging.warning("wineserver did not exit (%s)", exc)
+        if not wineserver_running(target_prefix):
+            missing = missing_tweaks(target_prefix, keys)
+            if not missing:
+                logging.info("Registry tweaks already present in %s", target_prefix)
+                return
+            changed = apply_offline(target_prefix, keys)
+            logging.info("Wrote %d registry value(s) to the hives of %s", changed, target_prefix)
+            return
+        logging.info("wineserver still running for %s; applying registry tweaks with regedit", target_prefix)
+
     reg_file = target_prefix / "resolve-tweaks.reg"
-    include_cuda = target.arch == "x86_64"
-
-    lines = [
-        "REGEDIT4",
-        "",
-        "[HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides]",
-        '"directml"="native,builtin"',
-    ]
-    if include_cuda:
-        lines.append('"nvcuda"="native,builtin"')
-
-    lines.extend(
-        [
-            "",
-            "[HKEY_CURRENT_USER\\Software\\Wine\\Direct3D]",
-            '"renderer"="vulkan"',
-            '"csmt"="enabled"',
-            '"VideoMemorySize"="0"',
-            "",
-            "[HKEY_CURRENT_USER\\Control Panel\\Desktop]",
-            '"LogPixels"=dword:00000060',
-            "",
-            "[HKEY_CURRENT_USER\\Software\\Microsoft\\Windows NT\\CurrentVersion\\AppCompatFlags\\Layers]",
-            '"C:\\\\Program Files\\\\Blackmagic Design\\\\DaVinci Resolve\\\\Resolve.exe"="~ HIGHDPIAWARE DISABLEDXMAXIMIZEDWINDOWEDMODE"',
-            "",
-            "[HKEY_LOCAL_MACHINE\\Software\\Microsoft\\Windows NT\\CurrentVersion\\Multimedia\\SystemProfile]",
-            '"SystemResponsiveness"=dword:0000000a',
-            "",
-        ]
-    )
-    reg_file.write_text("\n".join(lines), encoding="utf-8")
-    run_cmd(runner_exec(runner, ["regedit", "/S", str(reg_file)]), env, "apply-registry")
-
-
-def run_installer(installer: Path, runner: RunnerConfig, env: Dict[str, str]) -> None:
+    reg_file.write_text(to_regedit(keys), encoding="utf-8")
+    run_cmd(runner_exec(runner, ["regedit", "/S", str(reg_file)]), env, "apply-registry", limits, runner)
+
+
+def verify_installer(installer: Path) -> str:
+    """Reject installers that cannot work before any wine step runs; return the file identity."""
     if not installer.exists():
         raise RuntimeError(f"Installer not found: {installer}")
     if installer.suffix.lower() == ".run":
@@ -147,4 +226,17 @@ def run_installer(installer: Path, runner: RunnerConfig, env: Dict[str, str]) ->
             f"Unsupported installer format: {installer}. "
             "Use the Windows DaVinci Resolve installer (.exe), not the Linux .run package."
         )
-    run_cmd(runner_exec(runner, [str(installer)]), env, "run-installer-exe")
+    with open(installer, "rb") as handle:
+        if handle.read(2) != b"MZ":
+            raise RuntimeError(f"Installer is not a Windows executable (missing MZ header): {installer}")
+    return file_identity(installer)
+
+
+def run_installer(
+    installer: Path,
+    runner: RunnerConfig,
+    env: Dict[str, str],
+    limits: StepLimits | None = None,
+) -> None:
+    verify_installer(installer)
+    run_cmd(runner_exec(runner, [str(installer)]), env, "run-installer-exe", limits, runner)
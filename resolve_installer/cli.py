@@ -2,39 +2,32 @@ from __future__ import annotations
 
 import argparse
 import logging
+import os
 import sys
+from contextlib import nullcontext
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from .actions import apply_registry, copy_dlls, create_prefix, install_dependencies, run_installer
-from .envcfg import base_env, detect_vulkan_support
 from .logging_utils import setup_logging
 from .lutris_paths import detect_lutris_cache_dir, lutris_cache_candidates
-from .models import TARGETS, TargetConfig
-from .runner import select_runner
-from .yamlgen import generate_combined_yaml
+from .models import (
+    CLONE_MODES,
+    DEDUPE_MODES,
+    GPU_TYPES,
+    INSTALL_STEPS,
+    LAUNCH_PROFILES,
+    SYNC_MODES,
+    TARGETS,
+    VULKAN_MODES,
+    SyncChoice,
+    TargetConfig,
+)
 
+if TYPE_CHECKING:
+    from .topology import LaunchTuning
 
-def install_release(
-    cfg: TargetConfig,
-    runner,
-    installer: Path,
-    directml_dll: Path,
-    opencl_dll: Path | None,
-    nvcuda_dll: Path | None,
-    prefix_root: Path,
-    winetricks_bin: str,
-    gpu_type: str,
-    vk_icd: str | None,
-    vulkan_supported: bool,
-) -> None:
-    env = base_env(prefix_root, cfg, runner, vk_icd, vulkan_supported)
-    logging.info("Installing %s with runner=%s", cfg.target, runner.runner)
-    create_prefix(cfg, prefix_root, runner, env)
-    install_dependencies(winetricks_bin, runner, env)
-    copy_dlls(prefix_root, cfg, runner, directml_dll, opencl_dll, nvcuda_dll, gpu_type)
-    run_installer(installer, runner, env)
-    apply_registry(prefix_root, cfg, runner, env)
-    logging.info("Install sequence complete for %s", cfg.target)
+# Everything else is imported inside the branch of main() that needs it: this module is
+# loaded for --help and --print-lutris-paths from Lutris hooks, where startup time shows.
 
 
 def generate_yaml_files(
@@ -45,11 +38,26 @@ def generate_yaml_files(
     wine_version: str,
     proton_version: str,
     vulkan_supported: bool,
+    extra_env: dict[str, str] | None = None,
+    sync: SyncChoice | None = None,
+    launch: LaunchTuning | None = None,
 ) -> None:
+    from .yamlgen import generate_combined_yaml
+
     output_dir.mkdir(parents=True, exist_ok=True)
     out = output_dir / "davinci-resolve.yml"
     out.write_text(
-        generate_combined_yaml(targets, prefix_root, runner, wine_version, proton_version, vulkan_supported),
+        generate_combined_yaml(
+            targets,
+            prefix_root,
+            runner,
+            wine_version,
+            proton_version,
+            vulkan_supported,
+            extra_env,
+            sync,
+            launch,
+        ),
         encoding="utf-8",
     )
     logging.info("Generated %s", out)
@@ -57,30 +65,317 @@ def generate_yaml_files(
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="DaVinci Resolve modular Wine/Proton installer + Lutris YAML generator")
-    parser.add_argument("--action", choices=["install", "generate", "both"], default="both")
+    parser.add_argument(
+        "--action",
+        choices=["install", "generate", "both", "matrix", "dedupe", "verify-dlls", "repair-dlls"],
+        default="both",
+    )
     parser.add_argument("--target", choices=["all", *TARGETS.keys()], default="all")
     parser.add_argument("--runner", choices=["wine", "proton"], default="wine")
 
     parser.add_argument("--installer", type=Path, help="Path to DaVinci Resolve Windows installer (.exe)")
+    parser.add_argument(
+        "--studio-installer",
+        type=Path,
+        help="Installer for studio targets when installing several targets (defaults to --installer)",
+    )
     parser.add_argument("--directml-dll", type=Path, help="Path to directml.dll")
+    parser.add_argument(
+        "--directml-dll-arm64",
+        type=Path,
+        help="directml.dll for ARM64 targets when installing several targets (defaults to --directml-dll)",
+    )
     parser.add_argument("--opencl-dll", type=Path, help="Optional path to opencl.dll")
     parser.add_argument("--nvcuda-dll", type=Path, help="Optional path to nvcuda.dll (x86_64 only)")
 
-    parser.add_argument("--wine-bin", default="wine", help="Wine binary path")
+    parser.add_argument("--wine-bin", default=None, help="Wine binary path (default: wine)")
     parser.add_argument("--proton-bin", default=None, help="Proton binary path")
+    parser.add_argument(
+        "--auto-runner",
+        action="store_true",
+        help="Fill --wine-bin/--proton-bin and --wine-version/--proton-version that were not given "
+        "from the discovered runners (see --list-runners)",
+    )
+    parser.add_argument(
+        "--list-runners",
+        action="store_true",
+        help="List Wine/Proton runners from Lutris, Steam and buildsystems/artifacts and exit",
+    )
     parser.add_argument("--winetricks-bin", default="winetricks", help="winetricks binary path")
 
     parser.add_argument("--prefix-root", type=Path, default=Path.home() / "Games")
     parser.add_argument("--output-dir", type=Path, default=Path.cwd())
     parser.add_argument("--wine-version", default="")
     parser.add_argument("--proton-version", default="")
-    parser.add_argument("--gpu-type", choices=["nvidia", "amd", "intel", "arm", "unknown"], default="unknown")
+    parser.add_argument("--gpu-type", choices=GPU_TYPES, default="unknown")
     parser.add_argument("--vk-icd", default=None)
+    parser.add_argument("--matrix-manifest", type=Path, help="YAML/JSON manifest of variants for --action matrix")
+    parser.add_argument("--matrix-jobs", type=int, default=None, help="Worker processes for --action matrix")
+    parser.add_argument(
+        "--vulkan",
+        choices=VULKAN_MODES,
+        default="auto",
+        help="auto: probe vulkaninfo (cached per ICD state); on/off: skip probing and force DXVK/VKD3D",
+    )
+    parser.add_argument(
+        "--sync",
+        choices=SYNC_MODES,
+        default="auto",
+        help="Wine sync backend; auto picks the fastest the host supports (/dev/ntsync, futex_waitv, fd limit)",
+    )
+    parser.add_argument(
+        "--launch-profile",
+        choices=LAUNCH_PROFILES,
+        default="none",
+        help="Tune the generated game config for the host topology: render (all cores) or playback "
+        "(fast cores near the GPU); adds WINE_CPU_TOPOLOGY, GPU selection, affinity and gamemode",
+    )
+    parser.add_argument(
+        "--host-topology",
+        type=Path,
+        default=None,
+        help="Use this topology JSON (from --print-host-topology) instead of probing the current host",
+    )
+    parser.add_argument(
+        "--print-host-topology", action="store_true", help="Print the detected CPU/GPU topology as JSON and exit"
+    )
     parser.add_argument("--log-file", type=Path, default=Path.cwd() / "resolve-installer.log")
+    parser.add_argument(
+        "--step-timeout",
+        action="append",
+        default=[],
+        metavar="[STEP=]SECONDS",
+        help=f"Wall-clock limit for external steps (repeatable; STEP is one of: {', '.join(INSTALL_STEPS)})",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        action="append",
+        default=[],
+        metavar="[STEP=]SECONDS",
+        help="Kill a step after this long without any output (repeatable)",
+    )
+    parser.add_argument(
+        "--persistent-wineserver",
+        action="store_true",
+        help="Keep one wineserver per prefix running across all install steps",
+    )
+    parser.add_argument(
+        "--download-cache",
+        type=Path,
+        help="Shared content-addressed cache of winetricks downloads (default: ~/.cache/resolve-installer/winetricks)",
+    )
+    parser.add_argument("--no-download-cache", action="store_true", help="Let winetricks use its own cache")
+    parser.add_argument(
+        "--download-cache-seed",
+        type=Path,
+        help="Import a winetricks-style cache directory (<verb>/<file>) before installing",
+    )
+    parser.add_argument(
+        "--download-cache-max-mb",
+        type=int,
+        default=2048,
+        help="Evict least-recently-used downloads above this size",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Never touch the network; fail if the download cache lacks a required file",
+    )
+    parser.add_argument(
+        "--dll-store",
+        type=Path,
+        help="SHA-256 keyed DLL store (default: ~/.cache/resolve-installer/dlls)",
+    )
+    parser.add_argument("--no-dll-store", action="store_true", help="Copy DLLs directly without the store")
+    parser.add_argument(
+        "--dll-placement",
+        choices=CLONE_MODES,
+        default="auto",
+        help="How DLLs are placed from the store (auto: reflink, then copy; hardlink shares the store's inode)",
+    )
+    parser.add_argument(
+        "--dedupe-mode",
+        choices=DEDUPE_MODES,
+        default="auto",
+        help="--action dedupe: auto/reflink share files by reflink only (skipped without reflink support); "
+        "hardlink is an unsafe opt-in for DLL/EXE-like files",
+    )
+    parser.add_argument("--dedupe-min-kb", type=int, default=64, help="--action dedupe: ignore smaller files")
+    parser.add_argument("--dry-run", action="store_true", help="--action dedupe: report savings without changing files")
+    parser.add_argument(
+        "--force-step",
+        action="append",
+        default=[],
+        choices=["all", *INSTALL_STEPS],
+        help="Rerun this install step even if the step journal says it is up to date (repeatable)",
+    )
+    parser.add_argument(
+        "--trace-out",
+        type=Path,
+        metavar="BASE",
+        help="Write stage/process timings to BASE.summary.json and a Chrome trace to BASE.trace.json",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=2,
+        help="Maximum number of targets installed at once with --target all",
+    )
     parser.add_argument("--print-lutris-paths", action="store_true", help="Print detected Lutris cache directories and exit")
+
+    parser.add_argument(
+        "--shader-cache",
+        nargs="?",
+        const="",
+        type=str,
+        metavar="DIR",
+        help="Point GL/Mesa/DXVK/VKD3D shader caches at a managed per-runner-build directory "
+        "(default DIR: ~/.cache/resolve-installer/shaders)",
+    )
+    parser.add_argument(
+        "--shader-cache-max-mb",
+        type=int,
+        default=4096,
+        help="Size cap per runner build's shader cache (driver hint and pruning)",
+    )
+    parser.add_argument("--list-shader-caches", action="store_true", help="List managed shader caches and exit")
+    parser.add_argument("--prune-shader-caches", action="store_true", help="Apply --shader-cache-max-mb and exit")
+    parser.add_argument(
+        "--export-shader-cache", type=Path, metavar="FILE", help="Write all shader caches to a .tar.gz and exit"
+    )
+    parser.add_argument(
+        "--import-shader-cache", type=Path, metavar="FILE", help="Merge an exported .tar.gz and exit"
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        type=Path,
+        help="Base prefix snapshot cache (default: ~/.cache/resolve-installer/snapshots)",
+    )
+    parser.add_argument("--no-snapshots", action="store_true", help="Always run wineboot/winetricks from scratch")
+    parser.add_argument("--clone-mode", choices=CLONE_MODES, default="auto", help="How snapshots are cloned into prefixes")
+    parser.add_argument("--list-snapshots", action="store_true", help="List cached base prefix snapshots and exit")
+    parser.add_argument(
+        "--invalidate-snapshots",
+        nargs="?",
+        const="all",
+        metavar="KEY",
+        help="Delete the snapshot KEY (or all snapshots) and exit",
+    )
+    parser.add_argument("--evict-snapshots", type=int, metavar="N", help="Keep only the N most recently used snapshots and exit")
     return parser.parse_args()
 
 
+def fill_runner_args(args: argparse.Namespace) -> None:
+    """Apply the best discovered runner for the host arch to runner flags the user left unset."""
+    from .discovery import default_runner_index, discover_runners, lutris_version, pick_runner
+
+    arch = {"aarch64": "arm64", "amd64": "x86_64"}.get(os.uname().machine, os.uname().machine)
+    found = pick_runner(discover_runners(default_runner_index()), args.runner, arch)
+    if found is None:
+        logging.warning("--auto-runner: no %s runner for %s found; keeping the given flags", args.runner, arch)
+        return
+    logging.info("Auto-selected %s runner %s (%s, %s) from %s", found.kind, found.name, found.arch, found.build, found.path)
+    if args.runner == "wine":
+        args.wine_bin = args.wine_bin or found.path
+        args.wine_version = args.wine_version or lutris_version(found)
+    else:
+        args.proton_bin = args.proton_bin or found.path
+        args.proton_version = args.proton_version or lutris_version(found)
+
+
+def manage_snapshots(args: argparse.Namespace) -> None:
+    from .snapshots import default_snapshot_root, evict_snapshots, invalidate_snapshots, list_snapshots
+
+    root = args.snapshot_dir or default_snapshot_root()
+    if args.invalidate_snapshots is not None:
+        key = None if args.invalidate_snapshots == "all" else args.invalidate_snapshots
+        for removed in invalidate_snapshots(root, key):
+            print(f"invalidated={removed}")
+    if args.evict_snapshots is not None:
+        for removed in evict_snapshots(root, args.evict_snapshots):
+            print(f"evicted={removed}")
+    if args.list_snapshots:
+        for snap in list_snapshots(root):
+            meta = snap.meta
+            print(
+                f"{snap.key} runner={meta.get('runner')} arch={meta.get('wine_arch')} "
+                f"verbs={','.join(meta.get('verbs', []))} size={meta.get('size', 0)} runner_id={meta.get('runner_id')}"
+            )
+
+
+def shader_cache_root(args: argparse.Namespace) -> Path:
+    from .shadercache import default_shader_cache_root
+
+    return Path(args.shader_cache).expanduser() if args.shader_cache else default_shader_cache_root()
+
+
+def manage_shader_caches(args: argparse.Namespace) -> None:
+    from .shadercache import (
+        export_shader_caches,
+        import_shader_caches,
+        prune_shader_caches,
+        shader_cache_usage,
+    )
+
+    root = shader_cache_root(args)
+    if args.import_shader_cache is not None:
+        added = import_shader_caches(root, args.import_shader_cache)
+        print(f"imported={added} files from {args.import_shader_cache}")
+    if args.prune_shader_caches:
+        for label, freed in prune_shader_caches(root, args.shader_cache_max_mb * 1024 * 1024).items():
+            print(f"pruned={label} bytes={freed}")
+    if args.export_shader_cache is not None:
+        count = export_shader_caches(root, args.export_shader_cache)
+        print(f"exported={count} files to {args.export_shader_cache}")
+    if args.list_shader_caches:
+        for usage in shader_cache_usage(root):
+            print(f"{usage.label} files={usage.files} size={usage.size} path={usage.path}")
+
+
+def verify_dlls(args: argparse.Namespace) -> int:
+    """Check every prefix under --prefix-root against its recorded DLL digests."""
+    from .dllstore import DllStore, check_prefixes, default_dll_store_root
+
+    repair = args.action == "repair-dlls"
+    store = DllStore(args.dll_store or default_dll_store_root())
+    reports = check_prefixes(args.prefix_root, store, repair, args.dll_placement)
+    if not reports:
+        logging.info("No prefixes with recorded DLLs under %s", args.prefix_root)
+        return 0
+    failed = False
+    for report in reports:
+        for rel in report.repaired:
+            logging.info("%s: repaired %s", report.target_dir.name, rel)
+        for rel in report.bad:
+            logging.error("%s: %s is missing or does not match its recorded digest", report.target_dir.name, rel)
+        failed = failed or bool(report.bad)
+        logging.info(
+            "%s: %d ok, %d repaired, %d bad",
+            report.target_dir.name,
+            len(report.ok),
+            len(report.repaired),
+            len(report.bad),
+        )
+    return 1 if failed else 0
+
+
+def dedupe(args: argparse.Namespace) -> int:
+    from .dedupe import dedupe_prefixes
+
+    report = dedupe_prefixes(args.prefix_root, args.dedupe_mode, args.dry_run, args.dedupe_min_kb * 1024)
+    methods = ", ".join(f"{method}={count}" for method, count in sorted(report.by_method.items())) or "none"
+    logging.info(
+        "%s %.1f MiB in %d duplicate files (%s) out of %d scanned; %d left alone",
+        "Would reclaim" if args.dry_run else "Reclaimed",
+        report.bytes_reclaimed / (1024 * 1024),
+        report.duplicates,
+        methods,
+        report.scanned,
+        report.skipped,
+    )
+    return 0
+
+
 def main() -> int:
     args = parse_args()
     setup_logging(args.log_file)
@@ -96,36 +391,205 @@ def main() -> int:
             print("detected=<none>")
         return 0
 
-    runner = select_runner(args.runner, args.wine_bin, args.proton_bin)
-    vulkan_supported = detect_vulkan_support()
-    logging.info("Vulkan support detected: %s", vulkan_supported)
+    if args.print_host_topology:
+        from .topology import detect_topology, topology_to_json
 
-    targets = list(TARGETS.values()) if args.target == "all" else [TARGETS[args.target]]
+        print(topology_to_json(detect_topology()))
+        return 0
+
+    if args.list_runners:
+        from .discovery import default_runner_index, discover_runners, format_runners
+
+        print(format_runners(discover_runners(default_runner_index())))
+        return 0
+
+    if args.list_snapshots or args.invalidate_snapshots is not None or args.evict_snapshots is not None:
+        try:
+            manage_snapshots(args)
+        except Exception as exc:
+            logging.error("Failure: %s", exc)
+            return 1
+        return 0
 
+    if (
+        args.list_shader_caches
+        or args.prune_shader_caches
+        or args.export_shader_cache is not None
+        or args.import_shader_cache is not None
+    ):
+        try:
+            manage_shader_caches(args)
+        except Exception as exc:
+            logging.error("Failure: %s", exc)
+            return 1
+        return 0
+
+    if args.action in ("verify-dlls", "repair-dlls"):
+        try:
+            return verify_dlls(args)
+        except Exception as exc:
+            logging.error("Failure: %s", exc)
+            return 1
+
+    if args.action == "dedupe":
+        try:
+            return dedupe(args)
+        except Exception as exc:
+            logging.error("Failure: %s", exc)
+            return 1
+
+    from .envcfg import detect_sync, detect_vulkan_support
+
+    if args.action == "matrix":
+        from .matrix import generate_matrix
+        from .matrix import load_manifest as load_matrix_manifest
+
+        try:
+            if args.matrix_manifest is None:
+                raise RuntimeError("--matrix-manifest is required for --action matrix")
+            variants, manifest_output = load_matrix_manifest(args.matrix_manifest)
+            generate_matrix(
+                variants,
+                manifest_output or args.output_dir,
+                lambda: detect_vulkan_support(mode=args.vulkan),
+                args.matrix_jobs,
+            )
+        except Exception as exc:
+            logging.error("Failure: %s", exc)
+            return 1
+        return 0
+
+    from .runner import runner_fingerprint, select_runner
+
+    if args.auto_runner:
+        try:
+            fill_runner_args(args)
+        except Exception as exc:
+            logging.error("Failure: %s", exc)
+            return 1
+    runner = select_runner(args.runner, args.wine_bin or "wine", args.proton_bin)
+    vulkan_supported = detect_vulkan_support(mode=args.vulkan)
+    if args.vulkan == "auto":
+        logging.info("Vulkan support detected: %s", vulkan_supported)
+    else:
+        logging.info("Vulkan support forced by --vulkan=%s", args.vulkan)
+    sync = detect_sync(args.sync)
+
+    targets = list(TARGETS.values()) if args.target == "all" else [TARGETS[args.target]]
+    extra_env: dict[str, str] = {}
+    shader_dir = None
     try:
+        if args.shader_cache is not None:
+            from .shadercache import ensure_shader_cache, shader_cache_dir, shader_env
+
+            # Keyed like the runner build the generated YAML pins, shared by free and studio targets.
+            version = args.proton_version if runner.runner == "proton" else args.wine_version
+            shader_dir = shader_cache_dir(shader_cache_root(args), runner, version)
+            ensure_shader_cache(shader_dir)
+            extra_env.update(shader_env(shader_dir, args.shader_cache_max_mb * 1024 * 1024))
+            logging.info("Using shader cache %s", shader_dir)
+
         if args.action in ("install", "both"):
-            if args.target == "all":
-                raise RuntimeError("Install action requires a single --target (not --target all)")
             if args.installer is None:
                 raise RuntimeError("--installer is required for install/both")
             if args.directml_dll is None:
                 raise RuntimeError("--directml-dll is required for install/both")
+            if args.parallel < 1:
+                raise RuntimeError("--parallel must be at least 1")
+            from .dlcache import DownloadCache, default_download_cache_root
+            from .dllstore import DllStore, default_dll_store_root
+            from .install import install_release, install_targets, parse_step_limits
+            from .snapshots import default_snapshot_root
+            from .tracing import Tracer, activate
 
-            install_release(
-                cfg=targets[0],
-                runner=runner,
-                installer=args.installer,
-                directml_dll=args.directml_dll,
-                opencl_dll=args.opencl_dll,
-                nvcuda_dll=args.nvcuda_dll,
-                prefix_root=args.prefix_root,
-                winetricks_bin=args.winetricks_bin,
-                gpu_type=args.gpu_type,
-                vk_icd=args.vk_icd,
-                vulkan_supported=vulkan_supported,
-            )
+            step_limits = parse_step_limits(args.step_timeout, args.idle_timeout)
+            force_steps = frozenset(INSTALL_STEPS if "all" in args.force_step else args.force_step)
+            download_cache = None
+            if not args.no_download_cache:
+                download_cache = DownloadCache(
+                    args.download_cache or default_download_cache_root(), args.download_cache_max_mb * 1024 * 1024
+                )
+                if args.download_cache_seed is not None:
+                    download_cache.seed(args.download_cache_seed)
+
+            if "esync" in sync.enabled:
+                from .hostprobe import ESYNC_MIN_NOFILE, raise_nofile_limit
+
+                # Inherited by every wine process this run starts.
+                limit = raise_nofile_limit()
+                if limit < ESYNC_MIN_NOFILE:
+                    logging.warning("Open-file limit %d is below %d; esync may run out of fds", limit, ESYNC_MIN_NOFILE)
+
+            jobs = []
+            for cfg in targets:
+                installer = args.installer
+                if args.studio_installer is not None and cfg.release == "davinci-resolve-studio":
+                    installer = args.studio_installer
+                directml_dll = args.directml_dll
+                if args.directml_dll_arm64 is not None and cfg.arch == "ARM64":
+                    directml_dll = args.directml_dll_arm64
+                jobs.append(
+                    dict(
+                        cfg=cfg,
+                        runner=runner,
+                        installer=installer,
+                        directml_dll=directml_dll,
+                        opencl_dll=args.opencl_dll,
+                        nvcuda_dll=args.nvcuda_dll,
+                        prefix_root=args.prefix_root,
+                        winetricks_bin=args.winetricks_bin,
+                        gpu_type=args.gpu_type,
+                        vk_icd=args.vk_icd,
+                        vulkan_supported=vulkan_supported,
+                        snapshot_root=None if args.no_snapshots else args.snapshot_dir or default_snapshot_root(),
+                        clone_mode=args.clone_mode,
+                        step_limits=step_limits,
+                        force_steps=force_steps,
+                        persistent_wineserver=args.persistent_wineserver,
+                        download_cache=download_cache,
+                        offline=args.offline,
+                        dll_store=None if args.no_dll_store else DllStore(args.dll_store or default_dll_store_root()),
+                        dll_placement=args.dll_placement,
+                        extra_env=extra_env,
+                        sync=sync,
+                    )
+                )
+
+            # Stages measure prefix sizes (a full walk), so trace only when asked to.
+            tracer = None
+            if args.trace_out is not None:
+                tracer = Tracer(
+                    meta={
+                        "runner": runner.runner,
+                        "runner_id": runner_fingerprint(runner),
+                        "targets": [cfg.target for cfg in targets],
+                    }
+                )
+            try:
+                with activate(tracer) if tracer is not None else nullcontext():
+                    if len(jobs) == 1:
+                        install_release(**jobs[0])
+                    else:
+                        outcome = install_targets(jobs, args.parallel, args.log_file)
+                        failed = [target for target, error in outcome.items() if error]
+                        if failed:
+                            raise RuntimeError(f"Install failed for: {', '.join(failed)}")
+            finally:
+                if tracer is not None:
+                    for written in tracer.write(args.trace_out):
+                        logging.info("Wrote install trace %s", written)
+            if shader_dir is not None:
+                from .shadercache import prune_shader_caches
+
+                prune_shader_caches(shader_dir.parent, args.shader_cache_max_mb * 1024 * 1024)
 
         if args.action in ("generate", "both"):
+            launch = None
+            if args.launch_profile != "none":
+                from .topology import detect_topology, launch_tuning, load_topology
+
+                topology = load_topology(args.host_topology) if args.host_topology else detect_topology()
+                launch = launch_tuning(topology, args.launch_profile, args.gpu_type)
             generate_yaml_files(
                 targets,
                 args.prefix_root,
@@ -134,6 +598,9 @@ def main() -> int:
                 args.wine_version,
                 args.proton_version,
                 vulkan_supported,
+                extra_env,
+                sync,
+                launch,
             )
 
     except Exception as exc:
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import stat
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .fsutil import place_file, reflink_file, sha256_file
+from .models import TARGETS
+
+HEAD_BYTES = 64 * 1024
+
+# The only file types --dedupe-mode hardlink may share an inode for. Even these are not safe:
+# wineboot -u and installers overwrite DLLs through O_TRUNC opens, which writes through a
+# hardlink into every other prefix. Registry hives, .ini, databases and logs never qualify.
+HARDLINK_SUFFIXES = frozenset(
+    {".dll", ".exe", ".sys", ".drv", ".ocx", ".cpl", ".acm", ".ax", ".tlb", ".nls", ".ttf", ".ttc", ".otf", ".fon"}
+)
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    path: Path
+    size: int
+    dev: int
+    ino: int
+    mtime_ns: int
+
+
+@dataclass
+class DedupeReport:
+    scanned: int = 0
+    duplicates: int = 0
+    bytes_reclaimed: int = 0
+    by_method: dict[str, int] = field(default_factory=dict)
+    skipped: int = 0
+
+
+def prefix_dirs(prefix_root: Path) -> list[Path]:
+    """Only this installer's target directories: ``--prefix-root`` may hold other games."""
+    return [prefix_root / name for name in TARGETS if (prefix_root / name).is_dir()]
+
+
+def _scan(root: Path, min_size: int) -> list[FileEntry]:
+    entries = []
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            path = Path(dirpath) / name
+            try:
+                st = path.lstat()
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode) and st.st_size >= min_size:
+                entries.append(FileEntry(path, st.st_size, st.st_dev, st.st_ino, st.st_mtime_ns))
+    return entries
+
+
+def _head_digest(path: Path) -> str:
+    with open(path, "rb") as handle:
+        return hashlib.sha256(handle.read(HEAD_BYTES)).hexdigest()
+
+
+def _group(entries: list[FileEntry], key, pool: ThreadPoolExecutor) -> list[list[FileEntry]]:
+    """Split ``entries`` by ``key(path)`` computed in parallel; keep groups with distinct inodes."""
+    digests = list(pool.map(lambda entry: _safe(key, entry.path), entries))
+    groups: dict[str, list[FileEntry]] = defaultdict(list)
+    for entry, digest in zip(entries, digests):
+        if digest is not None:
+            groups[digest].append(entry)
+    return [group for group in groups.values() if len({(e.dev, e.ino) for e in group}) > 1]
+
+
+def _safe(key, path: Path) -> str | None:
+    try:
+        return key(path)
+    except OSError as exc:
+        logging.warning("Skipping %s: %s", path, exc)
+        return None
+
+
+def find_duplicates(prefix_root: Path, min_size: int, workers: int = 8) -> tuple[int, list[list[FileEntry]]]:
+    """Return the number of files scanned and groups of identical files across all prefixes."""
+    roots = prefix_dirs(prefix_root)
+    if not roots:
+        return 0, []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        scanned = [entry for found in pool.map(lambda root: _scan(root, min_size), roots) for entry in found]
+        by_size: dict[int, list[FileEntry]] = defaultdict(list)
+        for entry in scanned:
+            by_size[entry.size].append(entry)
+        candidates = [group for group in by_size.values() if len({(e.dev, e.ino) for e in group}) > 1]
+        # Cheap first-64KiB hash before reading whole files.
+        heads = [g for group in candidates for g in _group(group, _head_digest, pool)]
+        full = []
+        for group in heads:
+            # Files no larger than the head were hashed whole already.
+            full.extend(_group(group, sha256_file, pool) if group[0].size > HEAD_BYTES else [group])
+    return len(scanned), full
+
+
+def _method_for(entry: FileEntry, keep: FileEntry, mode: str) -> tuple[str, ...]:
+    """``auto`` and ``reflink`` only reflink; hardlinks are an explicit opt-in."""
+    if mode != "hardlink":
+        return ("reflink",)
+    hardlink_ok = entry.path.suffix.lower() in HARDLINK_SUFFIXES and entry.dev == keep.dev
+    return ("hardlink",) if hardlink_ok else ()
+
+
+def _reflink_works(keep: FileEntry, entry: FileEntry) -> bool:
+    """Try one FICLONE next to ``entry``; filesystems either support it everywhere or nowhere."""
+    if keep.dev != entry.dev:
+        return False
+    probe = entry.path.with_name(f".{entry.path.name}.{uuid.uuid4().hex}.reflink-probe")
+    try:
+        reflink_file(keep.path, probe)
+    except OSError:
+        return False
+    finally:
+        probe.unlink(missing_ok=True)
+    return True
+
+
+def _unchanged(entry: FileEntry) -> bool:
+    try:
+        st = entry.path.lstat()
+    except OSError:
+        return False
+    return (st.st_size, st.st_ino, st.st_mtime_ns) == (entry.size, entry.ino, entry.mtime_ns)
+
+
+def dedupe_prefixes(
+    prefix_root: Path, mode: str = "auto", dry_run: bool = False, min_size: int = 64 * 1024
+) -> DedupeReport:
+    """Replace identical files across target prefixes with reflinks (or hardlinks, if asked)."""
+    if mode == "hardlink" and not dry_run:
+        logging.warning(
+            "--dedupe-mode hardlink: prefixes share DLL/EXE inodes, so a file rewritten in place "
+            "(wineboot -u, Resolve updates) changes in every prefix; prefer a reflink-capable filesystem"
+        )
+    scanned, groups = find_duplicates(prefix_root, min_size)
+    report = DedupeReport(scanned=scanned)
+    reflink_ok: dict[int, bool] = {}
+    for group in groups:
+        group.sort(key=lambda entry: str(entry.path))
+        keep = group[0]
+        # Inodes whose space is already counted; several paths may share one.
+        counted = {(keep.dev, keep.ino)}
+        for entry in group[1:]:
+            identity = (entry.dev, entry.ino)
+            if identity == (keep.dev, keep.ino):
+                continue
+            if entry.dev not in reflink_ok:
+                reflink_ok[entry.dev] = _reflink_works(keep, entry)
+            methods = [m for m in _method_for(entry, keep, mode) if m != "reflink" or reflink_ok[entry.dev]]
+            method = methods[0] if methods and dry_run else None
+            if not dry_run and methods:
+                if not (_unchanged(keep) and _unchanged(entry)):
+                    logging.warning("%s changed during the scan; leaving it alone", entry.path)
+                    methods = []
+                for candidate in methods:
+                    try:
+                        method = place_file(keep.path, entry.path, candidate)
+                        break
+                    except RuntimeError as exc:
+                        logging.debug("%s failed for %s: %s", candidate, entry.path, exc)
+            if method is None:
+                report.skipped += 1
+                continue
+            report.duplicates += 1
+            report.by_method[method] = report.by_method.get(method, 0) + 1
+            if identity not in counted:
+                counted.add(identity)
+                report.bytes_reclaimed += entry.size
+            logging.debug("%s %s -> %s", f"would {method}" if dry_run else method, entry.path, keep.path)
+    return report
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import subprocess
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .fsutil import atomic_write_text, cache_root, file_identity
+from .lutris_paths import lutris_data_candidates
+
+INDEX_FORMAT = 1
+
+ARTIFACTS_DIR = Path(__file__).resolve().parent.parent / "buildsystems" / "artifacts"
+# ELF e_machine values of the runner's native binaries.
+ELF_MACHINES = {0x03: "i386", 0x3E: "x86_64", 0xB7: "arm64"}
+# Preferred first when several runners fit: this repo's own builds, then Lutris, then Steam.
+SOURCE_ORDER = ("buildsystems", "lutris", "lutris-flatpak", "steam", "steam-flatpak")
+# Written into the install tree by buildsystems/{wine,proton}/build_*.sh.
+BUILD_INFO_FILES = ("resolve-wine-build-info.txt", "resolve-proton-build-info.txt")
+
+
+@dataclass(frozen=True)
+class RunnerInfo:
+    kind: str  # "wine" or "proton"
+    name: str  # runner directory name; what Lutris expects as the runner version
+    source: str
+    path: str  # wine binary, or the proton script
+    arch: str
+    build: str  # `wine --version`, Proton's version file or the build-info ref
+    build_info: str | None = None
+
+
+def default_runner_index() -> Path:
+    return cache_root() / "runner-index.json"
+
+
+def runner_roots() -> list[tuple[str, str, Path]]:
+    """Return ``(kind, source, directory)`` for every place runners are installed."""
+    home = Path.home()
+    roots: list[tuple[str, str, Path]] = []
+    for source, data_dir in lutris_data_candidates():
+        roots.append(("wine", source, data_dir / "runners" / "wine"))
+        roots.append(("proton", source, data_dir / "runners" / "proton"))
+    for source, steam in (
+        ("steam", home / ".local" / "share" / "Steam"),
+        ("steam", home / ".steam" / "root"),
+        ("steam-flatpak", home / ".var" / "app" / "com.valvesoftware.Steam" / "data" / "Steam"),
+    ):
+        roots.append(("proton", source, steam / "compatibilitytools.d"))
+        roots.append(("proton", source, steam / "steamapps" / "common"))
+    roots.append(("any", "buildsystems", ARTIFACTS_DIR))
+    return roots
+
+
+def _runner_binary(kind: str, runner_dir: Path) -> tuple[str, Path] | None:
+    if kind in ("wine", "any") and (runner_dir / "bin" / "wine").is_file():
+        return "wine", runner_dir / "bin" / "wine"
+    if kind in ("proton", "any") and (runner_dir / "proton").is_file():
+        return "proton", runner_dir / "proton"
+    return None
+
+
+def _native_dir(kind: str, binary: Path) -> Path:
+    if kind != "proton":
+        return binary.parent
+    # Proton 5+ ships its wine in files/, older releases in dist/.
+    files = binary.parent / "files" / "bin"
+    return files if files.is_dir() else binary.parent / "dist" / "bin"
+
+
+def elf_arch(path: Path) -> str | None:
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(20)
+    except OSError:
+        return None
+    if len(header) < 20 or header[:4] != b"\x7fELF":
+        return None
+    machine = int.from_bytes(header[18:20], "little" if header[5] == 1 else "big")
+    return ELF_MACHINES.get(machine)
+
+
+def _guess_arch(name: str, native_dir: Path, build_info: dict[str, str]) -> str:
+    if build_info.get("arch"):
+        return build_info["arch"]
+    # wineserver is always a native binary; bin/wine may be a script wrapper.
+    for binary in ("wineserver", "wine64", "wine"):
+        arch = elf_arch(native_dir / binary)
+        if arch is not None:
+            return arch
+    lowered = name.lower()
+    if lowered.endswith(("-arm64", "-aarch64")):
+        return "arm64"
+    if lowered.endswith(("-x86_64", "-amd64")):
+        return "x86_64"
+    return "unknown"
+
+
+def _read_build_info(runner_dir: Path) -> tuple[Path | None, dict[str, str]]:
+    for path in (runner_dir / name for name in BUILD_INFO_FILES):
+        if not path.is_file():
+            continue
+        info = {}
+        for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
+            key, _, value = line.partition("=")
+            info[key.strip()] = value.strip()
+        return path, info
+    return None, {}
+
+
+def _wine_version(binary: Path) -> str:
+    try:
+        result = subprocess.run(
+            [str(binary), "--version"],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=False,
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        logging.debug("%s --version failed: %s", binary, exc)
+        return ""
+    return result.stdout.strip() if result.returncode == 0 else ""
+
+
+def probe_runner(kind: str, source: str, binary: Path) -> RunnerInfo:
+    """Describe one runner; spawns ``wine --version`` only when nothing cheaper names the build."""
+    runner_dir = binary.parent if kind == "proton" else binary.parent.parent
+    info_path, info = _read_build_info(runner_dir)
+    build = info.get("wine_ref") or info.get("proton_ref") or ""
+    if not build and kind == "proton":
+        # Proton's "version" file: "<timestamp> <build name>"
+        version_file = runner_dir / "version"
+        if version_file.is_file():
+            build = version_file.read_text(encoding="utf-8", errors="replace").strip().split(" ")[-1]
+    if not build:
+        native_wine = _native_dir(kind, binary) / "wine"
+        build = _wine_version(native_wine) if native_wine.is_file() else ""
+    return RunnerInfo(
+        kind=kind,
+        name=runner_dir.name,
+        source=source,
+        path=str(binary),
+        arch=_guess_arch(runner_dir.name, _native_dir(kind, binary), info),
+        build=build,
+        build_info=str(info_path) if info_path else None,
+    )
+
+
+def _runner_identity(kind: str, binary: Path) -> str:
+    runner_dir = binary.parent if kind == "proton" else binary.parent.parent
+    parts = [file_identity(binary), file_identity(_native_dir(kind, binary) / "wineserver")]
+    parts.extend(file_identity(runner_dir / name) for name in BUILD_INFO_FILES)
+    if kind == "proton":
+        parts.append(file_identity(runner_dir / "version"))
+    return "|".join(parts)
+
+
+def _load_index(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("format") == INDEX_FORMAT else {}
+
+
+def discover_runners(index_path: Path | None = None) -> list[RunnerInfo]:
+    """Return every installed Wine/Proton runner, using the on-disk index where it is current.
+
+    A root directory is re-listed only when its mtime changed, and a runner is re-probed only
+    when its binary, wineserver or build-info changed, so a warm call is a handful of stats.
+    """
+    index = _load_index(index_path) if index_path is not None else {}
+    old_roots: dict = index.get("roots", {})
+    old_runners: dict = index.get("runners", {})
+    new_roots: dict = {}
+    new_runners: dict = {}
+    changed = False
+
+    for kind, source, root in runner_roots():
+        try:
+            mtime = root.stat().st_mtime_ns
+        except OSError:
+            continue
+        key = f"{kind}:{source}:{root}"
+        cached = old_roots.get(key)
+        if cached is not None and cached["mtime"] == mtime:
+            entries = cached["entries"]
+        else:
+            entries = sorted(
+                child.name for child in root.iterdir() if child.is_dir() and not child.name.endswith("-pgo-gen")
+            )
+            changed = True
+        new_roots[key] = {"mtime": mtime, "entries": entries}
+
+        for name in entries:
+            found = _runner_binary(kind, root / name)
+            if found is None:
+                continue
+            runner_kind, binary = found
+            real = str(binary.resolve())
+            if real in new_runners:
+                continue  # same install reached through a symlinked root (~/.steam/root)
+            identity = _runner_identity(runner_kind, binary)
+            previous = old_runners.get(real)
+            if previous is not None and previous["identity"] == identity:
+                new_runners[real] = previous
+                continue
+            logging.debug("Probing runner %s", binary)
+            new_runners[real] = {"identity": identity, "info": asdict(probe_runner(runner_kind, source, binary))}
+            changed = True
+
+    if set(new_runners) != set(old_runners):
+        changed = True
+    if index_path is not None and changed:
+        payload = {"format": INDEX_FORMAT, "roots": new_roots, "runners": new_runners}
+        try:
+            atomic_write_text(index_path, json.dumps(payload, indent=2, sort_keys=True))
+        except OSError as exc:
+            logging.debug("Could not write runner index %s: %s", index_path, exc)
+    return [RunnerInfo(**entry["info"]) for entry in new_runners.values()]
+
+
+def _natural_key(text: str) -> list:
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", text)]
+
+
+def pick_runner(runners: list[RunnerInfo], kind: str, arch: str) -> RunnerInfo | None:
+    """Best runner of ``kind`` for ``arch``: by source preference, then the newest name."""
+    matching = [r for r in runners if r.kind == kind and r.arch == arch]
+    if not matching:
+        return None
+    newest_first = sorted(matching, key=lambda r: _natural_key(r.name), reverse=True)
+    return min(
+        newest_first,
+        key=lambda r: SOURCE_ORDER.index(r.source) if r.source in SOURCE_ORDER else len(SOURCE_ORDER),
+    )
+
+
+def lutris_version(runner: RunnerInfo) -> str:
+    """Runner version for the generated YAML: only names Lutris itself can resolve."""
+    if runner.kind == "wine":
+        return runner.name if runner.source.startswith("lutris") else ""
+    return runner.name if runner.source != "buildsystems" else ""
+
+
+def format_runners(runners: list[RunnerInfo]) -> str:
+    lines = []
+    for runner in sorted(runners, key=lambda r: (r.kind, r.arch, _natural_key(r.name))):
+        lines.append(f"{runner.kind:6s} {runner.arch:7s} {runner.source:14s} {runner.name:36s} {runner.build or '-'}")
+        lines.append(f"       {runner.path}" + (f" (build info: {runner.build_info})" if runner.build_info else ""))
+    return "\n".join(lines) if lines else "no runners found"
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
+
+from .fsutil import atomic_write_text, cache_root, file_lock, sha256_file
+
+# Files winetricks looks for in W_CACHE/<verb>/ for the verbs this installer uses.
+VERB_FILES: Dict[str, tuple[str, ...]] = {
+    "win10": (),
+    "vcrun2019": ("vc_redist.x86.exe", "vc_redist.x64.exe"),
+}
+
+# Points every proxy-aware downloader at a closed port so nothing reaches the network.
+OFFLINE_ENV = {
+    "http_proxy": "http://127.0.0.1:9",
+    "https_proxy": "http://127.0.0.1:9",
+    "ftp_proxy": "http://127.0.0.1:9",
+    "all_proxy": "http://127.0.0.1:9",
+    "HTTP_PROXY": "http://127.0.0.1:9",
+    "HTTPS_PROXY": "http://127.0.0.1:9",
+    "ALL_PROXY": "http://127.0.0.1:9",
+    "no_proxy": "",
+    "NO_PROXY": "",
+    "WINETRICKS_LATEST_VERSION_CHECK": "disabled",
+}
+
+
+def default_download_cache_root() -> Path:
+    return cache_root() / "winetricks"
+
+
+class DownloadCache:
+    """Content-addressed store of winetricks downloads shared by all prefixes.
+
+    Objects live in ``objects/<sha256>``; ``index.json`` maps ``<verb>/<file>`` to a digest.
+    Each winetricks run gets a private ``W_CACHE`` view of hardlinks into the store, and
+    files it downloads are ingested back afterwards.
+    """
+
+    def __init__(self, root: Path, max_bytes: int | None = None) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects = root / "objects"
+        self.index_path = root / "index.json"
+        self.lock_path = root / ".lock"
+
+    def _load_index(self) -> dict[str, dict]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logging.warning("Download cache index %s is unreadable; starting empty", self.index_path)
+            return {}
+
+    def _save_index(self, index: dict[str, dict]) -> None:
+        atomic_write_text(self.index_path, json.dumps(index, indent=2, sort_keys=True))
+
+    def _store(self, index: dict[str, dict], rel: str, path: Path) -> bool:
+        digest = sha256_file(path)
+        obj = self.objects / digest
+        if not obj.exists():
+            self.objects.mkdir(parents=True, exist_ok=True)
+            tmp = self.objects / f".{digest}.{uuid.uuid4().hex}"
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copy2(path, tmp)
+            os.replace(tmp, obj)
+        known = index.get(rel, {}).get("sha256") == digest
+        index[rel] = {"sha256": digest, "size": obj.stat().st_size, "last_used": time.time()}
+        return not known
+
+    def seed(self, source: Path) -> int:
+        """Import a winetricks-style cache directory (``<verb>/<file>``); return new entries."""
+        if not source.is_dir():
+            raise RuntimeError(f"Download cache seed directory not found: {source}")
+        added = 0
+        with file_lock(self.lock_path):
+            index = self._load_index()
+            for path in sorted(source.glob("*/*")):
+                if path.is_file():
+                    added += self._store(index, f"{path.parent.name}/{path.name}", path)
+            self._save_index(index)
+            self._evict(index)
+        logging.info("Seeded download cache %s from %s (%d new files)", self.root, source, added)
+        return added
+
+    def missing(self, verbs: Iterable[str]) -> list[str]:
+        index = self._load_index()
+        return [
+            f"{verb}/{name}"
+            for verb in verbs
+            for name in VERB_FILES.get(verb, ())
+            if f"{verb}/{name}" not in index or not (self.objects / index[f"{verb}/{name}"]["sha256"]).exists()
+        ]
+
+    @contextmanager
+    def view(self, verbs: Iterable[str], offline: bool = False) -> Iterator[Path]:
+        """Yield a private W_CACHE directory populated with verified cached files for ``verbs``."""
+        verbs = list(verbs)
+        if offline:
+            missing = self.missing(verbs)
+            if missing:
+                raise RuntimeError(
+                    f"--offline: download cache {self.root} lacks {', '.join(missing)}; "
+                    "seed it with --download-cache-seed"
+                )
+        view = self.root / "views" / uuid.uuid4().hex
+        view.mkdir(parents=True)
+        with file_lock(self.lock_path, shared=True):
+            index = self._load_index()
+            for rel, entry in index.items():
+                if rel.split("/", 1)[0] not in verbs:
+                    continue
+                obj = self.objects / entry["sha256"]
+                if not obj.exists() or sha256_file(obj) != entry["sha256"]:
+                    logging.warning("Download cache object for %s is missing or corrupt; winetricks will refetch", rel)
+                    continue
+                dest = view / rel
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(obj, dest)
+                except OSError:
+                    shutil.copy2(obj, dest)
+        try:
+            yield view
+            self._ingest(view, verbs)
+        finally:
+            shutil.rmtree(view, ignore_errors=True)
+
+    def _ingest(self, view: Path, verbs: list[str]) -> None:
+        with file_lock(self.lock_path):
+            index = self._load_index()
+            added = 0
+            for path in sorted(view.glob("*/*")):
+                rel = f"{path.parent.name}/{path.name}"
+                if not path.is_file():
+                    continue
+                if rel in index:
+                    # Unchanged hardlink into the store: only bump its LRU timestamp.
+                    obj = self.objects / index[rel]["sha256"]
+                    if obj.exists() and os.path.samefile(obj, path):
+                        index[rel]["last_used"] = time.time()
+                        continue
+                added += self._store(index, rel, path)
+            self._save_index(index)
+            self._evict(index)
+        if added:
+            logging.info("Added %d winetricks downloads for %s to %s", added, ", ".join(verbs), self.root)
+
+    def _evict(self, index: dict[str, dict]) -> None:
+        """Drop least-recently-used entries until the store fits ``max_bytes`` (lock held)."""
+        if self.max_bytes is None:
+            return
+        total = sum(obj.stat().st_size for obj in self.objects.glob("*") if not obj.name.startswith("."))
+        if total <= self.max_bytes:
+            return
+        for rel, entry in sorted(index.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            del index[rel]
+            if any(other["sha256"] == entry["sha256"] for other in index.values()):
+                continue
+            obj = self.objects / entry["sha256"]
+            if obj.exists():
+                total -= obj.stat().st_size
+                obj.unlink()
+            logging.info("Evicted %s from download cache", rel)
+        self._save_index(index)
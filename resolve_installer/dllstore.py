@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .fsutil import atomic_write_text, cache_root, file_identity, file_lock, place_file, sha256_file
+
+MANIFEST_NAME = ".resolve-installer-dlls.json"
+
+
+def default_dll_store_root() -> Path:
+    return cache_root() / "dlls"
+
+
+@dataclass
+class PrefixReport:
+    target_dir: Path
+    ok: list[str] = field(default_factory=list)
+    bad: list[str] = field(default_factory=list)
+    repaired: list[str] = field(default_factory=list)
+
+
+class DllStore:
+    """SHA-256 keyed store of the DLLs copied into prefixes."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.objects = root / "objects"
+        self._verified: dict[str, bool] = {}
+        # Source file identity -> digest, so a DLL hashed ahead of placement is not hashed again.
+        self._ingested: dict[str, str] = {}
+        self._verified_lock = threading.Lock()
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects / f"{digest}.dll"
+
+    def ingest(self, path: Path) -> str:
+        identity = file_identity(path)
+        with self._verified_lock:
+            digest = self._ingested.get(identity)
+        if digest is not None and self.object_path(digest).exists():
+            return digest
+        digest = sha256_file(path)
+        # An existing object may be truncated or corrupt (crash, bad copy): hash it before trusting it.
+        if not self.object_ok(digest):
+            obj = self.object_path(digest)
+            with file_lock(self.root / ".lock"):
+                if obj.exists():
+                    logging.warning("Replacing corrupt DLL store object %s", obj)
+                self.objects.mkdir(parents=True, exist_ok=True)
+                tmp = self.objects / f".{digest}.{uuid.uuid4().hex}"
+                shutil.copy2(path, tmp)
+                os.replace(tmp, obj)
+            with self._verified_lock:
+                self._verified[digest] = True
+        with self._verified_lock:
+            self._ingested[identity] = digest
+        return digest
+
+    def object_ok(self, digest: str) -> bool:
+        """Hash each store object at most once per process."""
+        with self._verified_lock:
+            known = self._verified.get(digest)
+        if known is None:
+            obj = self.object_path(digest)
+            known = obj.exists() and sha256_file(obj) == digest
+            with self._verified_lock:
+                self._verified[digest] = known
+        return known
+
+    def place(self, digest: str, dst: Path, mode: str) -> str:
+        return place_file(self.object_path(digest), dst, mode)
+
+
+def load_manifest(target_dir: Path) -> dict[str, dict]:
+    path = target_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logging.warning("Ignoring unreadable DLL manifest %s", path)
+        return {}
+
+
+def save_manifest(target_dir: Path, manifest: dict[str, dict]) -> None:
+    atomic_write_text(target_dir / MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def _file_matches(store: DllStore, path: Path, digest: str) -> bool:
+    if not path.is_file():
+        return False
+    obj = store.object_path(digest)
+    # A hardlink to a verified object needs no read of its own.
+    if obj.exists() and os.path.samefile(obj, path):
+        return store.object_ok(digest)
+    return sha256_file(path) == digest
+
+
+def check_prefix(store: DllStore, target_dir: Path, repair: bool, mode: str) -> PrefixReport:
+    report = PrefixReport(target_dir=target_dir)
+    manifest = load_manifest(target_dir)
+    for rel, entry in sorted(manifest.items()):
+        path = target_dir / rel
+        digest = entry["sha256"]
+        if _file_matches(store, path, digest):
+            report.ok.append(rel)
+            continue
+        if repair and store.object_ok(digest):
+            entry["mode"] = store.place(digest, path, mode)
+            report.repaired.append(rel)
+        else:
+            report.bad.append(rel)
+    if report.repaired:
+        save_manifest(target_dir, manifest)
+    return report
+
+
+def check_prefixes(
+    prefix_root: Path, store: DllStore, repair: bool, mode: str = "auto", workers: int = 8
+) -> list[PrefixReport]:
+    """Verify (and optionally repair) recorded DLLs of every prefix under ``prefix_root`` in parallel."""
+    targets = sorted(path.parent for path in prefix_root.glob(f"*/{MANIFEST_NAME}"))
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as pool:
+        return list(pool.map(lambda target: check_prefix(store, target, repair, mode), targets))
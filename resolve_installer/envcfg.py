@@ -1,12 +1,13 @@
 from __future__ import annotations
 
+import logging
 import os
-import shutil
-import subprocess
 from pathlib import Path
 from typing import Dict
 
-from .models import RunnerConfig, TargetConfig
+from .hostprobe import choose_sync, describe_host, probe_host_sync, sync_env
+from .models import RunnerConfig, SyncChoice, TargetConfig
+from .vkprobe import default_probe_cache, probe_vulkan
 
 
 def prefix_dir(prefix_root: Path, target: TargetConfig, runner: RunnerConfig) -> Path:
@@ -14,51 +15,42 @@ def prefix_dir(prefix_root: Path, target: TargetConfig, runner: RunnerConfig) ->
     return base / "pfx" if runner.runner == "proton" else base
 
 
-def _parse_vulkan_version(text: str) -> tuple[int, int, int] | None:
-    for raw in text.splitlines():
-        line = raw.strip().lower()
-        if "api version" not in line:
-            continue
-        parts = raw.replace(",", " ").split()
-        for token in parts:
-            token = token.strip()
-            if token.count(".") >= 2 and token[0].isdigit():
-                try:
-                    major, minor, patch = token.split(".")[:3]
-                    return (int(major), int(minor), int(patch))
-                except ValueError:
-                    continue
-    return None
+def detect_vulkan_support(min_api: tuple[int, int, int] = (1, 3, 0), mode: str = "auto") -> bool:
+    """Return True only when Vulkan is available and API version is high enough for DXVK/VKD3D.
 
+    ``mode`` ``on``/``off`` skips probing entirely; ``auto`` uses the cached ``vulkaninfo`` probe.
+    """
+    if mode != "auto":
+        return mode == "on"
+    probe = probe_vulkan(default_probe_cache())
+    for dev in probe.devices:
+        api = ".".join(map(str, dev.api_version)) if dev.api_version else "?"
+        logging.info(
+            "Vulkan device: %s (%s, api %s, driver %s %s, vendor %s)%s",
+            dev.name,
+            dev.device_type or "unknown",
+            api,
+            dev.driver,
+            dev.driver_version,
+            dev.vendor_id,
+            " [cached]" if probe.cached else "",
+        )
+    return probe.supported(min_api)
 
-def detect_vulkan_support(min_api: tuple[int, int, int] = (1, 3, 0)) -> bool:
-    """Return True only when Vulkan is available and API version is high enough for DXVK/VKD3D."""
-    vulkaninfo = shutil.which("vulkaninfo")
-    if not vulkaninfo:
-        return False
 
-    for args in ([vulkaninfo, "--summary"], [vulkaninfo]):
-        try:
-            result = subprocess.run(
-                args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                timeout=15,
-                check=False,
-            )
-        except (OSError, subprocess.SubprocessError):
-            continue
-
-        if result.returncode != 0 or not result.stdout:
-            continue
-
-        version = _parse_vulkan_version(result.stdout)
-        if version is None:
-            continue
-        return version >= min_api
-
-    return False
+def detect_sync(mode: str = "auto") -> SyncChoice:
+    """Pick the sync backend for ``--sync``; ``auto`` takes the fastest one the host supports."""
+    host = probe_host_sync()
+    choice = choose_sync(host, mode)
+    logging.info(
+        "Sync backend: %s (%s; %s)",
+        choice.mode,
+        "auto" if mode == "auto" else f"forced by --sync={mode}",
+        describe_host(host),
+    )
+    if choice.enabled[1:]:
+        logging.info("Sync fallbacks left enabled: %s", ", ".join(choice.enabled[1:]))
+    return choice
 
 
 def base_env(
@@ -67,13 +59,18 @@ def base_env(
     runner: RunnerConfig,
     vk_icd: str | None,
     vulkan_supported: bool,
+    extra_env: Dict[str, str] | None = None,
+    sync: SyncChoice | None = None,
 ) -> Dict[str, str]:
     target_prefix = prefix_root / target.target
     env = os.environ.copy()
     env["WINEPREFIX"] = str(prefix_dir(prefix_root, target, runner))
     env["WINEARCH"] = target.wine_arch
     env["WINEDEBUG"] = "-all"
-    env["WINEESYNC"] = "1"
+    if sync is None:
+        env["WINEESYNC"] = "1"
+    else:
+        env.update(sync_env(sync, runner.runner))
     env["__GL_THREADED_OPTIMIZATIONS"] = "1"
     env["__GL_DISK_CACHE"] = "1"
     env["VK_ICD_FILENAMES"] = vk_icd if vk_icd else "/usr/share/vulkan/icd.d"
@@ -86,4 +83,6 @@ def base_env(
     env["LATENCYFLEX"] = "1"
     if runner.runner == "proton":
         env["STEAM_COMPAT_DATA_PATH"] = str(target_prefix)
+    if extra_env:
+        env.update(extra_env)
     return env
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import signal
+import subprocess
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict
+
+from .models import StepLimits
+
+OUTPUT_TAIL_LINES = 200
+MAX_LINE_BYTES = 64 * 1024
+READ_CHUNK = 64 * 1024
+# How long to keep draining pipes after the child exits (daemons may inherit them).
+DRAIN_GRACE = 2.0
+TERM_GRACE = 5.0
+
+
+@dataclass
+class StepResult:
+    returncode: int
+    tail: deque = field(default_factory=lambda: deque(maxlen=OUTPUT_TAIL_LINES))
+    timed_out: str | None = None
+    max_rss_kb: int | None = None
+
+
+def _reap(proc: subprocess.Popen, result: StepResult, block: bool = False) -> bool:
+    """Reap the child with wait4 so its peak RSS is captured; return True once it has exited."""
+    if proc.returncode is not None:
+        return True
+    try:
+        pid, status, usage = os.wait4(proc.pid, 0 if block else os.WNOHANG)
+    except ChildProcessError:
+        proc.wait()
+        return True
+    if pid == 0:
+        return False
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    result.max_rss_kb = usage.ru_maxrss
+    return True
+
+
+def _kill_tree(proc: subprocess.Popen, kill_cmd: list[str] | None, env: Dict[str, str], step: str) -> None:
+    """Terminate the child's process group, then ask wineserver to kill the rest of the prefix."""
+    for sig, grace in ((signal.SIGTERM, TERM_GRACE), (signal.SIGKILL, TERM_GRACE)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            break
+        try:
+            proc.wait(timeout=grace)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+    if kill_cmd:
+        # wineserver daemonizes into its own session, so killpg never reaches it.
+        logging.info("[%s] Running: %s", step, " ".join(kill_cmd))
+        try:
+            subprocess.run(kill_cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+        except (OSError, subprocess.SubprocessError) as exc:
+            logging.warning("[%s] %s failed: %s", step, kill_cmd[0], exc)
+
+
+def stream_process(
+    cmd: list[str],
+    env: Dict[str, str],
+    step: str,
+    limits: StepLimits | None = None,
+    kill_cmd: list[str] | None = None,
+) -> StepResult:
+    """Run ``cmd`` and log its stdout/stderr line by line as they arrive.
+
+    Only the last ``OUTPUT_TAIL_LINES`` lines are kept in memory. When a wall-clock or idle
+    limit is hit, the whole process tree is killed and the result carries ``timed_out``.
+    """
+    limits = limits or StepLimits()
+    proc = subprocess.Popen(
+        cmd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    result = StepResult(returncode=-1)
+    selector = selectors.DefaultSelector()
+    pending: dict[str, bytearray] = {}
+    for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+        os.set_blocking(pipe.fileno(), False)
+        selector.register(pipe, selectors.EVENT_READ, name)
+        pending[name] = bytearray()
+
+    def emit(name: str, raw: bytes) -> None:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r")
+        result.tail.append(f"{name}: {line}")
+        logging.info("[%s] %s: %s", step, name, line)
+
+    started = last_output = time.monotonic()
+    exited_at: float | None = None
+    reap_backoff = 0.005
+    try:
+        while True:
+            if selector.get_map():
+                events = selector.select(timeout=0.5)
+            else:
+                events = []
+                if not _reap(proc, result):
+                    time.sleep(reap_backoff)
+                    reap_backoff = min(reap_backoff * 2, 0.1)
+            for key, _ in events:
+                name = key.data
+                chunk = os.read(key.fileobj.fileno(), READ_CHUNK)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                last_output = time.monotonic()
+                buf = pending[name]
+                buf.extend(chunk)
+                while True:
+                    newline = buf.find(b"\n")
+                    if newline < 0:
+                        break
+                    emit(name, bytes(buf[:newline]))
+                    del buf[: newline + 1]
+                if len(buf) > MAX_LINE_BYTES:
+                    emit(name, bytes(buf))
+                    buf.clear()
+
+            now = time.monotonic()
+            if exited_at is None and _reap(proc, result):
+                exited_at = now
+            if exited_at is not None:
+                if not selector.get_map() or now - exited_at > DRAIN_GRACE:
+                    break
+                continue
+            if limits.timeout is not None and now - started > limits.timeout:
+                result.timed_out = f"exceeded {limits.timeout:g}s wall-clock limit"
+            elif limits.idle_timeout is not None and now - last_output > limits.idle_timeout:
+                result.timed_out = f"produced no output for {limits.idle_timeout:g}s"
+            if result.timed_out:
+                logging.error("[%s] %s; killing process tree", step, result.timed_out)
+                _kill_tree(proc, kill_cmd, env, step)
+                exited_at = time.monotonic()
+    finally:
+        selector.close()
+        for name, buf in pending.items():
+            if buf:
+                emit(name, bytes(buf))
+        for pipe in (proc.stdout, proc.stderr):
+            pipe.close()
+        if not _reap(proc, result):
+            _kill_tree(proc, kill_cmd, env, step)
+
+    _reap(proc, result, block=True)
+    result.returncode = proc.returncode
+    return result
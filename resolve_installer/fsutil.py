@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from .models import CLONE_MODES
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def cache_root() -> Path:
+    """Return the per-user cache directory shared by installer caches."""
+    base = os.environ.get("XDG_CACHE_HOME")
+    root = Path(base) if base else Path.home() / ".cache"
+    return root / "resolve-installer"
+
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """Hold an advisory flock on ``path`` (created if missing) for the block."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as handle:
+        fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_identity(path: Path) -> str:
+    """Cheap change detector for large inputs: resolved path, size and mtime."""
+    resolved = path.expanduser().resolve()
+    try:
+        stat = resolved.stat()
+    except OSError:
+        return f"{resolved}:missing"
+    return f"{resolved}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def atomic_write_text(path: Path, text: str, encoding: str = "utf-8") -> None:
+    """Write ``text`` to a sibling temp file and rename it over ``path``."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as handle:
+            handle.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def tree_size(path: Path) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def clone_tree(src: Path, dst: Path, mode: str = "auto") -> str:
+    """Clone directory ``src`` to ``dst`` (which must not exist); return the mode used.
+
+    ``auto`` lets GNU cp reflink where the filesystem supports it and copy otherwise.
+    ``hardlink`` shares inodes with ``src``, so files changed in place show up in both trees.
+    """
+    if mode not in CLONE_MODES:
+        raise RuntimeError(f"Unsupported clone mode: {mode}")
+    if dst.exists():
+        raise RuntimeError(f"Clone destination already exists: {dst}")
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    cp = shutil.which("cp")
+    if cp is None:
+        if mode in ("reflink", "hardlink"):
+            raise RuntimeError(f"cp is required for clone mode {mode}")
+        shutil.copytree(src, dst, symlinks=True)
+        return "copy"
+
+    flags = {
+        "auto": ["-a", "--reflink=auto"],
+        "reflink": ["-a", "--reflink=always"],
+        "hardlink": ["-al"],
+        "copy": ["-a", "--reflink=never"],
+    }[mode]
+    result = subprocess.run([cp, *flags, str(src), str(dst)], capture_output=True, text=True)
+    if result.returncode != 0:
+        shutil.rmtree(dst, ignore_errors=True)
+        raise RuntimeError(f"Cloning {src} -> {dst} ({mode}) failed: {result.stderr.strip()}")
+    return mode
+
+
+def reflink_file(src: Path, dst: Path) -> None:
+    """Share ``src``'s extents with a new file ``dst`` (btrfs, XFS, bcachefs); raise OSError if unsupported."""
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    shutil.copystat(src, dst)
+
+
+def place_file(src: Path, dst: Path, mode: str = "auto") -> str:
+    """Materialize ``src`` at ``dst`` and return the method used.
+
+    The result is written next to ``dst`` and renamed over it, so an existing hardlink at
+    ``dst`` is replaced instead of being written through. ``auto`` tries reflink, then copy;
+    it never hardlinks, since a later in-place write to ``dst`` would also change ``src``.
+    ``hardlink`` only happens when asked for explicitly.
+    """
+    if mode not in CLONE_MODES:
+        raise RuntimeError(f"Unsupported placement mode: {mode}")
+    methods = ("reflink", "copy") if mode == "auto" else (mode,)
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}")
+    last_error: OSError | None = None
+    for method in methods:
+        try:
+            if method == "reflink":
+                reflink_file(src, tmp)
+            elif method == "hardlink":
+                os.link(src, tmp)
+            else:
+                shutil.copy2(src, tmp)
+        except OSError as exc:
+            tmp.unlink(missing_ok=True)
+            last_error = exc
+            continue
+        os.replace(tmp, dst)
+        return method
+    raise RuntimeError(f"Could not place {src} at {dst} ({mode}): {last_error}")
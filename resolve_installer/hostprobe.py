@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import ctypes
+import errno
+import logging
+import os
+import resource
+from dataclasses import dataclass
+from typing import Dict
+
+from .models import SyncChoice
+
+# Same number on every architecture since the syscall table unification (Linux 5.16).
+FUTEX_WAITV_NR = 449
+# Lutris warns below this; esync keeps one eventfd per sync object.
+ESYNC_MIN_NOFILE = 524288
+NTSYNC_DEVICE = "/dev/ntsync"
+
+# Fastest first; Wine forks prefer the highest backend that is enabled and available.
+SYNC_ORDER = ("ntsync", "fsync", "esync")
+
+
+@dataclass(frozen=True)
+class HostSync:
+    ntsync: bool
+    futex_waitv: bool
+    nofile_soft: int
+    nofile_hard: int
+
+    def supports(self, backend: str) -> bool:
+        if backend == "ntsync":
+            return self.ntsync
+        if backend == "fsync":
+            return self.futex_waitv
+        if backend == "esync":
+            return self.nofile_hard >= ESYNC_MIN_NOFILE
+        return backend == "none"
+
+
+def _has_futex_waitv() -> bool:
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return False
+    # futex_waitv(NULL, 0, 0, NULL, 0) fails with EINVAL when implemented and ENOSYS when not.
+    result = libc.syscall(FUTEX_WAITV_NR, None, 0, 0, None, 0)
+    return result == 0 or ctypes.get_errno() != errno.ENOSYS
+
+
+def probe_host_sync() -> HostSync:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    unlimited = resource.RLIM_INFINITY
+    return HostSync(
+        ntsync=os.access(NTSYNC_DEVICE, os.R_OK | os.W_OK),
+        futex_waitv=_has_futex_waitv(),
+        nofile_soft=ESYNC_MIN_NOFILE * 2 if soft == unlimited else soft,
+        nofile_hard=ESYNC_MIN_NOFILE * 2 if hard == unlimited else hard,
+    )
+
+
+def choose_sync(host: HostSync, requested: str = "auto") -> SyncChoice:
+    """Pick the fastest backend the host supports, or honour an explicit ``--sync`` choice."""
+    if requested == "none":
+        return SyncChoice("none", ())
+    if requested == "auto":
+        mode = next((backend for backend in SYNC_ORDER if host.supports(backend)), "none")
+    else:
+        mode = requested
+        if not host.supports(mode):
+            logging.warning("--sync %s requested but the host does not appear to support it", mode)
+    if mode == "none":
+        return SyncChoice("none", ())
+    slower = SYNC_ORDER[SYNC_ORDER.index(mode) + 1 :]
+    return SyncChoice(mode, (mode, *(backend for backend in slower if host.supports(backend))))
+
+
+def describe_host(host: HostSync) -> str:
+    return (
+        f"ntsync={'yes' if host.ntsync else 'no'} futex_waitv={'yes' if host.futex_waitv else 'no'} "
+        f"nofile={host.nofile_soft}/{host.nofile_hard}"
+    )
+
+
+def sync_env(choice: SyncChoice, runner: str) -> Dict[str, str]:
+    """Env switches for ``choice``: ``WINE*SYNC`` for wine builds, ``PROTON_*`` for Proton."""
+    enabled = set(choice.enabled)
+    if runner == "proton":
+        env = {
+            "PROTON_NO_ESYNC": "0" if "esync" in enabled else "1",
+            "PROTON_NO_FSYNC": "0" if "fsync" in enabled else "1",
+        }
+        if "ntsync" in enabled:
+            env["PROTON_USE_NTSYNC"] = "1"
+        return env
+    env = {"WINEESYNC": "1" if "esync" in enabled else "0", "WINEFSYNC": "1" if "fsync" in enabled else "0"}
+    if "ntsync" in enabled:
+        env["WINENTSYNC"] = "1"
+    return env
+
+
+def raise_nofile_limit(minimum: int = ESYNC_MIN_NOFILE) -> int:
+    """Raise the soft fd limit toward ``minimum`` (capped by the hard limit) for child wine processes."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= minimum:
+        return soft
+    target = minimum if hard == resource.RLIM_INFINITY else min(minimum, hard)
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return target
@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import logging
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from pathlib import Path
+from typing import Callable
+
+from .actions import (
+    WINETRICKS_VERBS,
+    apply_registry,
+    copy_dlls,
+    create_prefix,
+    install_dependencies,
+    registry_tweaks,
+    run_installer,
+    verify_installer,
+    wait_wineserver,
+)
+from .dlcache import DownloadCache
+from .dllstore import DllStore
+from .envcfg import base_env
+from .journal import StepJournal, fingerprint, optional_file_digest
+from .logging_utils import target_log, target_log_path
+from .models import INSTALL_STEPS, RunnerConfig, StepLimits, SyncChoice, TargetConfig
+from .pipeline import Step, run_pipeline
+from .registry import RegKey, to_regedit
+from .runner import runner_fingerprint
+from .session import WineserverSession
+from .snapshots import (
+    capture_snapshot,
+    find_snapshot,
+    restore_snapshot,
+    snapshot_inputs,
+    snapshot_key,
+    snapshot_lock,
+)
+from .tracing import stage
+
+
+def parse_step_limits(timeouts: list[str], idle_timeouts: list[str]) -> dict[str, StepLimits]:
+    """Turn ``[STEP=]SECONDS`` options into per-step limits; entries without STEP apply to all steps."""
+    parsed: dict[str, dict[str, float]] = {}
+    for field_name, specs in (("timeout", timeouts), ("idle_timeout", idle_timeouts)):
+        for spec in specs:
+            step, sep, value = spec.rpartition("=")
+            step = step if sep else "*"
+            if step != "*" and step not in INSTALL_STEPS:
+                raise RuntimeError(f"Unknown step in timeout '{spec}'; expected one of {', '.join(INSTALL_STEPS)}")
+            try:
+                seconds = float(value)
+            except ValueError:
+                raise RuntimeError(f"Invalid timeout '{spec}'; expected [STEP=]SECONDS") from None
+            parsed.setdefault(step, {})[field_name] = seconds
+    default = parsed.get("*", {})
+    return {step: StepLimits(**{**default, **values}) for step, values in parsed.items()}
+
+
+def limits_for(step_limits: dict[str, StepLimits] | None, step: str) -> StepLimits | None:
+    if not step_limits:
+        return None
+    return step_limits.get(step, step_limits.get("*"))
+
+
+def run_journaled(
+    journal: StepJournal,
+    step: str,
+    fp: str,
+    force_steps: frozenset[str],
+    target_dir: Path,
+    action: Callable[[], None],
+) -> None:
+    """Run ``action`` unless the journal shows ``step`` already completed with the same inputs."""
+    if step not in force_steps and journal.is_current(step, fp):
+        logging.info("[%s] Inputs unchanged since last successful run; skipping", step)
+        return
+    journal.invalidate(step)
+    with stage(step, target_dir):
+        action()
+    journal.record(step, fp)
+
+
+def in_session(session: WineserverSession | None, action: Callable[[], None]) -> Callable[[], None]:
+    """Wrap a wine step so the persistent wineserver (if any) is up before it runs."""
+
+    def run() -> None:
+        if session is not None:
+            session.ensure_started()
+        action()
+
+    return run
+
+
+def prepare_base_prefix(
+    cfg: TargetConfig,
+    runner: RunnerConfig,
+    prefix_root: Path,
+    winetricks_bin: str,
+    env: dict[str, str],
+    snapshot_root: Path | None,
+    clone_mode: str,
+    step_limits: dict[str, StepLimits] | None = None,
+    journal: StepJournal | None = None,
+    fingerprints: dict[str, str] | None = None,
+    force_steps: frozenset[str] = frozenset(),
+    session: WineserverSession | None = None,
+    download_cache: DownloadCache | None = None,
+    offline: bool = False,
+) -> None:
+    """Run wineboot + winetricks, or clone a cached base prefix that already has them."""
+    target_dir = prefix_root / cfg.target
+    journal = journal or StepJournal(target_dir)
+    fingerprints = fingerprints or base_fingerprints(cfg, runner, winetricks_bin)
+
+    def build() -> None:
+        run_journaled(
+            journal,
+            "create-prefix",
+            fingerprints["create-prefix"],
+            force_steps,
+            target_dir,
+            in_session(
+                session,
+                lambda: create_prefix(cfg, prefix_root, runner, env, limits_for(step_limits, "create-prefix")),
+            ),
+        )
+        run_journaled(
+            journal,
+            "install-dependencies",
+            fingerprints["install-dependencies"],
+            force_steps,
+            target_dir,
+            in_session(
+                session,
+                lambda: install_dependencies(
+                    winetricks_bin,
+                    runner,
+                    env,
+                    limits_for(step_limits, "install-dependencies"),
+                    download_cache,
+                    offline,
+                ),
+            ),
+        )
+
+    base_current = all(
+        step not in force_steps and journal.is_current(step, fingerprints[step])
+        for step in ("create-prefix", "install-dependencies")
+    )
+    if snapshot_root is None or base_current:
+        build()
+        return
+
+    if target_dir.exists() and any(target_dir.iterdir()):
+        logging.info("Prefix %s already exists; updating in place instead of cloning a snapshot", target_dir)
+        build()
+        return
+
+    inputs = snapshot_inputs(runner, cfg, WINETRICKS_VERBS)
+    key = snapshot_key(inputs)
+    with snapshot_lock(snapshot_root, key):
+        if target_dir.exists():
+            target_dir.rmdir()
+        if find_snapshot(snapshot_root, key) is not None:
+            with stage("restore-snapshot", target_dir):
+                restore_snapshot(snapshot_root, key, target_dir, clone_mode)
+            journal.record("create-prefix", fingerprints["create-prefix"])
+            journal.record("install-dependencies", fingerprints["install-dependencies"])
+            return
+        logging.info("No base prefix snapshot %s yet; building it", key)
+        build()
+        with stage("capture-snapshot"):
+            if session is not None:
+                session.stop()
+            wait_wineserver(runner, env)
+            capture_snapshot(snapshot_root, key, target_dir, inputs)
+
+
+def base_fingerprints(cfg: TargetConfig, runner: RunnerConfig, winetricks_bin: str) -> dict[str, str]:
+    create = fingerprint("create-prefix", runner_fingerprint(runner), cfg.wine_arch)
+    deps = fingerprint("install-dependencies", create, shutil.which(winetricks_bin) or winetricks_bin, WINETRICKS_VERBS)
+    return {"create-prefix": create, "install-dependencies": deps}
+
+
+def install_release(
+    cfg: TargetConfig,
+    runner,
+    installer: Path,
+    directml_dll: Path,
+    opencl_dll: Path | None,
+    nvcuda_dll: Path | None,
+    prefix_root: Path,
+    winetricks_bin: str,
+    gpu_type: str,
+    vk_icd: str | None,
+    vulkan_supported: bool,
+    snapshot_root: Path | None = None,
+    clone_mode: str = "auto",
+    interactive: bool = True,
+    step_limits: dict[str, StepLimits] | None = None,
+    force_steps: frozenset[str] = frozenset(),
+    persistent_wineserver: bool = False,
+    download_cache: DownloadCache | None = None,
+    offline: bool = False,
+    dll_store: DllStore | None = None,
+    dll_placement: str = "auto",
+    extra_env: dict[str, str] | None = None,
+    sync: SyncChoice | None = None,
+) -> None:
+    target_dir = prefix_root / cfg.target
+    journal = StepJournal(target_dir)
+    fps = base_fingerprints(cfg, runner, winetricks_bin)
+    base = fps["install-dependencies"]
+    dlls = {"directml": directml_dll, "opencl": opencl_dll, "nvcuda": nvcuda_dll if cfg.arch == "x86_64" else None}
+
+    def verify(_results: dict) -> str:
+        with stage("verify-installer"):
+            return verify_installer(installer)
+
+    def prepare_dlls(_results: dict) -> dict[str, str | None]:
+        """Hash (and with a store, ingest) the DLLs while the prefix is still being built."""
+        with stage("prepare-dlls"):
+            digests = {}
+            for name, path in dlls.items():
+                if dll_store is not None and path is not None and path.expanduser().is_file():
+                    digests[name] = dll_store.ingest(path.expanduser())
+                else:
+                    digests[name] = optional_file_digest(path)
+            return digests
+
+    def render_registry(_results: dict) -> tuple[RegKey, ...]:
+        with stage("render-registry"):
+            return registry_tweaks(cfg)
+
+    logging.info("Installing %s with runner=%s", cfg.target, runner.runner)
+    with WineserverSession(
+        runner, base_env(prefix_root, cfg, runner, vk_icd, vulkan_supported, extra_env, sync), persistent_wineserver
+    ) as session:
+        env = session.env
+
+        def base_prefix(_results: dict) -> None:
+            prepare_base_prefix(
+                cfg,
+                runner,
+                prefix_root,
+                winetricks_bin,
+                env,
+                snapshot_root,
+                clone_mode,
+                step_limits,
+                journal,
+                fps,
+                force_steps,
+                session,
+                download_cache,
+                offline,
+            )
+
+        def dll_step(results: dict) -> None:
+            digests = results["prepare-dlls"]
+            run_journaled(
+                journal,
+                "copy-dlls",
+                fingerprint("copy-dlls", base, digests["directml"], digests["opencl"], digests["nvcuda"], gpu_type),
+                force_steps,
+                target_dir,
+                lambda: copy_dlls(
+                    prefix_root,
+                    cfg,
+                    runner,
+                    directml_dll,
+                    opencl_dll,
+                    nvcuda_dll,
+                    gpu_type,
+                    interactive,
+                    dll_store,
+                    dll_placement,
+                ),
+            )
+
+        def installer_step(results: dict) -> None:
+            run_journaled(
+                journal,
+                "run-installer-exe",
+                fingerprint("run-installer-exe", base, results["verify-installer"]),
+                force_steps,
+                target_dir,
+                in_session(
+                    session,
+                    lambda: run_installer(installer, runner, env, limits_for(step_limits, "run-installer-exe")),
+                ),
+            )
+
+        def registry_step(results: dict) -> None:
+            keys = results["render-registry"]
+
+            def apply() -> None:
+                # Last wine step: let the server go so the tweaks can be written to the hives
+                # directly instead of starting wine again for regedit.
+                if session is not None:
+                    session.stop()
+                apply_registry(prefix_root, cfg, runner, env, limits_for(step_limits, "apply-registry"), keys)
+
+            run_journaled(
+                journal,
+                "apply-registry",
+                fingerprint("apply-registry", base, to_regedit(keys)),
+                force_steps,
+                target_dir,
+                apply,
+            )
+
+        # Input checks, DLL hashing and .reg rendering overlap wineboot/winetricks; everything
+        # that touches the prefix or its wineserver still runs one at a time, in the old order.
+        run_pipeline(
+            [
+                Step("verify-installer", verify),
+                Step("prepare-dlls", prepare_dlls),
+                Step("render-registry", render_registry),
+                Step("base-prefix", base_prefix, resources=("prefix", "wineserver")),
+                Step("copy-dlls", dll_step, after=("base-prefix", "prepare-dlls"), resources=("prefix",)),
+                Step(
+                    "run-installer-exe",
+                    installer_step,
+                    after=("copy-dlls", "verify-installer"),
+                    resources=("prefix", "wineserver"),
+                ),
+                Step(
+                    "apply-registry",
+                    registry_step,
+                    after=("run-installer-exe", "render-registry"),
+                    resources=("prefix", "wineserver"),
+                ),
+            ]
+        )
+    logging.info("Install sequence complete for %s", cfg.target)
+
+
+def install_targets(jobs: list[dict], max_parallel: int, log_file: Path) -> dict[str, str | None]:
+    """Run ``install_release`` for several targets at once; return each target's error (or None).
+
+    Every job gets its own prefix, env and wineserver, and its records are also written to
+    ``<log-file-stem>-<target>.log`` so concurrent installs stay readable.
+    """
+
+    def worker(job: dict) -> str | None:
+        target = job["cfg"].target
+        with target_log(target, target_log_path(log_file, target)):
+            try:
+                install_release(**job, interactive=False)
+            except Exception as exc:
+                logging.error("Install failed: %s", exc)
+                return str(exc)
+        return None
+
+    workers = max(1, min(max_parallel, len(jobs)))
+    logging.info("Installing %d targets with up to %d in parallel", len(jobs), workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="install") as pool:
+        # Each job runs in a copy of the caller's context so the active tracer follows it.
+        futures = [pool.submit(copy_context().run, worker, job) for job in jobs]
+        results = [future.result() for future in futures]
+
+    outcome = {job["cfg"].target: error for job, error in zip(jobs, results)}
+    for target, error in outcome.items():
+        if error is None:
+            logging.info("Install summary: %s ok", target)
+        else:
+            logging.error("Install summary: %s failed: %s", target, error)
+    return outcome
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+
+from .fsutil import atomic_write_text, sha256_file
+
+JOURNAL_NAME = ".resolve-installer-journal.json"
+JOURNAL_FORMAT = 1
+
+
+def fingerprint(*parts: object) -> str:
+    """Hash JSON-serializable step inputs into a stable fingerprint."""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def optional_file_digest(path: Path | None) -> str | None:
+    if path is None:
+        return None
+    path = path.expanduser()
+    return sha256_file(path) if path.is_file() else f"missing:{path}"
+
+
+class StepJournal:
+    """Per-prefix record of completed install steps and the inputs they ran with."""
+
+    def __init__(self, target_dir: Path) -> None:
+        self.path = target_dir / JOURNAL_NAME
+        self.steps: dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                logging.warning("Ignoring unreadable step journal %s", self.path)
+                data = {}
+            if data.get("format") == JOURNAL_FORMAT:
+                self.steps = dict(data.get("steps", {}))
+
+    def is_current(self, step: str, fp: str) -> bool:
+        entry = self.steps.get(step)
+        return entry is not None and entry.get("fingerprint") == fp
+
+    def record(self, step: str, fp: str) -> None:
+        self.steps[step] = {"fingerprint": fp, "completed_at": time.time()}
+        self._save()
+
+    def invalidate(self, step: str) -> None:
+        if self.steps.pop(step, None) is not None:
+            self._save()
+
+    def _save(self) -> None:
+        atomic_write_text(self.path, json.dumps({"format": JOURNAL_FORMAT, "steps": self.steps}, indent=2, sort_keys=True))
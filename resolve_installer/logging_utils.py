@@ -2,7 +2,37 @@ from __future__ import annotations
 
 import logging
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Iterator
+
+_current_target: ContextVar[str | None] = ContextVar("resolve_installer_target", default=None)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(target_tag)s%(message)s"
+
+
+class _TargetTagFilter(logging.Filter):
+    """Tag records with the install target of the emitting thread/task."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        target = _current_target.get()
+        record.target_tag = f"[{target}] " if target else ""
+        return True
+
+
+class _TargetOnlyFilter(_TargetTagFilter):
+    def __init__(self, target: str) -> None:
+        super().__init__()
+        self.target = target
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        super().filter(record)
+        return _current_target.get() == self.target
+
+
+def current_target() -> str | None:
+    return _current_target.get()
 
 
 def setup_logging(log_path: Path) -> None:
@@ -11,12 +41,36 @@ def setup_logging(log_path: Path) -> None:
     root.setLevel(logging.INFO)
     root.handlers.clear()
 
-    fmt = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    fmt = logging.Formatter(LOG_FORMAT)
 
     console = logging.StreamHandler(sys.stdout)
     console.setFormatter(fmt)
+    console.addFilter(_TargetTagFilter())
     root.addHandler(console)
 
     file_handler = logging.FileHandler(log_path, encoding="utf-8")
     file_handler.setFormatter(fmt)
+    file_handler.addFilter(_TargetTagFilter())
     root.addHandler(file_handler)
+
+
+def target_log_path(log_path: Path, target: str) -> Path:
+    return log_path.with_name(f"{log_path.stem}-{target}{log_path.suffix}")
+
+
+@contextmanager
+def target_log(target: str, log_path: Path) -> Iterator[None]:
+    """Tag records from this context with ``target`` and copy them to a per-target log file."""
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.FileHandler(log_path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(_TargetOnlyFilter(target))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    token = _current_target.set(target)
+    try:
+        yield
+    finally:
+        _current_target.reset(token)
+        root.removeHandler(handler)
+        handler.close()
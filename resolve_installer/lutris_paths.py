@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 
@@ -18,3 +19,13 @@ def detect_lutris_cache_dir() -> Path | None:
         if candidate.exists():
             return candidate
     return None
+
+
+def lutris_data_candidates() -> list[tuple[str, Path]]:
+    """Return Lutris data directories (native + Flatpak), labelled by install flavour."""
+    home = Path.home()
+    data_home = os.environ.get("XDG_DATA_HOME")
+    return [
+        ("lutris", (Path(data_home) if data_home else home / ".local" / "share") / "lutris"),
+        ("lutris-flatpak", home / ".var" / "app" / "net.lutris.Lutris" / "data" / "lutris"),
+    ]
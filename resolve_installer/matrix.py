@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+import yaml
+
+from .fsutil import atomic_write_text, sha256_file
+from .models import GPU_TYPES, TARGETS, VULKAN_MODES, RunnerConfig
+from .yamlgen import generate_combined_yaml
+
+INDEX_NAME = "index.json"
+INDEX_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class Variant:
+    runner: str
+    version: str
+    vulkan: str
+    targets: tuple[str, ...]
+
+    @property
+    def filename(self) -> str:
+        version = re.sub(r"[^A-Za-z0-9._-]+", "_", self.version) if self.version else "default"
+        return f"davinci-resolve-{self.runner}-{version}-vk{self.vulkan}.yml"
+
+
+def _strings(manifest: dict, key: str, default: list[str]) -> list[str]:
+    value = manifest.get(key, default)
+    if isinstance(value, (str, bool)) or value is None:
+        value = [value]
+    items = []
+    for item in value:
+        # YAML turns on/off into booleans and bare versions into numbers.
+        if isinstance(item, bool):
+            items.append("on" if item else "off")
+        else:
+            items.append("" if item is None else str(item))
+    return items
+
+
+def load_manifest(path: Path) -> tuple[list[Variant], Path | None]:
+    """Expand a YAML/JSON matrix manifest into variants; return them and an optional output dir."""
+    try:
+        manifest = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    except (OSError, yaml.YAMLError) as exc:
+        raise RuntimeError(f"Cannot read matrix manifest {path}: {exc}") from exc
+    if not isinstance(manifest, dict):
+        raise RuntimeError(f"Matrix manifest {path} must be a mapping")
+
+    targets = _strings(manifest, "targets", ["all"])
+    targets = list(TARGETS) if "all" in targets else targets
+    unknown = [name for name in targets if name not in TARGETS]
+    if unknown:
+        raise RuntimeError(f"Unknown targets in {path}: {', '.join(unknown)}")
+    runners = _strings(manifest, "runners", ["wine"])
+    versions = {
+        "wine": _strings(manifest, "wine_versions", [""]),
+        "proton": _strings(manifest, "proton_versions", [""]),
+    }
+    gpu_types = _strings(manifest, "gpu_types", ["unknown"])
+    policies = _strings(manifest, "vulkan", ["auto"])
+    for name, values, allowed in (
+        ("runners", runners, versions.keys()),
+        ("gpu_types", gpu_types, GPU_TYPES),
+        ("vulkan", policies, VULKAN_MODES),
+    ):
+        bad = [value for value in values if value not in allowed]
+        if bad:
+            raise RuntimeError(f"Invalid {name} in {path}: {', '.join(bad)}")
+    if len(gpu_types) > 1:
+        # The generated script is the same for every GPU type (CUDA bits follow the arch), so
+        # per-GPU files would be byte-identical copies.
+        logging.warning("Matrix manifest %s: gpu_types does not change the output; writing one file per variant", path)
+
+    variants = [
+        Variant(runner, version, policy, tuple(targets))
+        for runner in runners
+        for version, policy in itertools.product(versions[runner], policies)
+    ]
+    output = manifest.get("output_dir")
+    return variants, (path.parent / output if output else None)
+
+
+def generator_fingerprint() -> str:
+    """Identify the generator code so any package change invalidates every cached output.
+
+    The YAML draws on several modules (yamlgen, models, registry, hostprobe, topology, ...), so
+    the whole package is hashed rather than a hand-kept list that goes stale.
+    """
+    digest = hashlib.sha256()
+    package = Path(__file__).resolve().parent
+    for path in sorted(package.glob("*.py")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(sha256_file(path).encode("ascii"))
+    digest.update(yaml.__version__.encode("ascii"))
+    return digest.hexdigest()
+
+
+def _inputs_key(generator: str, variant: Variant, vulkan_supported: bool) -> str:
+    payload = json.dumps([generator, asdict(variant), vulkan_supported], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_variant(variant: Variant, vulkan_supported: bool) -> str:
+    runner = RunnerConfig(runner=variant.runner, wine_bin="wine", proton_bin=None)
+    wine_version = variant.version if variant.runner == "wine" else ""
+    proton_version = variant.version if variant.runner == "proton" else ""
+    targets = [TARGETS[name] for name in variant.targets]
+    return generate_combined_yaml(targets, Path("."), runner, wine_version, proton_version, vulkan_supported)
+
+
+def _render_job(job: tuple[Variant, bool]) -> str:
+    return render_variant(*job)
+
+
+def _file_matches(path: Path, digest: str | None) -> bool:
+    return digest is not None and sha256_file(path) == digest
+
+
+def _load_index(output_dir: Path) -> dict:
+    try:
+        index = json.loads((output_dir / INDEX_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return index if index.get("format") == INDEX_FORMAT else {}
+
+
+def generate_matrix(
+    variants: list[Variant],
+    output_dir: Path,
+    detect_vulkan: Callable[[], bool],
+    jobs: int | None = None,
+) -> dict[str, int]:
+    """Write every variant under ``output_dir``, rewriting only files whose content changed.
+
+    Variants whose inputs and generator code match the previous index and whose file on disk
+    still has the recorded hash are not rendered at all.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    generator = generator_fingerprint()
+    # Probe the host once and only when some variant asks for auto-detection.
+    detected = detect_vulkan() if any(variant.vulkan == "auto" for variant in variants) else False
+    previous = {entry["file"]: entry for entry in _load_index(output_dir).get("outputs", [])}
+
+    entries: dict[str, dict] = {}
+    pending: list[tuple[Variant, bool, str]] = []
+    for variant in variants:
+        supported = detected if variant.vulkan == "auto" else variant.vulkan == "on"
+        key = _inputs_key(generator, variant, supported)
+        name = variant.filename
+        if name in entries:
+            raise RuntimeError(f"Matrix variants collide on output file {name}")
+        entry = dict(asdict(variant), file=name, vulkan_supported=supported, inputs=key)
+        entries[name] = entry
+        old = previous.get(name)
+        path = output_dir / name
+        if old and old.get("inputs") == key and path.exists() and _file_matches(path, old.get("sha256")):
+            entry["sha256"] = old["sha256"]
+            continue
+        pending.append((variant, supported, name))
+
+    counts = {"variants": len(variants), "rendered": len(pending), "written": 0, "removed": 0}
+    if pending:
+        work = [(variant, supported) for variant, supported, _ in pending]
+        workers = jobs or os.cpu_count() or 1
+        if workers == 1 or len(work) < 8:
+            rendered = [_render_job(job) for job in work]
+        else:
+            # Rendering is CPU-bound Python, so processes rather than threads.
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rendered = list(pool.map(_render_job, work, chunksize=max(1, len(work) // (workers * 4))))
+        for (_, _, name), text in zip(pending, rendered):
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            entries[name]["sha256"] = digest
+            path = output_dir / name
+            if path.exists() and _file_matches(path, digest):
+                continue
+            atomic_write_text(path, text)
+            counts["written"] += 1
+
+    for name in previous.keys() - entries.keys():
+        (output_dir / name).unlink(missing_ok=True)
+        counts["removed"] += 1
+
+    index = {"format": INDEX_FORMAT, "generator": generator, "outputs": [entries[name] for name in sorted(entries)]}
+    text = json.dumps(index, indent=2, sort_keys=True) + "\n"
+    index_path = output_dir / INDEX_NAME
+    if not index_path.exists() or index_path.read_text(encoding="utf-8") != text:
+        atomic_write_text(index_path, text)
+    logging.info(
+        "Matrix: %d variants, %d rendered, %d written, %d removed in %s",
+        counts["variants"],
+        counts["rendered"],
+        counts["written"],
+        counts["removed"],
+        output_dir,
+    )
+    return counts
@@ -23,6 +23,25 @@ class RunnerConfig:
     proton_bin: str | None
 
 
+@dataclass(frozen=True)
+class SyncChoice:
+    """Sync backend picked for a run; ``enabled`` also lists slower backends the host supports,
+    as fallbacks for runner builds that lack the chosen one."""
+
+    mode: str
+    enabled: tuple[str, ...]
+
+
+# CLI choice lists live here, with the other static definitions, so parsing arguments
+# does not import the modules that implement them.
+INSTALL_STEPS = ("create-prefix", "install-dependencies", "copy-dlls", "run-installer-exe", "apply-registry")
+CLONE_MODES = ("auto", "reflink", "hardlink", "copy")
+DEDUPE_MODES = ("auto", "reflink", "hardlink")
+VULKAN_MODES = ("auto", "on", "off")
+GPU_TYPES = ("nvidia", "amd", "intel", "arm", "unknown")
+SYNC_MODES = ("auto", "ntsync", "fsync", "esync", "none")
+LAUNCH_PROFILES = ("none", "render", "playback")
+
 TARGETS: Dict[str, TargetConfig] = {
     "davinci-resolve-x86_64": TargetConfig(
         target="davinci-resolve-x86_64",
@@ -49,3 +68,11 @@ TARGETS: Dict[str, TargetConfig] = {
         display_name="DaVinci Resolve Studio (ARM64)",
     ),
 }
+
+
+@dataclass(frozen=True)
+class StepLimits:
+    """Wall-clock and no-output limits (seconds) for one external install step."""
+
+    timeout: float | None = None
+    idle_timeout: float | None = None
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+
+@dataclass(frozen=True)
+class Step:
+    """One node of an install pipeline.
+
+    ``run`` is a blocking callable executed in a worker thread; it receives the results of
+    the steps that already finished. ``resources`` name things only one step may use at a
+    time (the prefix, its wineserver).
+    """
+
+    name: str
+    run: Callable[[dict[str, Any]], Any]
+    after: tuple[str, ...] = ()
+    resources: tuple[str, ...] = ()
+
+
+def check_graph(steps: Iterable[Step]) -> list[Step]:
+    """Return ``steps`` in a dependency-respecting order; raise on unknown deps or cycles."""
+    by_name: dict[str, Step] = {}
+    for step in steps:
+        if step.name in by_name:
+            raise RuntimeError(f"Duplicate pipeline step: {step.name}")
+        by_name[step.name] = step
+    for step in by_name.values():
+        unknown = [dep for dep in step.after if dep not in by_name]
+        if unknown:
+            raise RuntimeError(f"Pipeline step {step.name} depends on unknown step(s): {', '.join(unknown)}")
+
+    ordered: list[Step] = []
+    state: dict[str, str] = {}
+
+    def visit(step: Step, chain: tuple[str, ...]) -> None:
+        if state.get(step.name) == "done":
+            return
+        if state.get(step.name) == "visiting":
+            raise RuntimeError(f"Pipeline dependency cycle: {' -> '.join((*chain, step.name))}")
+        state[step.name] = "visiting"
+        for dep in step.after:
+            visit(by_name[dep], (*chain, step.name))
+        state[step.name] = "done"
+        ordered.append(step)
+
+    for step in by_name.values():
+        visit(step, ())
+    return ordered
+
+
+async def _execute(steps: list[Step]) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    locks = {resource: asyncio.Lock() for step in steps for resource in step.resources}
+    tasks: dict[str, asyncio.Task] = {}
+    # Worker-thread futures of steps that have started; threads cannot be interrupted, so
+    # on failure these are awaited instead of abandoned.
+    inflight: dict[str, asyncio.Future] = {}
+
+    async def run_step(step: Step) -> None:
+        if step.after:
+            await asyncio.gather(*(tasks[dep] for dep in step.after))
+        async with AsyncExitStack() as stack:
+            # Fixed acquisition order so two steps can never wait on each other's resources.
+            for resource in sorted(step.resources):
+                await stack.enter_async_context(locks[resource])
+            future = asyncio.ensure_future(asyncio.to_thread(step.run, results))
+            inflight[step.name] = future
+            results[step.name] = await asyncio.shield(future)
+
+    for step in steps:
+        tasks[step.name] = asyncio.create_task(run_step(step), name=step.name)
+
+    root_cause: str | None = None
+    try:
+        done, pending = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+        failed = [task for task in done if not task.cancelled() and task.exception() is not None]
+        if failed:
+            # The root cause is the earliest step whose own work raised, not a dependent that re-raised it.
+            first = next((task for task in failed if task.get_name() in inflight), failed[0])
+            root_cause = first.get_name()
+            skipped = sorted(task.get_name() for task in pending if task.get_name() not in inflight)
+            if skipped:
+                logging.info("Step %s failed; cancelling %s", first.get_name(), ", ".join(skipped))
+            raise first.exception()
+        return results
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        if inflight:
+            outcomes = await asyncio.gather(*inflight.values(), return_exceptions=True)
+            for name, outcome in zip(inflight, outcomes):
+                if name != root_cause and isinstance(outcome, Exception):
+                    logging.warning("Step %s also failed while the pipeline was stopping: %s", name, outcome)
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+def run_pipeline(steps: Iterable[Step]) -> dict[str, Any]:
+    """Run ``steps`` concurrently wherever their dependencies and resources allow.
+
+    The first failing step stops the pipeline: steps that have not started are cancelled,
+    running ones are allowed to finish, and the failure is re-raised. Returns each step's result.
+    """
+    return asyncio.run(_execute(check_graph(steps)))
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import errno
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .fsutil import atomic_write_text
+
+HIVE_HEADER = "WINE REGISTRY Version 2"
+HIVE_FILES = {"HKEY_CURRENT_USER": "user.reg", "HKEY_LOCAL_MACHINE": "system.reg"}
+# Seconds between 1601-01-01 (FILETIME epoch) and 1970-01-01.
+_FILETIME_EPOCH_OFFSET = 11644473600
+
+
+@dataclass(frozen=True)
+class RegValue:
+    name: str
+    data: str | int  # str -> REG_SZ, int -> REG_DWORD
+
+    def render(self) -> str:
+        """The ``"name"=data`` line, identical in REGEDIT4 files and Wine hives."""
+        if isinstance(self.data, int):
+            return f'"{_escape(self.name)}"=dword:{self.data:08x}'
+        return f'"{_escape(self.name)}"="{_escape(self.data)}"'
+
+
+@dataclass(frozen=True)
+class RegKey:
+    path: str  # full path, e.g. HKEY_CURRENT_USER\Software\Wine\DllOverrides
+    values: tuple[RegValue, ...]
+
+    @property
+    def hive(self) -> str:
+        root, _, _ = self.path.partition("\\")
+        if root not in HIVE_FILES:
+            raise RuntimeError(f"Unsupported registry root: {self.path}")
+        return HIVE_FILES[root]
+
+    @property
+    def subkey(self) -> str:
+        return self.path.partition("\\")[2]
+
+
+RESOLVE_EXE = "C:\\Program Files\\Blackmagic Design\\DaVinci Resolve\\Resolve.exe"
+
+
+def resolve_tweaks(include_cuda: bool) -> tuple[RegKey, ...]:
+    """The registry settings every Resolve prefix gets; the single source for installs and YAML."""
+    overrides = (RegValue("directml", "native,builtin"),)
+    if include_cuda:
+        overrides += (RegValue("nvcuda", "native,builtin"),)
+    return (
+        RegKey("HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides", overrides),
+        RegKey(
+            "HKEY_CURRENT_USER\\Software\\Wine\\Direct3D",
+            (RegValue("renderer", "vulkan"), RegValue("csmt", "enabled"), RegValue("VideoMemorySize", "0")),
+        ),
+        RegKey("HKEY_CURRENT_USER\\Control Panel\\Desktop", (RegValue("LogPixels", 0x60),)),
+        RegKey(
+            "HKEY_CURRENT_USER\\Software\\Microsoft\\Windows NT\\CurrentVersion\\AppCompatFlags\\Layers",
+            (RegValue(RESOLVE_EXE, "~ HIGHDPIAWARE DISABLEDXMAXIMIZEDWINDOWEDMODE"),),
+        ),
+        RegKey(
+            "HKEY_LOCAL_MACHINE\\Software\\Microsoft\\Windows NT\\CurrentVersion\\Multimedia\\SystemProfile",
+            (RegValue("SystemResponsiveness", 0x0A),),
+        ),
+    )
+
+
+def to_regedit(keys: tuple[RegKey, ...]) -> str:
+    """Render ``keys`` as a REGEDIT4 file for ``regedit /S``."""
+    lines = ["REGEDIT4"]
+    for key in keys:
+        lines.extend(["", f"[{key.path}]", *(value.render() for value in key.values)])
+    return "\n".join(lines) + "\n"
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _value_name(line: str) -> str | None:
+    """Return the (escaped, lower-cased) value name of a hive value line, or None."""
+    if line.startswith("@="):
+        return "@"
+    if not line.startswith('"'):
+        return None
+    index = 1
+    while index < len(line):
+        if line[index] == "\\":
+            index += 2
+            continue
+        if line[index] == '"':
+            return line[1:index].lower() if line[index + 1 : index + 2] == "=" else None
+        index += 1
+    return None
+
+
+class Hive:
+    """A Wine ``*.reg`` hive file, edited as text so unrelated keys stay byte-for-byte."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        try:
+            # latin-1 round-trips any byte; Wine writes these files as ASCII with escapes.
+            text = path.read_text(encoding="latin-1")
+        except OSError as exc:
+            raise RuntimeError(f"Cannot read registry hive {path}: {exc}") from exc
+        if not text.startswith(HIVE_HEADER):
+            raise RuntimeError(f"Not a Wine registry hive: {path}")
+        self.lines = text.splitlines()
+        self.changed = False
+
+    def _section(self, subkey: str) -> tuple[int, int] | None:
+        header = f"[{_escape(subkey)}]".lower()
+        for start, line in enumerate(self.lines):
+            if line.lower().startswith(header) and line[len(header) : len(header) + 1] in ("", " "):
+                end = start + 1
+                while end < len(self.lines) and not self.lines[end].startswith("["):
+                    end += 1
+                return start, end
+        return None
+
+    def _find(self, section: tuple[int, int], name: str) -> tuple[int, int] | None:
+        """Line range of value ``name`` in ``section``, including continuation lines."""
+        wanted = _escape(name).lower()
+        start, end = section
+        for index in range(start + 1, end):
+            if _value_name(self.lines[index]) == wanted:
+                last = index
+                while self.lines[last].endswith("\\") and last + 1 < end:
+                    last += 1
+                return index, last + 1
+        return None
+
+    def get(self, subkey: str, name: str) -> str | None:
+        section = self._section(subkey)
+        found = self._find(section, name) if section else None
+        return "\n".join(self.lines[found[0] : found[1]]) if found else None
+
+    def set(self, subkey: str, value: RegValue) -> bool:
+        line = value.render()
+        section = self._section(subkey)
+        if section is None:
+            now = time.time()
+            filetime = int((now + _FILETIME_EPOCH_OFFSET) * 10_000_000)
+            if self.lines and self.lines[-1] != "":
+                self.lines.append("")
+            self.lines.extend([f"[{_escape(subkey)}] {int(now)}", f"#time={filetime:x}", line, ""])
+        else:
+            found = self._find(section, value.name)
+            if found is not None and self.lines[found[0] : found[1]] == [line]:
+                return False
+            if found is not None:
+                self.lines[found[0] : found[1]] = [line]
+            else:
+                # Before the blank line that separates sections.
+                insert = section[1]
+                while insert > section[0] + 1 and self.lines[insert - 1] == "":
+                    insert -= 1
+                self.lines.insert(insert, line)
+        self.changed = True
+        return True
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        mode = self.path.stat().st_mode & 0o777
+        atomic_write_text(self.path, "\n".join(self.lines) + "\n", encoding="latin-1")
+        os.chmod(self.path, mode)
+        self.changed = False
+
+
+def missing_tweaks(prefix: Path, keys: tuple[RegKey, ...]) -> list[str]:
+    """Return ``key\\value`` for every tweak the prefix's hives do not already hold."""
+    hives: dict[str, Hive] = {}
+    missing = []
+    for key in keys:
+        hive = hives.setdefault(key.hive, Hive(prefix / key.hive))
+        for value in key.values:
+            if hive.get(key.subkey, value.name) != value.render():
+                missing.append(f"{key.path}\\{value.name}")
+    return missing
+
+
+def apply_offline(prefix: Path, keys: tuple[RegKey, ...]) -> int:
+    """Write ``keys`` straight into ``user.reg``/``system.reg``; return how many values changed.
+
+    The wineserver must not be running for the prefix: it keeps the registry in memory and
+    would overwrite these files when it exits.
+    """
+    if wineserver_running(prefix):
+        raise RuntimeError(f"wineserver is running for {prefix}; cannot edit its hives offline")
+    hives: dict[str, Hive] = {}
+    changed = 0
+    for key in keys:
+        hive = hives.setdefault(key.hive, Hive(prefix / key.hive))
+        changed += sum(hive.set(key.subkey, value) for value in key.values)
+    for hive in hives.values():
+        hive.save()
+    return changed
+
+
+def can_edit_offline(prefix: Path) -> bool:
+    """True when both hives exist in a format this module can edit."""
+    for name in HIVE_FILES.values():
+        try:
+            with open(prefix / name, "rb") as handle:
+                if handle.read(len(HIVE_HEADER)) != HIVE_HEADER.encode():
+                    return False
+        except OSError:
+            return False
+    return True
+
+
+def wineserver_running(prefix: Path) -> bool:
+    """True when a wineserver accepts connections for ``prefix`` (``/tmp/.wine-<uid>/server-<dev>-<ino>``)."""
+    try:
+        st = prefix.stat()
+    except OSError:
+        return False
+    sock_path = Path(f"/tmp/.wine-{os.getuid()}") / f"server-{st.st_dev:x}-{st.st_ino:x}" / "socket"
+    if not sock_path.exists():
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(sock_path))
+        except OSError as exc:
+            # A socket left behind by a crashed server refuses connections.
+            if exc.errno not in (errno.ECONNREFUSED, errno.ENOENT):
+                logging.debug("Could not probe wineserver socket %s: %s", sock_path, exc)
+            return False
+    return True
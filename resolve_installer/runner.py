@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import shutil
 from pathlib import Path
 
 from .models import RunnerConfig
@@ -21,3 +22,47 @@ def runner_exec(cfg: RunnerConfig, args: list[str]) -> list[str]:
     if cfg.runner == "wine":
         return [cfg.wine_bin, *args]
     return [cfg.proton_bin, "run", *args]  # type: ignore[list-item]
+
+
+def _resolve_bin(name: str) -> Path | None:
+    found = shutil.which(name)
+    return Path(found).resolve() if found else None
+
+
+def wineserver_bin(cfg: RunnerConfig) -> str:
+    """Return the wineserver that belongs to the runner's wine build."""
+    if cfg.runner == "proton":
+        proton_dir = Path(cfg.proton_bin).resolve().parent  # type: ignore[arg-type]
+        for candidate in (proton_dir / "files" / "bin" / "wineserver", proton_dir / "dist" / "bin" / "wineserver"):
+            if candidate.exists():
+                return str(candidate)
+        return "wineserver"
+    wine = _resolve_bin(cfg.wine_bin)
+    if wine is not None and (wine.parent / "wineserver").exists():
+        return str(wine.parent / "wineserver")
+    return "wineserver"
+
+
+def runner_build_name(cfg: RunnerConfig) -> str:
+    """Directory name of the runner install, e.g. ``GE-Proton9-20`` or ``lutris-GE-8-x86_64``."""
+    if cfg.runner == "proton":
+        return Path(cfg.proton_bin).resolve().parent.name  # type: ignore[arg-type]
+    wine = _resolve_bin(cfg.wine_bin)
+    if wine is None:
+        return Path(cfg.wine_bin).name
+    return wine.parent.parent.name if wine.parent.name == "bin" else wine.parent.name
+
+
+def runner_fingerprint(cfg: RunnerConfig) -> str:
+    """Identify the runner build by binary path, size and mtime without spawning it."""
+    binary = Path(cfg.proton_bin) if cfg.runner == "proton" else _resolve_bin(cfg.wine_bin)  # type: ignore[arg-type]
+    if binary is None or not binary.exists():
+        return f"{cfg.runner}:{cfg.proton_bin or cfg.wine_bin}:missing"
+    binary = binary.resolve()
+    stat = binary.stat()
+    parts = [cfg.runner, str(binary), str(stat.st_size), str(stat.st_mtime_ns)]
+    if cfg.runner == "proton":
+        version_file = binary.parent / "version"
+        if version_file.exists():
+            parts.append(version_file.read_text(encoding="utf-8", errors="replace").strip())
+    return ":".join(parts)
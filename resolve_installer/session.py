@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import logging
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from .actions import run_cmd
+from .models import RunnerConfig, StepLimits
+from .runner import runner_exec, wineserver_bin
+from .tracing import stage
+
+SHUTDOWN_LIMITS = StepLimits(timeout=120)
+START_TIMEOUT = 60
+
+# winetricks runs "wineserver -w" between verbs. A persistent server never exits on its own,
+# so the shim turns that into a no-op; the session owner waits once at teardown instead.
+_SHIM = """#!/bin/sh
+if [ "$1" = "-w" ]; then
+    exit 0
+fi
+exec "{server}" "$@"
+"""
+
+
+class WineserverSession:
+    """Keep one persistent wineserver per prefix alive across install steps.
+
+    The server is started lazily before the first wine step and shut down with
+    ``wineboot --end-session``, ``wineserver -k`` and ``wineserver -w`` in ``close``.
+    Use ``env`` for every step so winetricks and wine pick up the session shim.
+    """
+
+    def __init__(self, runner: RunnerConfig, env: Dict[str, str], enabled: bool = True) -> None:
+        self.runner = runner
+        self.enabled = enabled
+        self.server = wineserver_bin(runner)
+        self.env = dict(env)
+        self.active = False
+        self._shim_dir: Path | None = None
+        if enabled:
+            self._shim_dir = Path(tempfile.mkdtemp(prefix="resolve-wineserver-"))
+            shim = self._shim_dir / "wineserver"
+            shim.write_text(_SHIM.format(server=shutil.which(self.server) or self.server), encoding="utf-8")
+            shim.chmod(0o755)
+            self.env["WINESERVER"] = str(shim)
+
+    @property
+    def prefix(self) -> Path:
+        return Path(self.env["WINEPREFIX"])
+
+    def ensure_started(self) -> None:
+        if not self.enabled or self.active:
+            return
+        self.prefix.mkdir(parents=True, exist_ok=True)
+        # The daemon inherits stderr and keeps it open, so a pipe would never see EOF.
+        with stage("wineserver-start"), tempfile.TemporaryFile() as errors:
+            try:
+                result = subprocess.run(
+                    [self.server, "-p"],
+                    env=self.env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=errors,
+                    timeout=START_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired:
+                logging.warning("Persistent wineserver did not start within %ss; steps will start their own", START_TIMEOUT)
+                return
+            errors.seek(0)
+            message = errors.read().decode(errors="replace").strip()
+        if result.returncode != 0:
+            logging.warning(
+                "Could not start persistent wineserver (%s); steps will start their own",
+                message or f"exit code {result.returncode}",
+            )
+            return
+        self.active = True
+        logging.info("Started persistent wineserver for %s", self.prefix)
+
+    def stop(self) -> None:
+        if not self.active:
+            return
+        self.active = False
+        with stage("wineserver-stop"):
+            for cmd, step in (
+                (runner_exec(self.runner, ["wineboot", "--end-session"]), "wineserver-end-session"),
+                ([self.server, "-k"], "wineserver-stop"),
+                ([self.server, "-w"], "wineserver-stop"),
+            ):
+                try:
+                    run_cmd(cmd, self.env, step, SHUTDOWN_LIMITS)
+                except RuntimeError as exc:
+                    logging.warning("Persistent wineserver shutdown: %s", exc)
+        logging.info("Stopped persistent wineserver for %s", self.prefix)
+
+    def close(self) -> None:
+        try:
+            self.stop()
+        finally:
+            if self._shim_dir is not None:
+                shutil.rmtree(self._shim_dir, ignore_errors=True)
+                self._shim_dir = None
+
+    def __enter__(self) -> "WineserverSession":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tarfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+from .fsutil import cache_root
+from .models import RunnerConfig
+from .runner import runner_build_name, runner_fingerprint
+
+# One subdirectory per cache producer; only the one matching the host's driver fills up.
+SHADER_CACHE_KINDS = ("nvidia", "mesa", "dxvk", "vkd3d")
+
+
+@dataclass(frozen=True)
+class ShaderCacheUsage:
+    label: str
+    path: Path
+    size: int
+    files: int
+
+
+def default_shader_cache_root() -> Path:
+    return cache_root() / "shaders"
+
+
+def cache_label(runner: RunnerConfig, version: str | None) -> str:
+    """Name the cache after the runner build, e.g. ``proton-GE-Proton9-1``.
+
+    Without a pinned version the name comes from the runner install itself plus a short hash
+    of its fingerprint (``wine-lutris-GE-8-x86_64-1a2b3c4d``), so different builds never share
+    a cache under a generic name.
+    """
+    if version and version.lower() != "none":
+        name = version
+    else:
+        digest = hashlib.sha256(runner_fingerprint(runner).encode()).hexdigest()[:8]
+        name = f"{runner_build_name(runner)}-{digest}"
+    return f"{runner.runner}-{re.sub(r'[^A-Za-z0-9._-]+', '_', name)}"
+
+
+def shader_cache_dir(root: Path, runner: RunnerConfig, version: str | None) -> Path:
+    return root / cache_label(runner, version)
+
+
+def shader_env(cache_dir: Path, max_bytes: int) -> Dict[str, str]:
+    """Env pointing every shader cache Resolve can hit at ``cache_dir``, with driver-side caps.
+
+    The drivers enforce their size caps themselves at runtime (Lutris launches do not prune).
+    """
+    return {
+        "__GL_SHADER_DISK_CACHE_PATH": str(cache_dir / "nvidia"),
+        "__GL_SHADER_DISK_CACHE_SIZE": str(max_bytes),
+        "MESA_SHADER_CACHE_DIR": str(cache_dir / "mesa"),
+        "MESA_SHADER_CACHE_MAX_SIZE": f"{max(1, max_bytes // (1024 * 1024))}M",
+        "DXVK_STATE_CACHE_PATH": str(cache_dir / "dxvk"),
+        "VKD3D_SHADER_CACHE_PATH": str(cache_dir / "vkd3d"),
+    }
+
+
+def ensure_shader_cache(cache_dir: Path) -> None:
+    for kind in SHADER_CACHE_KINDS:
+        (cache_dir / kind).mkdir(parents=True, exist_ok=True)
+
+
+def _files(path: Path) -> list[tuple[Path, os.stat_result]]:
+    found = []
+    for dirpath, _dirs, names in os.walk(path):
+        for name in names:
+            file = Path(dirpath) / name
+            try:
+                found.append((file, file.lstat()))
+            except OSError:
+                continue
+    return found
+
+
+def shader_cache_usage(root: Path) -> list[ShaderCacheUsage]:
+    if not root.is_dir():
+        return []
+    usage = []
+    for entry in sorted(root.iterdir()):
+        if entry.is_dir():
+            files = _files(entry)
+            usage.append(ShaderCacheUsage(entry.name, entry, sum(st.st_size for _, st in files), len(files)))
+    return usage
+
+
+def prune_shader_caches(root: Path, max_bytes: int) -> dict[str, int]:
+    """Delete least-recently-used files so each runner build's cache fits ``max_bytes``."""
+    removed: dict[str, int] = {}
+    for usage in shader_cache_usage(root):
+        if usage.size <= max_bytes:
+            continue
+        total = usage.size
+        # atime is only coarse under relatime, so take whichever of atime/mtime is newer.
+        for file, st in sorted(_files(usage.path), key=lambda item: max(item[1].st_atime, item[1].st_mtime)):
+            if total <= max_bytes:
+                break
+            file.unlink(missing_ok=True)
+            total -= st.st_size
+            removed[usage.label] = removed.get(usage.label, 0) + st.st_size
+        logging.info("Pruned shader cache %s to %.1f MiB", usage.label, total / (1024 * 1024))
+    return removed
+
+
+def export_shader_caches(root: Path, archive: Path) -> int:
+    """Write every runner build's cache into a ``.tar.gz``; return the number of files."""
+    usage = shader_cache_usage(root)
+    if not usage:
+        raise RuntimeError(f"No shader caches to export in {root}")
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp = archive.with_name(f".{archive.name}.partial")
+    with tarfile.open(tmp, "w:gz") as tar:
+        for entry in usage:
+            tar.add(entry.path, arcname=entry.label)
+    tmp.replace(archive)
+    return sum(entry.files for entry in usage)
+
+
+def _safe_members(tar: tarfile.TarFile, dest: Path) -> list[tarfile.TarInfo]:
+    members = []
+    for member in tar.getmembers():
+        target = (dest / member.name).resolve()
+        if not (member.isfile() or member.isdir()) or not target.is_relative_to(dest.resolve()):
+            logging.warning("Skipping unsafe archive member %s", member.name)
+            continue
+        members.append(member)
+    return members
+
+
+def import_shader_caches(root: Path, archive: Path) -> int:
+    """Merge an exported archive into ``root``; files already present are kept. Return files added."""
+    if not archive.is_file():
+        raise RuntimeError(f"Shader cache archive not found: {archive}")
+    root.mkdir(parents=True, exist_ok=True)
+    staging = root / f".import-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        with tarfile.open(archive, "r:*") as tar:
+            tar.extractall(staging, members=_safe_members(tar, staging))
+        added = 0
+        for file, _st in _files(staging):
+            dest = root / file.relative_to(staging)
+            if dest.exists():
+                continue
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(file, dest)
+            added += 1
+        return added
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from .fsutil import atomic_write_text, cache_root, clone_tree, file_lock, tree_size
+from .models import RunnerConfig, TargetConfig
+from .runner import runner_fingerprint
+
+SNAPSHOT_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    key: str
+    path: Path
+    meta: dict
+
+    @property
+    def tree(self) -> Path:
+        return self.path / "tree"
+
+    @property
+    def last_used(self) -> float:
+        return float(self.meta.get("last_used", self.meta.get("created_at", 0)))
+
+
+def default_snapshot_root() -> Path:
+    return cache_root() / "snapshots"
+
+
+def snapshot_inputs(runner: RunnerConfig, target: TargetConfig, verbs: Iterable[str]) -> dict:
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "runner": runner.runner,
+        "runner_id": runner_fingerprint(runner),
+        "wine_arch": target.wine_arch,
+        "verbs": list(verbs),
+    }
+
+
+def snapshot_key(inputs: dict) -> str:
+    payload = json.dumps(inputs, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:20]
+
+
+def snapshot_lock(root: Path, key: str):
+    """Serialize building and cloning of one snapshot across processes and threads."""
+    return file_lock(root / f"{key}.lock")
+
+
+def _load(path: Path) -> Snapshot | None:
+    meta_file = path / "meta.json"
+    if not (path / "tree").is_dir() or not meta_file.exists():
+        return None
+    try:
+        meta = json.loads(meta_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return Snapshot(key=path.name, path=path, meta=meta)
+
+
+def find_snapshot(root: Path, key: str) -> Snapshot | None:
+    return _load(root / key)
+
+
+def list_snapshots(root: Path) -> list[Snapshot]:
+    if not root.is_dir():
+        return []
+    found = [_load(entry) for entry in sorted(root.iterdir()) if entry.is_dir() and not entry.name.startswith(".")]
+    return [snap for snap in found if snap is not None]
+
+
+def restore_snapshot(root: Path, key: str, dest: Path, clone_mode: str) -> bool:
+    """Clone the snapshot for ``key`` into ``dest``; return False when there is none."""
+    snap = find_snapshot(root, key)
+    if snap is None:
+        return False
+    if clone_mode == "hardlink":
+        logging.warning("Hardlinked prefixes share files with snapshot %s; in-place writes affect both", key)
+    started = time.monotonic()
+    used = clone_tree(snap.tree, dest, clone_mode)
+    meta = dict(snap.meta, last_used=time.time())
+    atomic_write_text(snap.path / "meta.json", json.dumps(meta, indent=2, sort_keys=True))
+    logging.info("Restored base prefix snapshot %s into %s (%s, %.1fs)", key, dest, used, time.monotonic() - started)
+    return True
+
+
+def capture_snapshot(root: Path, key: str, source: Path, inputs: dict) -> Snapshot:
+    """Store a private copy of ``source`` as the snapshot for ``key``."""
+    final = root / key
+    staging = root / f".{key}.staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    # Never hardlink here: the live prefix keeps changing after the snapshot is taken.
+    clone_tree(source, staging / "tree", "auto")
+    now = time.time()
+    meta = dict(inputs, created_at=now, last_used=now, size=tree_size(staging / "tree"))
+    atomic_write_text(staging / "meta.json", json.dumps(meta, indent=2, sort_keys=True))
+    shutil.rmtree(final, ignore_errors=True)
+    staging.rename(final)
+    logging.info("Captured base prefix snapshot %s from %s", key, source)
+    return Snapshot(key=key, path=final, meta=meta)
+
+
+def invalidate_snapshots(root: Path, key: str | None = None) -> list[str]:
+    """Delete one snapshot, or every snapshot when ``key`` is None."""
+    removed = []
+    for snap in list_snapshots(root):
+        if key is not None and snap.key != key:
+            continue
+        with snapshot_lock(root, snap.key):
+            shutil.rmtree(snap.path, ignore_errors=True)
+        removed.append(snap.key)
+    if key is not None and not removed:
+        raise RuntimeError(f"No snapshot with key {key} in {root}")
+    return removed
+
+
+def evict_snapshots(root: Path, keep: int) -> list[str]:
+    """Drop least-recently-used snapshots so that at most ``keep`` remain."""
+    ordered = sorted(list_snapshots(root), key=lambda snap: snap.last_used, reverse=True)
+    removed = []
+    for snap in ordered[max(keep, 0):]:
+        with snapshot_lock(root, snap.key):
+            shutil.rmtree(snap.path, ignore_errors=True)
+        removed.append(snap.key)
+    return removed
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable
+
+from .vkprobe import icd_manifests
+
+SYSFS = Path("/sys")
+PCI_VENDORS = {"0x10de": "nvidia", "0x1002": "amd", "0x8086": "intel"}
+# Substrings of the ICD manifest names each vendor's Vulkan driver installs.
+ICD_NAME_HINTS = {"nvidia": ("nvidia",), "amd": ("radeon", "amd"), "intel": ("intel",)}
+# amdgpu reports the BIOS carve-out as VRAM on APUs; anything larger is a real card.
+APU_MAX_VRAM = 2 * 1024**3
+
+
+@dataclass(frozen=True)
+class GpuInfo:
+    slot: str
+    vendor: str
+    discrete: bool
+    boot_vga: bool = False
+    numa_node: int = -1
+
+
+@dataclass(frozen=True)
+class HostTopology:
+    cpus: tuple[int, ...]
+    # Empty unless the CPU is hybrid (Intel P/E cores, Arm big.LITTLE).
+    performance_cpus: tuple[int, ...] = ()
+    numa_nodes: Dict[int, tuple[int, ...]] = field(default_factory=dict)
+    gpus: tuple[GpuInfo, ...] = ()
+    icds: Dict[str, str] = field(default_factory=dict)
+    gamemode: bool = False
+
+
+@dataclass(frozen=True)
+class LaunchTuning:
+    """What a launch profile adds to the Lutris ``system`` section."""
+
+    env: Dict[str, str] = field(default_factory=dict)
+    prefix_command: str | None = None
+    gamemode: bool = False
+
+
+def parse_cpulist(text: str) -> tuple[int, ...]:
+    cpus: list[int] = []
+    for part in filter(None, text.strip().split(",")):
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return tuple(sorted(set(cpus)))
+
+
+def format_cpulist(cpus: Iterable[int]) -> str:
+    ranges: list[str] = []
+    ordered = sorted(set(cpus))
+    start = prev = None
+    for cpu in [*ordered, None]:
+        if prev is not None and cpu == prev + 1:
+            prev = cpu
+            continue
+        if start is not None:
+            ranges.append(str(start) if start == prev else f"{start}-{prev}")
+        start = prev = cpu
+    return ",".join(ranges)
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def _performance_cpus(cpus: tuple[int, ...]) -> tuple[int, ...]:
+    hybrid = _read(SYSFS / "devices" / "cpu_core" / "cpus")
+    if hybrid:
+        return tuple(cpu for cpu in parse_cpulist(hybrid) if cpu in cpus)
+    capacity = {}
+    for cpu in cpus:
+        value = _read(SYSFS / "devices" / "system" / "cpu" / f"cpu{cpu}" / "cpu_capacity")
+        if value and value.isdigit():
+            capacity[cpu] = int(value)
+    if len(set(capacity.values())) > 1:
+        top = max(capacity.values())
+        return tuple(cpu for cpu, value in capacity.items() if value == top)
+    return ()
+
+
+def _numa_nodes() -> Dict[int, tuple[int, ...]]:
+    nodes = {}
+    for node in sorted((SYSFS / "devices" / "system" / "node").glob("node[0-9]*")):
+        cpus = _read(node / "cpulist")
+        if cpus:
+            nodes[int(node.name[4:])] = parse_cpulist(cpus)
+    return nodes
+
+
+def _gpus() -> tuple[GpuInfo, ...]:
+    gpus = []
+    for card in sorted((SYSFS / "class" / "drm").glob("card[0-9]*")):
+        if "-" in card.name:
+            continue
+        device = card / "device"
+        vendor = PCI_VENDORS.get(_read(device / "vendor") or "", "unknown")
+        try:
+            slot = device.resolve().name
+        except OSError:
+            continue
+        vram = _read(device / "mem_info_vram_total")
+        if vendor == "nvidia":
+            discrete = True
+        elif vendor == "amd":
+            discrete = bool(vram and vram.isdigit() and int(vram) > APU_MAX_VRAM)
+        else:
+            # Intel iGPUs sit on the root bus (0000:00:02.0); Arc cards hang off a bridge.
+            discrete = vendor == "intel" and not slot.startswith("0000:00:")
+        numa = _read(device / "numa_node")
+        gpus.append(
+            GpuInfo(
+                slot=slot,
+                vendor=vendor,
+                discrete=discrete,
+                boot_vga=_read(device / "boot_vga") == "1",
+                numa_node=int(numa) if numa and numa.lstrip("-").isdigit() else -1,
+            )
+        )
+    return tuple(gpus)
+
+
+def _icds() -> Dict[str, str]:
+    found: Dict[str, str] = {}
+    for manifest in icd_manifests():
+        name = manifest.name.lower()
+        for vendor, hints in ICD_NAME_HINTS.items():
+            # First match wins, following the loader's search order; skip other-arch manifests.
+            if vendor not in found and any(h in name for h in hints) and ".i686" not in name:
+                found[vendor] = str(manifest)
+    return found
+
+
+def detect_topology() -> HostTopology:
+    online = _read(SYSFS / "devices" / "system" / "cpu" / "online")
+    cpus = parse_cpulist(online) if online else tuple(sorted(os.sched_getaffinity(0)))
+    return HostTopology(
+        cpus=cpus,
+        performance_cpus=_performance_cpus(cpus),
+        numa_nodes=_numa_nodes(),
+        gpus=_gpus(),
+        icds=_icds(),
+        gamemode=shutil.which("gamemoderun") is not None,
+    )
+
+
+def topology_to_json(topology: HostTopology) -> str:
+    return json.dumps(asdict(topology), indent=2, sort_keys=True)
+
+
+def load_topology(path: Path) -> HostTopology:
+    """Read a topology written by ``--print-host-topology`` (possibly hand-edited for another seat)."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return HostTopology(
+            cpus=tuple(data["cpus"]),
+            performance_cpus=tuple(data.get("performance_cpus", ())),
+            numa_nodes={int(node): tuple(cpus) for node, cpus in data.get("numa_nodes", {}).items()},
+            gpus=tuple(GpuInfo(**gpu) for gpu in data.get("gpus", ())),
+            icds=dict(data.get("icds", {})),
+            gamemode=bool(data.get("gamemode", False)),
+        )
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        raise RuntimeError(f"Invalid host topology file {path}: {exc}") from exc
+
+
+def pick_gpu(topology: HostTopology, gpu_type: str) -> GpuInfo | None:
+    """Prefer a discrete GPU of ``--gpu-type``, then any discrete GPU, then the boot GPU."""
+    ranked = sorted(
+        topology.gpus,
+        key=lambda gpu: (gpu.vendor != gpu_type, not gpu.discrete, not gpu.boot_vga, gpu.slot),
+    )
+    return ranked[0] if ranked else None
+
+
+def _gpu_env(topology: HostTopology, gpu: GpuInfo) -> Dict[str, str]:
+    env: Dict[str, str] = {}
+    if gpu.vendor in topology.icds:
+        env["VK_ICD_FILENAMES"] = topology.icds[gpu.vendor]
+    if len(topology.gpus) > 1 and not gpu.boot_vga:
+        if gpu.vendor == "nvidia":
+            # PRIME render offload for the proprietary driver.
+            env.update(
+                __NV_PRIME_RENDER_OFFLOAD="1",
+                __GLX_VENDOR_LIBRARY_NAME="nvidia",
+                __VK_LAYER_NV_optimus="NVIDIA_only",
+            )
+        else:
+            env["DRI_PRIME"] = "pci-" + gpu.slot.replace(":", "_").replace(".", "_")
+    return env
+
+
+def _profile_cpus(topology: HostTopology, profile: str, gpu: GpuInfo | None) -> tuple[int, ...]:
+    if profile != "playback":
+        return topology.cpus
+    # Playback is latency bound: keep Resolve on fast cores next to the GPU's memory.
+    cpus = topology.performance_cpus or topology.cpus
+    if gpu is not None and len(topology.numa_nodes) > 1 and gpu.numa_node in topology.numa_nodes:
+        local = tuple(cpu for cpu in cpus if cpu in topology.numa_nodes[gpu.numa_node])
+        cpus = local or cpus
+    return cpus
+
+
+def launch_tuning(topology: HostTopology, profile: str, gpu_type: str = "unknown") -> LaunchTuning:
+    """Translate ``topology`` into Lutris settings for ``profile`` (``render`` or ``playback``)."""
+    if profile == "none":
+        return LaunchTuning()
+    gpu = pick_gpu(topology, gpu_type)
+    env = _gpu_env(topology, gpu) if gpu is not None else {}
+    cpus = _profile_cpus(topology, profile, gpu)
+    env["WINE_CPU_TOPOLOGY"] = f"{len(cpus)}:{','.join(map(str, cpus))}"
+    prefix_command = None
+    if set(cpus) != set(topology.cpus):
+        prefix_command = f"taskset -c {format_cpulist(cpus)}"
+    logging.info(
+        "Launch profile %s: %d CPU(s) %s, GPU %s%s",
+        profile,
+        len(cpus),
+        format_cpulist(cpus),
+        f"{gpu.vendor} {gpu.slot}" if gpu is not None else "default",
+        ", gamemode" if topology.gamemode else "",
+    )
+    return LaunchTuning(env=env, prefix_command=prefix_command, gamemode=topology.gamemode)
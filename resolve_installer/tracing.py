@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+from .fsutil import atomic_write_text, tree_size
+from .logging_utils import current_target
+
+_active: ContextVar["Tracer | None"] = ContextVar("resolve_installer_tracer", default=None)
+
+
+class Tracer:
+    """Collect stage and child-process timings for one CLI run."""
+
+    def __init__(self, meta: dict | None = None) -> None:
+        self.meta = dict(meta or {})
+        self.stages: list[dict] = []
+        self.processes: list[dict] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._started_at = datetime.now(timezone.utc)
+
+    def now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    @contextmanager
+    def stage(self, name: str, prefix: Path | None = None) -> Iterator[None]:
+        size_before = tree_size(prefix) if prefix is not None and prefix.exists() else 0
+        start = self.now()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            end = self.now()
+            entry = {
+                "name": name,
+                "target": current_target(),
+                "start_s": round(start, 6),
+                "duration_s": round(end - start, 6),
+                "status": status,
+            }
+            if prefix is not None:
+                size_after = tree_size(prefix) if prefix.exists() else 0
+                entry["prefix_bytes_written"] = size_after - size_before
+            with self._lock:
+                self.stages.append(entry)
+
+    def record_process(
+        self,
+        step: str,
+        cmd: list[str],
+        start: float,
+        end: float,
+        returncode: int,
+        max_rss_kb: int | None,
+    ) -> None:
+        with self._lock:
+            self.processes.append(
+                {
+                    "step": step,
+                    "target": current_target(),
+                    "cmd": cmd,
+                    "start_s": round(start, 6),
+                    "duration_s": round(end - start, 6),
+                    "returncode": returncode,
+                    "max_rss_kb": max_rss_kb,
+                }
+            )
+
+    def summary(self) -> dict:
+        totals: dict[str, float] = {}
+        for entry in self.stages:
+            totals[entry["name"]] = round(totals.get(entry["name"], 0.0) + entry["duration_s"], 6)
+        return {
+            "started_at": self._started_at.isoformat(),
+            "total_s": round(self.now(), 6),
+            "meta": self.meta,
+            "stage_totals_s": totals,
+            "stages": self.stages,
+            "processes": self.processes,
+        }
+
+    def chrome_trace(self) -> dict:
+        """Return the run in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        tids: dict[str | None, int] = {}
+        events: list[dict] = []
+
+        def tid_for(target: str | None) -> int:
+            if target not in tids:
+                tids[target] = len(tids) + 1
+                events.append(
+                    {"name": "thread_name", "ph": "M", "pid": 1, "tid": tids[target], "args": {"name": target or "main"}}
+                )
+            return tids[target]
+
+        for category, entries, label in (("stage", self.stages, "name"), ("process", self.processes, "step")):
+            for entry in entries:
+                args = {k: v for k, v in entry.items() if k not in ("start_s", "duration_s")}
+                events.append(
+                    {
+                        "name": entry[label] if category == "stage" else f"{entry[label]}: {Path(entry['cmd'][0]).name}",
+                        "cat": category,
+                        "ph": "X",
+                        "ts": int(entry["start_s"] * 1_000_000),
+                        "dur": int(entry["duration_s"] * 1_000_000),
+                        "pid": 1,
+                        "tid": tid_for(entry["target"]),
+                        "args": args,
+                    }
+                )
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": self.meta}
+
+    def write(self, base: Path) -> tuple[Path, Path]:
+        """Write ``<base>.summary.json`` and ``<base>.trace.json``."""
+        summary_path = base.with_name(f"{base.name}.summary.json")
+        trace_path = base.with_name(f"{base.name}.trace.json")
+        atomic_write_text(summary_path, json.dumps(self.summary(), indent=2))
+        atomic_write_text(trace_path, json.dumps(self.chrome_trace()))
+        return summary_path, trace_path
+
+
+@contextmanager
+def activate(tracer: Tracer) -> Iterator[Tracer]:
+    token = _active.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active.reset(token)
+
+
+def current() -> Tracer | None:
+    return _active.get()
+
+
+@contextmanager
+def stage(name: str, prefix: Path | None = None) -> Iterator[None]:
+    """Time a pipeline stage on the active tracer; a no-op when tracing is off."""
+    tracer = _active.get()
+    if tracer is None:
+        yield
+        return
+    with tracer.stage(name, prefix):
+        yield
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .fsutil import atomic_write_text, cache_root, file_identity
+
+PROBE_FORMAT = 1
+
+# Loader search order for ICD manifests (see the Vulkan loader's LoaderDriverInterface docs).
+ICD_DIRS = (
+    "/etc/vulkan/icd.d",
+    "/usr/local/etc/vulkan/icd.d",
+    "/usr/share/vulkan/icd.d",
+    "/usr/local/share/vulkan/icd.d",
+)
+ICD_ENV_VARS = ("VK_DRIVER_FILES", "VK_ICD_FILENAMES", "VK_ADD_DRIVER_FILES")
+
+
+@dataclass(frozen=True)
+class VulkanDevice:
+    name: str
+    api_version: tuple[int, int, int] | None
+    driver: str
+    driver_version: str
+    vendor_id: str
+    device_type: str
+
+
+@dataclass(frozen=True)
+class VulkanProbe:
+    devices: tuple[VulkanDevice, ...]
+    cached: bool = False
+
+    def supported(self, min_api: tuple[int, int, int] = (1, 3, 0)) -> bool:
+        return any(dev.api_version is not None and dev.api_version >= min_api for dev in self.devices)
+
+
+def default_probe_cache() -> Path:
+    return cache_root() / "vulkan-probe.json"
+
+
+def icd_manifests() -> list[Path]:
+    """Return the ICD manifest files the Vulkan loader would consider."""
+    explicit = [os.environ.get(name, "") for name in ICD_ENV_VARS]
+    dirs = [Path(d) for d in ICD_DIRS]
+    data_home = os.environ.get("XDG_DATA_HOME")
+    dirs.append((Path(data_home) if data_home else Path.home() / ".local" / "share") / "vulkan" / "icd.d")
+    found: list[Path] = []
+    for value in explicit:
+        for entry in filter(None, value.split(os.pathsep)):
+            path = Path(entry)
+            if path.is_dir():
+                dirs.append(path)
+            else:
+                found.append(path)
+    for directory in dirs:
+        if directory.is_dir():
+            found.extend(sorted(directory.glob("*.json")))
+    return found
+
+
+def probe_key(vulkaninfo: str) -> str:
+    parts = [f"format={PROBE_FORMAT}", file_identity(Path(vulkaninfo))]
+    parts.extend(f"{name}={os.environ.get(name, '')}" for name in ICD_ENV_VARS)
+    parts.extend(file_identity(path) for path in icd_manifests())
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _parse_api_version(value: str) -> tuple[int, int, int] | None:
+    # Older vulkaninfo prints "4206847 (1.3.255)", newer ones just "1.3.255".
+    if "(" in value:
+        value = value[value.index("(") + 1 :].rstrip(")")
+    parts = value.strip().split(".")
+    if len(parts) < 3:
+        return None
+    try:
+        return (int(parts[0]), int(parts[1]), int(parts[2]))
+    except ValueError:
+        return None
+
+
+def parse_summary(text: str) -> tuple[VulkanDevice, ...]:
+    """Parse the ``Devices:`` block of ``vulkaninfo --summary`` into per-GPU records."""
+    blocks: list[dict[str, str]] = []
+    in_devices = False
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith("Devices:"):
+            in_devices = True
+            continue
+        if not in_devices or not line or set(line) == {"="}:
+            continue
+        if line.startswith("GPU") and line.endswith(":"):
+            blocks.append({})
+        elif "=" in line and blocks:
+            key, _, value = line.partition("=")
+            blocks[-1][key.strip()] = value.strip()
+    return tuple(
+        VulkanDevice(
+            name=block.get("deviceName", ""),
+            api_version=_parse_api_version(block.get("apiVersion", "")),
+            driver=block.get("driverName") or block.get("driverID", ""),
+            driver_version=block.get("driverInfo") or block.get("driverVersion", ""),
+            vendor_id=block.get("vendorID", ""),
+            device_type=block.get("deviceType", "").removeprefix("PHYSICAL_DEVICE_TYPE_"),
+        )
+        for block in blocks
+    )
+
+
+def _load_cached(cache_path: Path, key: str) -> VulkanProbe | None:
+    try:
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("key") != key:
+        return None
+    try:
+        devices = tuple(
+            VulkanDevice(**dict(dev, api_version=tuple(dev["api_version"]) if dev["api_version"] else None))
+            for dev in data["devices"]
+        )
+    except (KeyError, TypeError):
+        return None
+    return VulkanProbe(devices=devices, cached=True)
+
+
+def probe_vulkan(cache_path: Path | None = None, timeout: float = 15) -> VulkanProbe:
+    """Describe the host's Vulkan devices with one ``vulkaninfo --summary`` run, cached by ICD state."""
+    vulkaninfo = shutil.which("vulkaninfo")
+    if not vulkaninfo:
+        return VulkanProbe(devices=())
+
+    key = probe_key(vulkaninfo)
+    if cache_path is not None:
+        cached = _load_cached(cache_path, key)
+        if cached is not None:
+            return cached
+
+    try:
+        result = subprocess.run(
+            [vulkaninfo, "--summary"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=timeout,
+            check=False,
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        logging.warning("vulkaninfo failed: %s", exc)
+        return VulkanProbe(devices=())
+    devices = parse_summary(result.stdout) if result.returncode == 0 else ()
+
+    # Failed runs are not cached so a transient error does not stick until the driver changes.
+    if cache_path is not None and devices:
+        payload = {"key": key, "devices": [asdict(dev) for dev in devices]}
+        try:
+            atomic_write_text(cache_path, json.dumps(payload, indent=2, sort_keys=True))
+        except OSError as exc:
+            logging.debug("Could not write Vulkan probe cache %s: %s", cache_path, exc)
+    return VulkanProbe(devices=devices)
@@ -1,176 +1,292 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Dict, Iterable, List, Optional, TypedDict, Union
 
 import yaml
 
-from .models import RunnerConfig, TargetConfig
+from .hostprobe import sync_env
+from .models import RunnerConfig, SyncChoice, TargetConfig
+from .registry import resolve_tweaks, to_regedit
+from .topology import LaunchTuning
 
 
-def generate_yaml(
-    target: TargetConfig,
-    prefix_root: Path,
-    runner: RunnerConfig,
-    wine_version: str,
-    proton_version: str,
-    vulkan_supported: bool,
-) -> str:
-    target_root = "$GAMEDIR"
-    effective_prefix = "$GAMEDIR/pfx" if runner.runner == "proton" else "$GAMEDIR"
-    exe = f"{effective_prefix}/drive_c/Program Files/Blackmagic Design/DaVinci Resolve/Resolve.exe"
-    include_cuda = target.arch == "x86_64"
+# libyaml's emitter when PyYAML was built with it; output is identical, only faster.
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 
-    files_lines = [
-        '    - resolve_installer: "N/A:Select DaVinci Resolve Windows installer (.exe)"',
-        f'    - directml_dll: "N/A:Select directml.dll ({target.arch})"',
-    ]
+OPENCL_CHECK = (
+    "-lc \"clinfo >/dev/null 2>&1 || echo '[WARN] OpenCL not detected in Lutris install context; "
+    "Resolve GPU compute may fail.'\""
+)
+
+
+# The Lutris installer model. TypedDicts are plain dicts at runtime, so they dump as-is; key
+# order in the output follows insertion order in the builders below.
+class _TaskBase(TypedDict):
+    name: str
+    prefix: str
+
+
+class Task(_TaskBase, total=False):
+    arch: str
+    app: str
+    executable: str
+    description: str
+    args: str
+
+
+class Execute(TypedDict):
+    command: str
+    args: str
+
+
+class Copy(TypedDict):
+    src: str
+    dst: str
+
+
+class WriteFile(TypedDict):
+    file: str
+    content: str
+
+
+class TaskStep(TypedDict):
+    task: Task
+
+
+class ExecuteStep(TypedDict):
+    execute: Execute
+
+
+class CopyStep(TypedDict):
+    copy: Copy
+
+
+class WriteFileStep(TypedDict):
+    write_file: WriteFile
+
+
+InstallerStep = Union[TaskStep, ExecuteStep, CopyStep, WriteFileStep]
+
+
+class Game(TypedDict):
+    exe: str
+    prefix: str
+    arch: str
+    args: str
+
+
+class WineSection(TypedDict, total=False):
+    version: str
+    esync: bool
+    fsync: bool
+    dxvk: bool
+    vkd3d: bool
+    latencyflex: bool
+    overrides: Dict[str, str]
+
+
+class ProtonSection(TypedDict):
+    version: str
+
+
+class _SystemBase(TypedDict):
+    env: Dict[str, str]
+
+
+class System(_SystemBase, total=False):
+    gamemode: bool
+    prefix_command: str
+
+
+class _ScriptBase(TypedDict):
+    files: List[Dict[str, str]]
+    game: Game
+    installer: List[InstallerStep]
+
+
+class Script(_ScriptBase, total=False):
+    # Exactly one of wine/proton, matching Installer.runner.
+    wine: WineSection
+    proton: Optional[ProtonSection]
+    system: System
+
+
+class Installer(TypedDict):
+    name: str
+    game_slug: str
+    version: str
+    slug: str
+    runner: str
+    script: Script
+
+
+def _has_version(value: str) -> bool:
+    return bool(value) and value.lower() != "none"
+
+
+def _registry_content(include_cuda: bool) -> str:
+    return to_regedit(resolve_tweaks(include_cuda))
 
+
+def _installer_steps(target: TargetConfig, runner: RunnerConfig, effective_prefix: str) -> List[InstallerStep]:
     task_exec_name = "wineexec" if runner.runner == "wine" else "protonexec"
-    installer_lines = [
-        "    - task:",
-        "        name: create_prefix",
-        f"        prefix: {target_root}",
-        f"        arch: {target.wine_arch}",
-        "",
-        "    - execute:",
-        "        command: /bin/bash",
-        "        args: -lc \"clinfo >/dev/null 2>&1 || echo '[WARN] OpenCL not detected in Lutris install context; Resolve GPU compute may fail.'\"",
-        "",
-        "    - task:",
-        "        name: winetricks",
-        f"        prefix: {target_root}",
-        "        app: win10 vcrun2019",
-        "",
-        "    - copy:",
-        "        src: directml_dll",
-        f"        dst: {effective_prefix}/drive_c/windows/system32/",
+    return [
+        {"task": {"name": "create_prefix", "prefix": "$GAMEDIR", "arch": target.wine_arch}},
+        {"execute": {"command": "/bin/bash", "args": OPENCL_CHECK}},
+        {"task": {"name": "winetricks", "prefix": "$GAMEDIR", "app": "win10 vcrun2019"}},
+        {"copy": {"src": "directml_dll", "dst": f"{effective_prefix}/drive_c/windows/system32/"}},
+        {
+            "task": {
+                "name": task_exec_name,
+                "prefix": "$GAMEDIR",
+                "executable": "resolve_installer",
+                "description": f"Installing {target.display_name}...",
+            }
+        },
+        {
+            "write_file": {
+                "file": "$GAMEDIR/resolve.reg",
+                "content": _registry_content(target.arch == "x86_64"),
+            }
+        },
+        {
+            "task": {
+                "name": task_exec_name,
+                "prefix": "$GAMEDIR",
+                "executable": "regedit",
+                "args": "/S $GAMEDIR/resolve.reg",
+            }
+        },
     ]
-    installer_lines.extend(
-        [
-            "",
-            "    - task:",
-            f"        name: {task_exec_name}",
-            f"        prefix: {target_root}",
-            "        executable: resolve_installer",
-            f"        description: Installing {target.display_name}...",
-        ]
-    )
 
-    reg_lines = [
-        "          REGEDIT4",
-        "",
-        "          [HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides]",
-        "          \"directml\"=\"native,builtin\"",
-    ]
-    if include_cuda:
-        reg_lines.append("          \"nvcuda\"=\"native,builtin\"")
-    reg_lines.extend(
-        [
-            "",
-            "          [HKEY_CURRENT_USER\\Software\\Wine\\Direct3D]",
-            "          \"renderer\"=\"vulkan\"",
-            "          \"csmt\"=\"enabled\"",
-            "          \"VideoMemorySize\"=\"0\"",
-            "",
-            "          [HKEY_CURRENT_USER\\Control Panel\\Desktop]",
-            "          \"LogPixels\"=dword:00000060",
-            "",
-            "          [HKEY_CURRENT_USER\\Software\\Microsoft\\Windows NT\\CurrentVersion\\AppCompatFlags\\Layers]",
-            "          \"C:\\\\Program Files\\\\Blackmagic Design\\\\DaVinci Resolve\\\\Resolve.exe\"=\"~ HIGHDPIAWARE DISABLEDXMAXIMIZEDWINDOWEDMODE\"",
-            "",
-            "          [HKEY_LOCAL_MACHINE\\Software\\Microsoft\\Windows NT\\CurrentVersion\\Multimedia\\SystemProfile]",
-            "          \"SystemResponsiveness\"=dword:0000000a",
-        ]
-    )
 
-    runner_block = [
-        "  wine:",
-    ]
-    if wine_version and wine_version.lower() != "none":
-        runner_block.append(f"    version: {wine_version}")
-    runner_block.extend(
-        [
-            "    esync: true",
-            "    fsync: false",
-            f"    dxvk: {'true' if vulkan_supported else 'false'}",
-            f"    vkd3d: {'true' if vulkan_supported else 'false'}",
-            "    latencyflex: true",
-            "    overrides:",
-            "      directml: n,b",
-        ]
+def _proton_section(proton_version: str) -> ProtonSection | None:
+    # Versions stay strings: an unquoted "8.0" would load back as a float.
+    return {"version": proton_version} if _has_version(proton_version) else None
+
+
+def _wine_section(
+    target: TargetConfig, wine_version: str, vulkan_supported: bool, sync: SyncChoice | None
+) -> WineSection:
+    wine: WineSection = {"version": wine_version} if _has_version(wine_version) else {}
+    wine.update(
+        esync=sync is None or "esync" in sync.enabled,
+        fsync=sync is not None and "fsync" in sync.enabled,
+        dxvk=vulkan_supported,
+        vkd3d=vulkan_supported,
+        latencyflex=True,
+        overrides={"directml": "n,b", **({"nvcuda": "n,b"} if target.arch == "x86_64" else {})},
     )
-    if include_cuda:
-        runner_block.append("      nvcuda: n,b")
+    return wine
 
-    if runner.runner == "proton":
-        runner_block = ["  proton:"]
-        if proton_version and proton_version.lower() != "none":
-            runner_block.append(f"    version: {proton_version}")
-
-    env_lines = [
-        f"      WINEPREFIX: {effective_prefix}",
-        f"      WINEARCH: {target.wine_arch}",
-        "      WINEDEBUG: \"-all\"",
-        "      WINEESYNC: \"1\"",
-        "      __GL_THREADED_OPTIMIZATIONS: \"1\"",
-        "      __GL_DISK_CACHE: \"1\"",
-        "      VK_ICD_FILENAMES: \"/usr/share/vulkan/icd.d\"",
-        "      LATENCYFLEX: \"1\"",
-    ]
+
+def _system_env(
+    target: TargetConfig,
+    runner: RunnerConfig,
+    effective_prefix: str,
+    vulkan_supported: bool,
+    extra_env: Dict[str, str] | None,
+    sync: SyncChoice | None,
+    launch: LaunchTuning | None,
+) -> Dict[str, str]:
+    env: Dict[str, str] = {
+        "WINEPREFIX": effective_prefix,
+        "WINEARCH": target.wine_arch,
+        "WINEDEBUG": "-all",
+        # No explicit choice keeps the historical esync-only template.
+        **({"WINEESYNC": "1"} if sync is None else sync_env(sync, runner.runner)),
+        "__GL_THREADED_OPTIMIZATIONS": "1",
+        "__GL_DISK_CACHE": "1",
+        "VK_ICD_FILENAMES": "/usr/share/vulkan/icd.d",
+        "LATENCYFLEX": "1",
+    }
     if vulkan_supported:
-        env_lines.extend(
-            [
-                "      DXVK_LOG_LEVEL: info",
-                "      VKD3D_DEBUG: warn",
-            ]
-        )
+        env.update(DXVK_LOG_LEVEL="info", VKD3D_DEBUG="warn")
     else:
-        env_lines.append("      PROTON_USE_WINED3D: \"1\"")
+        # Fallback path when Vulkan is unavailable.
+        env["PROTON_USE_WINED3D"] = "1"
+    if target.arch == "x86_64":
+        env["CUDA_EXPERIMENTAL"] = "1"
+    if launch is not None:
+        env.update(launch.env)
+    if extra_env:
+        env.update(extra_env)
+    return env
 
-    yaml_text = "\n".join(
-        [
-            f"name: {target.display_name} ({runner.runner})",
-            f"game_slug: {target.release}",
-            f"version: {target.target}",
-            f"slug: {target.target}",
-            f"runner: {runner.runner}",
-            "",
-            "script:",
-            "  files:",
-            *files_lines,
-            "",
-            "  game:",
-            f"    exe: {exe}",
-            f"    prefix: {target_root}",
-            f"    arch: {target.wine_arch}",
-            "    args: \"\"",
-            "",
-            "  installer:",
-            *installer_lines,
-            "",
-            "    - write_file:",
-            "        file: $GAMEDIR/resolve.reg",
-            "        content: |",
-            *reg_lines,
-            "    - task:",
-            f"        name: {task_exec_name}",
-            f"        prefix: {target_root}",
-            "        executable: regedit",
-            "        args: /S $GAMEDIR/resolve.reg",
-            "",
-            *runner_block,
-            "",
-            "  system:",
-            "    env:",
-            *env_lines,
-        ]
+
+def _system_section(env: Dict[str, str], launch: LaunchTuning | None) -> System:
+    system: System = {"env": env}
+    if launch is not None and launch.gamemode:
+        system["gamemode"] = True
+    if launch is not None and launch.prefix_command:
+        system["prefix_command"] = launch.prefix_command
+    return system
+
+
+def build_installer(
+    target: TargetConfig,
+    runner: RunnerConfig,
+    wine_version: str,
+    proton_version: str,
+    vulkan_supported: bool,
+    extra_env: Dict[str, str] | None = None,
+    sync: SyncChoice | None = None,
+    launch: LaunchTuning | None = None,
+) -> Installer:
+    """Return the Lutris installer for one target as plain dicts/lists, ready to dump."""
+    effective_prefix = "$GAMEDIR/pfx" if runner.runner == "proton" else "$GAMEDIR"
+    script: Script = {
+        "files": [
+            {"resolve_installer": "N/A:Select DaVinci Resolve Windows installer (.exe)"},
+            {"directml_dll": f"N/A:Select directml.dll ({target.arch})"},
+        ],
+        "game": {
+            "exe": f"{effective_prefix}/drive_c/Program Files/Blackmagic Design/DaVinci Resolve/Resolve.exe",
+            "prefix": "$GAMEDIR",
+            "arch": target.wine_arch,
+            "args": "",
+        },
+        "installer": _installer_steps(target, runner, effective_prefix),
+    }
+    if runner.runner == "proton":
+        script["proton"] = _proton_section(proton_version)
+    else:
+        script["wine"] = _wine_section(target, wine_version, vulkan_supported, sync)
+    script["system"] = _system_section(
+        _system_env(target, runner, effective_prefix, vulkan_supported, extra_env, sync, launch), launch
     )
+    return {
+        "name": f"{target.display_name} ({runner.runner})",
+        "game_slug": target.release,
+        "version": target.target,
+        "slug": target.target,
+        "runner": runner.runner,
+        "script": script,
+    }
+
 
-    if include_cuda:
-        yaml_text += "\n      CUDA_EXPERIMENTAL: \"1\""
+def dump_yaml(data: Any) -> str:
+    return yaml.dump(data, Dumper=YamlDumper, sort_keys=False, allow_unicode=False)
 
-    return yaml_text + "\n"
+
+def generate_yaml(
+    target: TargetConfig,
+    prefix_root: Path,
+    runner: RunnerConfig,
+    wine_version: str,
+    proton_version: str,
+    vulkan_supported: bool,
+    extra_env: Dict[str, str] | None = None,
+    sync: SyncChoice | None = None,
+    launch: LaunchTuning | None = None,
+) -> str:
+    """Return the installer for one target as a standalone YAML mapping."""
+    return dump_yaml(
+        build_installer(
+            target, runner, wine_version, proton_version, vulkan_supported, extra_env, sync, launch
+        )
+    )
 
 
 def generate_combined_yaml(
@@ -180,13 +296,16 @@ def generate_combined_yaml(
     wine_version: str,
     proton_version: str,
     vulkan_supported: bool,
+    extra_env: Dict[str, str] | None = None,
+    sync: SyncChoice | None = None,
+    launch: LaunchTuning | None = None,
 ) -> str:
     """Return a single-document YAML list containing all targets."""
-    installers = []
-    for cfg in targets:
-        installers.append(
-            yaml.safe_load(
-                generate_yaml(cfg, prefix_root, runner, wine_version, proton_version, vulkan_supported)
+    return dump_yaml(
+        [
+            build_installer(
+                cfg, runner, wine_version, proton_version, vulkan_supported, extra_env, sync, launch
             )
-        )
-    return yaml.safe_dump(installers, sort_keys=False, allow_unicode=False)
+            for cfg in targets
+        ]
+    )